@@ -6,7 +6,36 @@ import math
 import os
 from pathlib import Path
 import json
-from datetime import datetime
+import sys
+import argparse
+import atexit
+import sqlite3
+import threading
+import bisect
+import heapq
+import pickle
+import tempfile
+import queue
+import gzip
+import shutil
+import uuid
+import asyncio
+import hashlib
+import base64
+import subprocess
+import socket
+import signal
+import select
+import mmap
+import struct
+import random
+import re
+import gc
+import weakref
+import functools
+import tracemalloc
+from array import array
+from datetime import datetime, timezone
 
 # AUDIO 
 try:
@@ -26,6 +55,14 @@ except Exception:
     ImageSequence = None
     PIL_AVAILABLE = False
 
+# Numerics (simulate command)
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except Exception:
+    np = None
+    NUMPY_AVAILABLE = False
+
 def make_transparent(pil_img, white_thresh=240):
     if pil_img is None:
         return None
@@ -155,7 +192,15 @@ except Exception:
 
 # Leaderboard file
 LEADERBOARD_PATH = SCRIPT_DIR / "leaderboard.json"
-MAX_LEADERBOARD_ENTRIES = 200
+LEADERBOARD_JOURNAL_PATH = LEADERBOARD_PATH.with_suffix(".jsonl")
+# entries kept by compaction; unset keeps everything, so placements count every player
+LEADERBOARD_RETENTION = int(os.environ["ADVENTURE_QUIZ_LEADERBOARD_KEEP"]) if os.environ.get("ADVENTURE_QUIZ_LEADERBOARD_KEEP") else None
+JOURNAL_FSYNC_BATCH = 8          # appended records per fsync
+JOURNAL_FSYNC_INTERVAL = 2.0     # ...or seconds since the last fsync, whichever comes first
+JOURNAL_COMPACT_EVERY = 256      # journal records before folding them into the snapshot
+# shared SQLite board for several kiosks; unset keeps the JSON snapshot + journal
+LEADERBOARD_DB_PATH = os.environ.get("ADVENTURE_QUIZ_LEADERBOARD_DB") or None
+SQLITE_BUSY_TIMEOUT_MS = 5000
 
 # UI constants
 WIDTH, HEIGHT = 1370, 730
@@ -265,6 +310,161 @@ PROLOGUE_SCENES_TEMPLATE = [
     (IMG_S9, "Arthan took a deep breath.\nIf he wanted to go home,\nhe had to face the quiz.")
 ]
 
+# Tracing
+# ADVENTURE_QUIZ_TRACE=trace.json records nested spans (clicks, state changes,
+# asset loads, music switches, background writes) and writes them at exit as
+# Chrome Trace Event JSON for chrome://tracing or ui.perfetto.dev. each thread
+# gets its own lane; while tracing is off span() hands back one shared no-op
+TRACE_PATH = os.environ.get("ADVENTURE_QUIZ_TRACE") or None
+TRACE_MAX_EVENTS = 500000
+TRACE_SLOW_FRAME = 0.1          # seconds between redraws that get a "slow frame" marker
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ("tracer", "name", "cat", "args", "start")
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer, self.name, self.cat, self.args = tracer, name, cat, args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args["error"] = repr(exc)
+        t = self.tracer
+        t._add({"name": self.name, "cat": self.cat, "ph": "X", "ts": (self.start - t.t0) * 1e6,
+                "dur": (end - self.start) * 1e6, "pid": t.pid, "tid": t._tid(), "args": self.args})
+        return False
+
+    def set(self, **args):
+        self.args.update(args)
+
+class Tracer:
+    def __init__(self, enabled=False, max_events=TRACE_MAX_EVENTS):
+        self.enabled = enabled
+        self.max_events = max_events
+        self.t0 = time.perf_counter()
+        self.pid = os.getpid()
+        self.events = []
+        self.dropped = 0
+        self._lanes = {}        # thread ident -> tid
+        self._meta = []
+        self._lock = threading.Lock()
+
+    def span(self, name, cat="app", **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, cat, args)
+
+    def instant(self, name, cat="app", **args):
+        if self.enabled:
+            self._add({"name": name, "cat": cat, "ph": "i", "s": "t", "ts": (time.perf_counter() - self.t0) * 1e6,
+                       "pid": self.pid, "tid": self._tid(), "args": args})
+
+    def _tid(self):
+        ident = threading.get_ident()
+        tid = self._lanes.get(ident)
+        if tid is None:
+            with self._lock:
+                tid = self._lanes[ident] = len(self._lanes) + 1
+                thread = threading.current_thread()
+                name = "Tk thread" if thread is threading.main_thread() else thread.name
+                self._meta.append({"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}})
+                self._meta.append({"name": "thread_sort_index", "ph": "M", "pid": self.pid, "tid": tid, "args": {"sort_index": tid}})
+        return tid
+
+    def _add(self, event):
+        # the Tk thread, executors, the score saver and the audio worker all add events
+        with self._lock:
+            if len(self.events) < self.max_events:
+                self.events.append(event)
+            else:
+                self.dropped += 1
+
+    def dump(self, path):
+        try:
+            meta = [{"name": "process_name", "ph": "M", "pid": self.pid, "args": {"name": "Python Adventure Quiz"}}]
+            with self._lock:
+                events, lanes, dropped = list(self.events), list(self._meta), self.dropped
+            _atomic_write_json(path, {"traceEvents": meta + lanes + events, "displayTimeUnit": "ms",
+                                      "otherData": {"dropped": dropped}})
+            print(f"trace: {len(events)} events written to {path}")
+        except Exception as e:
+            print("trace dump error:", e)
+
+TRACE = Tracer(enabled=TRACE_PATH is not None)
+if TRACE_PATH:
+    atexit.register(TRACE.dump, TRACE_PATH)
+
+def traced(name, cat="asset", detail=None):
+    # decorator: a span around each call; detail is the index of a positional
+    # argument (e.g. the path) to show in the span's args
+    def wrap(fn):
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            if not TRACE.enabled:
+                return fn(*args, **kwargs)
+            span_args = {"detail": str(args[detail])} if detail is not None and detail < len(args) else {}
+            with _Span(TRACE, name, cat, span_args):
+                return fn(*args, **kwargs)
+        return call
+    return wrap
+
+# Image pyramids
+# each scene asset keeps its decoded original plus 1/2, 1/4, ... levels made with
+# Image.reduce, so a resize starts from the nearest larger level instead of the full PNG
+PYRAMID_MIN_SIDE = 96
+_image_pyramids = {}
+
+def build_image_pyramid(pil, min_side=PYRAMID_MIN_SIDE):
+    levels = [pil]
+    cur = pil
+    while min(cur.size) // 2 >= min_side:
+        cur = cur.reduce(2)
+        levels.append(cur)
+    return levels
+
+@traced("load_image_pyramid", detail=0)
+def load_image_pyramid(path):
+    key = str(path)
+    try:
+        mtime = os.path.getmtime(key)
+    except OSError:
+        return None
+    cached = _image_pyramids.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    levels = build_image_pyramid(Image.open(key).convert("RGBA"))
+    _image_pyramids[key] = (mtime, levels)
+    return levels
+
+def pick_pyramid_level(levels, need_w, need_h):
+    # smallest level that still covers the requested size
+    best = levels[0]
+    for lv in levels[1:]:
+        if lv.width < need_w or lv.height < need_h:
+            break
+        best = lv
+    return best
+
+def clear_image_pyramids():
+    _image_pyramids.clear()
+
+@traced("safe_load_image", detail=0)
 def safe_load_image(path: Path, target_w=None, target_h=None):
     if not PIL_AVAILABLE:
         return None
@@ -278,26 +478,32 @@ def safe_load_image(path: Path, target_w=None, target_h=None):
             p_abs = p
         if not p_abs.is_file():
             return None
-        pil = Image.open(str(p_abs)).convert("RGBA")
-        if target_w and target_h:
-            iw, ih = pil.size
-            ratio_src = iw / max(1, ih)
-            ratio_target = target_w / max(1, target_h)
-            if ratio_src > ratio_target:
-                new_h = target_h
-                new_w = int(ratio_src * new_h)
-            else:
-                new_w = target_w
-                new_h = int(new_w / max(1, ratio_src))
-            pil = pil.resize((max(1,new_w), max(1,new_h)), Image.LANCZOS)
-            left = max(0, (pil.width - target_w) // 2)
-            upper = max(0, (pil.height - target_h) // 2)
-            pil = pil.crop((left, upper, left + target_w, upper + target_h))
+        levels = load_image_pyramid(p_abs)
+        if not levels:
+            return None
+        if not (target_w and target_h):
+            return levels[0].copy()
+        iw, ih = levels[0].size
+        ratio_src = iw / max(1, ih)
+        ratio_target = target_w / max(1, target_h)
+        if ratio_src > ratio_target:
+            new_h = target_h
+            new_w = int(ratio_src * new_h)
+        else:
+            new_w = target_w
+            new_h = int(new_w / max(1, ratio_src))
+        new_w, new_h = max(1, new_w), max(1, new_h)
+        src = pick_pyramid_level(levels, new_w, new_h)
+        pil = src if src.size == (new_w, new_h) else src.resize((new_w, new_h), Image.LANCZOS)
+        left = max(0, (pil.width - target_w) // 2)
+        upper = max(0, (pil.height - target_h) // 2)
+        pil = pil.crop((left, upper, left + target_w, upper + target_h))
         return pil
     except Exception as e:
         print("safe_load_image error:", e)
         return None
 
+@traced("load_gif_frames", detail=0)
 def load_gif_frames(path):
     frames = []
     durations = []
@@ -327,6 +533,7 @@ def load_gif_frames(path):
             pass
     return frames, durations
 
+@traced("load_video_frames", detail=0)
 def load_video_frames(path, max_frames=60, target_w=None, target_h=None, frame_step=1):
     frames = []
     durations = []
@@ -441,7 +648,6 @@ pygame_available = False
 click_sound = None
 typing_sound = None
 story_typing = None
-bg_music_loaded = False
 
 if PYGAME_AVAILABLE:
     try:
@@ -467,11 +673,186 @@ if pygame_available:
             typing_sound = pygame.mixer.Sound(str(TYPING_SOUND_PATH)); typing_sound.set_volume(0.75)
     except Exception:
         typing_sound = None
+
+# Audio manager
+# music goes through AUDIO instead of pygame.mixer.music: each track is decoded
+# once into a Sound on a worker thread and kept, switches crossfade between two
+# reserved channels, and a switch to the track already looping only adjusts
+# its volume. the worker does all decoding and mixer calls, so the Tk thread
+# just queues a request; when several queue up while a track decodes, only
+# the last one is played. latency is the time from the request to play(),
+# per "from -> to" transition. tracks SDL_mixer can't decode into a Sound
+# fall back to streaming through pygame.mixer.music
+MUSIC_CHANNELS = 2
+AUDIO_STOP_TIMEOUT = 1.0        # seconds exit waits for the worker to silence the music
+
+class AudioManager:
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.current = None         # (path, volume, loops) last requested
+        self.ignored = 0            # switches to the track already looping
+        self.superseded = 0         # switches replaced by a later one before they played
+        self.transitions = {}       # "from -> to" -> [switches, total ms, worst ms]
+        self.last = None            # (transition, ms)
+        self._sounds = {}           # path -> decoded Sound, or None to stream it
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()     # counters above; never held across a decode
+        self._q = queue.Queue()
+        self._thread = None
+        self._channel = 0
+        self._streaming = False
+        self._playing = "silence"   # what the worker last started
+
+    def _put(self, cmd):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="audio", daemon=True)
+            self._thread.start()
+        self._q.put(cmd)
+
+    def preload(self, *paths):
+        if self.enabled:
+            for path in paths:
+                if path and Path(path).exists():
+                    self._put(("load", Path(path)))
+
+    def switch(self, path, volume, loops=-1, fade_ms=800):
+        if not self.enabled:
+            return
+        path = Path(path)
+        cur = self.current
+        if cur is not None and cur[0] == path and loops == cur[2] == -1:
+            with self._stats_lock:
+                self.ignored += 1
+            if cur[1] != volume:
+                self.current = (path, volume, loops)
+                self._put(("volume", volume))
+            return
+        self.current = (path, volume, loops)
+        self._put(("switch", path, volume, loops, fade_ms, time.perf_counter()))
+
+    def stop(self, fade_ms=0, wait=False):
+        # wait=True (on exit) blocks until the worker has stopped the music, and
+        # stops the mixer directly if a decode keeps it busy past AUDIO_STOP_TIMEOUT
+        if not self.enabled or (self.current is None and not wait):
+            return
+        self.current = None
+        done = threading.Event() if wait else None
+        self._put(("stop", fade_ms, done))
+        if wait and not done.wait(AUDIO_STOP_TIMEOUT):
+            try:
+                pygame.mixer.stop(); pygame.mixer.music.stop()
+            except Exception as e:
+                print("audio error:", e)
+
+    def stats(self):
+        # consistent copy of the switch counters: (transitions, last, ignored, superseded)
+        with self._stats_lock:
+            return ({k: list(v) for k, v in self.transitions.items()}, self.last, self.ignored, self.superseded)
+
+    def decoded(self):
+        # (tracks, bytes) held as decoded Sounds
+        sounds = [s for s in list(self._sounds.values()) if s is not None]
+        try:
+            freq, size, channels = pygame.mixer.get_init()
+            per_sec = freq * channels * abs(size) // 8
+        except Exception:
+            per_sec = 0
+        return len(sounds), int(sum(s.get_length() for s in sounds) * per_sec)
+
+    def report_lines(self):
+        transitions, _, ignored, superseded = self.stats()
+        lines = [f"music switches: {sum(v[0] for v in transitions.values())} played, "
+                 f"{ignored} redundant ignored, {superseded} superseded"]
+        for name, (n, total, worst) in sorted(transitions.items(), key=lambda kv: -kv[1][2]):
+            lines.append(f"  {name:<32} n {n:<4} avg {total / n:7.1f} ms  max {worst:7.1f} ms")
+        return lines
+
+    def _run(self):
+        while True:
+            batch = [self._q.get()]
+            while True:
+                try: batch.append(self._q.get_nowait())
+                except queue.Empty: break
+            # of the switches/stops waiting, only the newest one still matters
+            last = max((i for i, c in enumerate(batch) if c[0] in ("switch", "stop")), default=-1)
+            for i, cmd in enumerate(batch):
+                try:
+                    if cmd[0] == "load":
+                        continue
+                    if i < last:
+                        if cmd[0] == "switch":
+                            with self._stats_lock:
+                                self.superseded += 1
+                        continue
+                    with self._lock:
+                        getattr(self, "_do_" + cmd[0])(*cmd[1:])
+                except Exception as e:
+                    print("audio error:", e)
+            for cmd in batch:
+                if cmd[0] == "stop" and cmd[2] is not None:
+                    cmd[2].set()
+            for cmd in batch:
+                if cmd[0] == "load":
+                    self._decode(cmd[1])
+
+    def _decode(self, path):
+        if path in self._sounds:
+            return self._sounds[path]
+        with TRACE.span("music decode", cat="audio", detail=path.name):
+            try:
+                sound = pygame.mixer.Sound(str(path))
+            except Exception as e:
+                print(f"audio: streaming {path.name} ({e})")
+                sound = None
+        self._sounds[path] = sound
+        return sound
+
+    def _fade_out(self, fade_ms):
+        ch = pygame.mixer.Channel(self._channel)
+        ch.fadeout(fade_ms) if fade_ms else ch.stop()
+        if self._streaming:
+            pygame.mixer.music.fadeout(fade_ms) if fade_ms else pygame.mixer.music.stop()
+            self._streaming = False
+
+    def _do_switch(self, path, volume, loops, fade_ms, requested):
+        name = f"{self._playing} -> {path.stem}"
+        sound = self._decode(path)
+        with TRACE.span("music switch", cat="audio", detail=name):
+            self._fade_out(fade_ms)
+            if sound is None:
+                pygame.mixer.music.load(str(path)); pygame.mixer.music.set_volume(volume)
+                pygame.mixer.music.play(loops, fade_ms=fade_ms)
+                self._streaming = True
+            else:
+                self._channel = (self._channel + 1) % MUSIC_CHANNELS
+                ch = pygame.mixer.Channel(self._channel)
+                ch.set_volume(volume); ch.play(sound, loops=loops, fade_ms=fade_ms)
+        ms = (time.perf_counter() - requested) * 1000.0
+        with self._stats_lock:
+            stats = self.transitions.setdefault(name, [0, 0.0, 0.0])
+            stats[0] += 1; stats[1] += ms; stats[2] = max(stats[2], ms)
+            self.last = (name, ms)
+        self._playing = path.stem
+
+    def _do_volume(self, volume):
+        if self._streaming:
+            pygame.mixer.music.set_volume(volume)
+        else:
+            pygame.mixer.Channel(self._channel).set_volume(volume)
+
+    def _do_stop(self, fade_ms, done=None):
+        self._fade_out(fade_ms)
+        self._playing = "silence"
+
+AUDIO = AudioManager(pygame_available)
+if pygame_available:
     try:
-        if BG_MUSIC_PATH.exists():
-            pygame.mixer.music.load(str(BG_MUSIC_PATH)); pygame.mixer.music.set_volume(0.95); pygame.mixer.music.play(-1, fade_ms=800); bg_music_loaded = True
-    except Exception:
-        bg_music_loaded = False
+        pygame.mixer.set_reserved(MUSIC_CHANNELS)
+    except Exception as e:
+        print("audio channel reserve failed:", e)
+    if BG_MUSIC_PATH.exists():
+        AUDIO.switch(BG_MUSIC_PATH, 0.95)
+    AUDIO.preload(STORY_MUSIC_PATH, LOADING_JINGLE)
 
 def play_click():
     if click_sound and pygame_available:
@@ -486,46 +867,2190 @@ def play_typing_generic():
             pass
 
 # Leaderboard helpers
-def load_leaderboard():
+LEADERBOARD_POLL_INTERVAL = 1.0   # seconds between mtime checks for outside edits
+
+def _leaderboard_sort_key(e):
+    return (-int(e.get("score", 0)), e.get("ts", ""))
+
+def ordinal(n):
+    if 10 <= (n % 100) <= 20:
+        suf = "th"
+    else:
+        suf = {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+    return f"{n}{suf}"
+
+class RankedScores:
+    # bisect-maintained sorted arrays: entries in board order plus the distinct
+    # scores, so inserts cost O(log n) comparisons, top-K is a slice and a
+    # score's dense rank / percentile is a couple of bisects
+    def __init__(self, entries=()):
+        entries = sorted(entries, key=_leaderboard_sort_key)
+        self._keys = [_leaderboard_sort_key(e) for e in entries]
+        self._entries = entries
+        self._neg_scores = [k[0] for k in self._keys]      # ascending, i.e. scores descending
+        self._distinct = sorted(set(self._neg_scores))
+        self._score_counts = {}
+        for ns in self._neg_scores:
+            self._score_counts[ns] = self._score_counts.get(ns, 0) + 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def entries(self):
+        return self._entries
+
+    def insert(self, entry):
+        key = _leaderboard_sort_key(entry)
+        pos = bisect.bisect_right(self._keys, key)
+        self._keys.insert(pos, key)
+        self._entries.insert(pos, entry)
+        ns = key[0]
+        bisect.insort(self._neg_scores, ns)
+        if ns not in self._score_counts:
+            self._score_counts[ns] = 0
+            bisect.insort(self._distinct, ns)
+        self._score_counts[ns] += 1
+        return pos
+
+    def dense_rank(self, score):
+        return bisect.bisect_left(self._distinct, -int(score)) + 1
+
+    def percentile(self, score):
+        # share of the board scoring strictly lower
+        n = len(self._neg_scores)
+        if n == 0:
+            return 100.0
+        lower = n - bisect.bisect_right(self._neg_scores, -int(score))
+        return 100.0 * lower / n
+
+    def placement(self, score):
+        return self.dense_rank(score), len(self._entries), self.percentile(score)
+
+    def top(self, k):
+        return self._entries[:k]
+
+    def position_of(self, entry):
+        key = _leaderboard_sort_key(entry)
+        pos = bisect.bisect_left(self._keys, key)
+        while pos < len(self._keys) and self._keys[pos] == key:
+            if self._entries[pos] is entry or _entry_identity(self._entries[pos]) == _entry_identity(entry):
+                return pos
+            pos += 1
+        return None
+
+    def find_name(self, query, start=0):
+        # next board position at or after start whose name contains query, wrapping around
+        q = (query or "").lower()
+        n = len(self._entries)
+        if not q or n == 0:
+            return None
+        start = max(0, min(start, n))
+        for rng in (range(start, n), range(0, start)):
+            for i in rng:
+                if q in str(self._entries[i].get("name", "")).lower():
+                    return i
+        return None
+
+    def ranked(self, start=0, stop=None):
+        distinct = self._distinct
+        return [(bisect.bisect_left(distinct, k[0]) + 1, e) for k, e in zip(self._keys[start:stop], self._entries[start:stop])]
+
+def _entry_identity(e):
+    return (e.get("name", ""), e.get("ts", ""), int(e.get("score", 0)))
+
+def _atomic_write_json(path, data, **dump_kwargs):
+    # write-temp-then-rename so readers only ever see the old or the new file
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, **dump_kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+class LeaderboardStore:
+    # keeps the parsed, sorted and dense-ranked board in memory. Scores are
+    # appended to a JSONL journal (fsync'd in batches) and periodically compacted
+    # into the JSON snapshot with an atomic rename; files are only re-read when
+    # their mtime/size stamps change (checked at most once per poll interval)
+    def __init__(self, path, journal_path=None, poll_interval=LEADERBOARD_POLL_INTERVAL, retention=LEADERBOARD_RETENTION):
+        self.path = Path(path)
+        self.journal_path = Path(journal_path) if journal_path else self.path.with_suffix(".jsonl")
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._lock = threading.RLock()
+        self._index = None
+        self._stamp = None
+        self._last_check = 0.0
+        self._journal = None
+        self._journal_records = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._appended = 0          # journal bytes written since the last _mark_clean
+
+    def _file_stamp(self):
+        stamp = []
+        for p in (self.path, self.journal_path):
+            try:
+                st = os.stat(p)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _read_snapshot(self):
+        try:
+            if self.path.exists():
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                    if isinstance(data, list):
+                        return [e for e in data if isinstance(e, dict)]
+        except Exception as e:
+            print("load_leaderboard error:", e)
+        return []
+
+    def _read_journal(self):
+        records = []
+        try:
+            if self.journal_path.exists():
+                with open(self.journal_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            rec = json.loads(line)
+                        except ValueError:
+                            continue   # torn last line from a crash mid-append
+                        if isinstance(rec, dict):
+                            records.append(rec)
+        except Exception as e:
+            print("leaderboard journal read error:", e)
+        return records
+
+    def _read_file(self):
+        entries = self._read_snapshot()
+        journal = self._read_journal()
+        self._journal_records = len(journal)
+        if journal:
+            # a crash between snapshot rename and journal truncation replays records twice
+            seen = set(_entry_identity(e) for e in entries)
+            for rec in journal:
+                ident = _entry_identity(rec)
+                if ident not in seen:
+                    seen.add(ident)
+                    entries.append(rec)
+        return entries
+
+    def _set_entries(self, entries):
+        self._index = RankedScores(entries)
+
+    def invalidate(self):
+        self._index = None
+
+    def _refresh(self, force=False):
+        now = time.monotonic()
+        if not force and self._index is not None and now - self._last_check < self.poll_interval:
+            return
+        self._last_check = now
+        stamp = self._file_stamp()
+        if self._index is not None and stamp == self._stamp:
+            return
+        self._stamp = stamp
+        self._set_entries(self._read_file())
+
+    def _mark_clean(self, snapshot, journal_size):
+        # adopts the files' new stamp only if they hold exactly what is in memory:
+        # the snapshot stamp we know (None for one we just wrote) and a journal
+        # of journal_size bytes. anything else means another process wrote too,
+        # and the next _refresh reads the files again
+        stamp = self._file_stamp()
+        ours = (stamp[1][1] if stamp[1] else 0) == journal_size and (snapshot is None or stamp[0] == snapshot)
+        self._stamp = stamp if ours else None
+        self._last_check = time.monotonic() if ours else 0.0
+        self._appended = 0
+
+    def _journal_size(self):
+        return self._stamp[1][1] if self._stamp and self._stamp[1] else 0
+
+    def entries(self):
+        with self._lock:
+            self._refresh()
+            return list(self._index.entries)
+
+    def ranked(self, start=0, stop=None):
+        # [(dense_rank, entry), ...] without copying the entries
+        with self._lock:
+            self._refresh()
+            return self._index.ranked(start, stop)
+
+    def placement(self, score):
+        # (dense rank, board size, percentile) for a score
+        with self._lock:
+            self._refresh()
+            return self._index.placement(score)
+
+    def position_of(self, entry):
+        with self._lock:
+            self._refresh()
+            return self._index.position_of(entry)
+
+    def find_name(self, query, start=0):
+        with self._lock:
+            self._refresh()
+            return self._index.find_name(query, start)
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self._index)
+
+    def _retained(self, entries):
+        if self.retention is None:
+            return list(entries)
+        return list(entries[:self.retention])
+
+    def sync(self):
+        with self._lock:
+            if self._journal is None or self._unsynced == 0:
+                return
+            try:
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+            except Exception as e:
+                print("leaderboard journal sync error:", e)
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self.sync()
+            try:
+                self._journal.close()
+            except Exception:
+                pass
+            self._journal = None
+
+    def save(self, entries):
+        # full rewrite: atomic snapshot, then an empty journal
+        with self._lock:
+            entries = self._retained(entries)
+            self._close_journal()
+            try:
+                _atomic_write_json(self.path, entries, indent=2)
+                with open(self.journal_path, "w", encoding="utf-8"):
+                    pass
+            except Exception as e:
+                print("save_leaderboard error:", e)
+            self._journal_records = 0
+            self._set_entries(list(entries))
+            self._mark_clean(None, 0)
+
+    def compact(self):
+        with self._lock:
+            self._refresh()
+            self.save(self._index.entries)
+
+    def _append_journal(self, entry):
+        if self._journal is None:
+            self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+            torn = False
+            if self.journal_path.exists() and self.journal_path.stat().st_size > 0:
+                with open(self.journal_path, "rb") as f:
+                    f.seek(-1, os.SEEK_END)
+                    torn = f.read(1) != b"\n"
+            self._journal = open(self.journal_path, "a", encoding="utf-8", newline="\n")
+            if torn:
+                self._journal.write("\n")   # don't glue onto a torn record
+                self._appended += 1
+        try:
+            line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+            self._journal.write(line)
+            self._journal.flush()
+            self._appended += len(line.encode("utf-8"))
+        except Exception:
+            try: self._journal.close()
+            except Exception: pass
+            self._journal = None
+            raise
+        self._journal_records += 1
+        self._unsynced += 1
+        if self._unsynced >= JOURNAL_FSYNC_BATCH or time.monotonic() - self._last_sync >= JOURNAL_FSYNC_INTERVAL:
+            self.sync()
+
+    def add(self, entry):
+        # raises if the journal append fails, leaving the in-memory board untouched
+        with self._lock:
+            self._refresh(force=True)
+            before, self._appended = self._stamp, 0
+            self._append_journal(entry)
+            self._index.insert(entry)
+            if self._journal_records >= JOURNAL_COMPACT_EVERY:
+                self.compact()
+            else:
+                self._mark_clean(before[0], self._journal_size() + self._appended)
+            return entry
+
+    def add_many(self, entries):
+        # one lock hold and one fsync for a whole batch
+        with self._lock:
+            self._refresh(force=True)
+            before, self._appended = self._stamp, 0
+            for entry in entries:
+                self._append_journal(entry)
+                self._index.insert(entry)
+            self.sync()
+            if self._journal_records >= JOURNAL_COMPACT_EVERY:
+                self.compact()
+            else:
+                self._mark_clean(before[0], self._journal_size() + self._appended)
+            return entries
+
+    def clear(self):
+        self.save([])
+
+    def close(self):
+        # flush-and-compact on exit so the snapshot is self-contained
+        with self._lock:
+            if self._journal is None and self._journal_records == 0:
+                return
+            try:
+                self.compact()
+            except Exception as e:
+                print("leaderboard close error:", e)
+
+class SqliteLeaderboardStore:
+    # same interface as LeaderboardStore, backed by one SQLite file in WAL mode so
+    # several kiosk processes can write without losing scores. Reads are LIMIT
+    # queries on the (score DESC, ts) index, cached until PRAGMA data_version moves
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS scores ("
+        " id INTEGER PRIMARY KEY,"
+        " name TEXT NOT NULL,"
+        " keys INTEGER NOT NULL DEFAULT 0,"
+        " lives INTEGER NOT NULL DEFAULT 0,"
+        " score INTEGER NOT NULL,"
+        " ts TEXT NOT NULL,"
+        " UNIQUE (name, ts, score))",
+        "CREATE INDEX IF NOT EXISTS scores_by_rank ON scores (score DESC, ts)",
+        "CREATE INDEX IF NOT EXISTS scores_by_name ON scores (name)",
+    )
+    COLUMNS = ("name", "keys", "lives", "score", "ts")
+
+    def __init__(self, db_path, poll_interval=LEADERBOARD_POLL_INTERVAL):
+        self.path = Path(db_path)
+        self.poll_interval = poll_interval
+        self.retention = None
+        self._lock = threading.RLock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), timeout=SQLITE_BUSY_TIMEOUT_MS / 1000.0, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT_MS)}")
+        for stmt in self.SCHEMA:
+            self._db.execute(stmt)
+        self._version = None
+        self._last_check = 0.0
+        self._cache = {}
+
+    def _row_to_entry(self, row):
+        return dict(zip(self.COLUMNS, row))
+
+    def invalidate(self):
+        self._cache.clear()
+        self._version = None
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._version is not None and now - self._last_check < self.poll_interval:
+            return
+        self._last_check = now
+        version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._version:
+            self._cache.clear()
+            self._version = version
+
+    def _cached(self, key, fn):
+        with self._lock:
+            self._refresh()
+            if key not in self._cache:
+                if len(self._cache) >= 256:
+                    self._cache.clear()   # scrolling a big board visits many slices
+                self._cache[key] = fn()
+            return self._cache[key]
+
+    def position_of(self, entry):
+        with self._lock:
+            score, ts = int(entry.get("score", 0)), str(entry.get("ts", ""))
+            above = self._db.execute("SELECT COUNT(*) FROM scores WHERE score > ?", (score,)).fetchone()[0]
+            tied = self._db.execute("SELECT COUNT(*) FROM scores WHERE score = ? AND ts < ?", (score, ts)).fetchone()[0]
+            return above + tied
+
+    def find_name(self, query, start=0):
+        # walks the rank index from `start` and stops at the first name containing query
+        if not query:
+            return None
+        pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        sql = ("SELECT name, keys, lives, score, ts FROM "
+               "(SELECT * FROM scores ORDER BY score DESC, ts LIMIT -1 OFFSET ?) "
+               "WHERE name LIKE ? ESCAPE '\\' ORDER BY score DESC, ts LIMIT 1")
+        with self._lock:
+            for offset in (start, 0):
+                row = self._db.execute(sql, (offset, pattern)).fetchone()
+                if row:
+                    return self.position_of(self._row_to_entry(row))
+            return None
+
+    def _query_slice(self, start, stop):
+        sql = "SELECT name, keys, lives, score, ts FROM scores ORDER BY score DESC, ts"
+        if stop is None:
+            rows = self._db.execute(sql + " LIMIT -1 OFFSET ?", (start,)).fetchall()
+        else:
+            rows = self._db.execute(sql + " LIMIT ? OFFSET ?", (max(0, stop - start), start)).fetchall()
+        return [self._row_to_entry(r) for r in rows]
+
+    def dense_rank_of_score(self, score):
+        row = self._db.execute("SELECT COUNT(DISTINCT score) FROM scores WHERE score > ?", (int(score),)).fetchone()
+        return int(row[0]) + 1
+
+    def placement(self, score):
+        with self._lock:
+            total = self._db.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+            lower = self._db.execute("SELECT COUNT(*) FROM scores WHERE score < ?", (int(score),)).fetchone()[0]
+            pct = 100.0 * lower / total if total else 100.0
+            return self.dense_rank_of_score(score), total, pct
+
+    def _ranked_slice(self, start, stop):
+        entries = self._query_slice(start, stop)
+        out = []
+        rank = None
+        prev = None
+        for e in entries:
+            if rank is None:
+                rank = self.dense_rank_of_score(e["score"])
+            elif e["score"] != prev:
+                rank += 1
+            prev = e["score"]
+            out.append((rank, e))
+        return out
+
+    def entries(self):
+        return self._cached(("entries",), lambda: self._query_slice(0, None))
+
+    def ranked(self, start=0, stop=None):
+        return list(self._cached(("ranked", start, stop), lambda: self._ranked_slice(start, stop)))
+
+    def __len__(self):
+        return self._cached(("count",), lambda: self._db.execute("SELECT COUNT(*) FROM scores").fetchone()[0])
+
+    INSERT_SQL = "INSERT OR IGNORE INTO scores (name, keys, lives, score, ts) VALUES (?, ?, ?, ?, ?)"
+
+    def _rows(self, entries):
+        return [(str(e.get("name", "Unknown")), int(e.get("keys", 0)), int(e.get("lives", 0)), int(e.get("score", 0)), str(e.get("ts", ""))) for e in entries]
+
+    def insert_many(self, entries):
+        rows = self._rows(entries)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                cur = self._db.executemany(self.INSERT_SQL, rows)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self.invalidate()
+            return cur.rowcount
+
+    def add(self, entry):
+        self.insert_many([entry])
+        return entry
+
+    def add_many(self, entries):
+        self.insert_many(entries)
+        return entries
+
+    def save(self, entries):
+        # one transaction: other kiosks never see an empty board, and a failure keeps the old one
+        try:
+            rows = self._rows(entries)
+        except (TypeError, ValueError) as e:
+            print("save_leaderboard error:", e)
+            return
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("DELETE FROM scores")
+                self._db.executemany(self.INSERT_SQL, rows)
+                self._db.execute("COMMIT")
+            except Exception as e:
+                self._db.execute("ROLLBACK")
+                print("save_leaderboard error:", e)
+            self.invalidate()
+
+    def clear(self):
+        self.save([])
+
+    def sync(self):
+        pass
+
+    def compact(self):
+        pass
+
+    def close(self):
+        with self._lock:
+            try:
+                self._db.execute("PRAGMA optimize")
+                self._db.close()
+            except Exception:
+                pass
+
+def open_leaderboard_store(db_path=LEADERBOARD_DB_PATH):
+    if db_path:
+        try:
+            return SqliteLeaderboardStore(db_path)
+        except Exception as e:
+            print("leaderboard db open failed, using JSON file:", e)
+    return LeaderboardStore(LEADERBOARD_PATH, LEADERBOARD_JOURNAL_PATH)
+
+def import_json_leaderboard(store, json_path, journal_path=None):
+    # pull an existing leaderboard.json (+ its journal) into a SQLite store
+    src = LeaderboardStore(json_path, journal_path, retention=None)
+    return store.insert_many(src.entries())
+
+# Leaderboard merging
+# records travel as (-score, ts, name, keys, lives) tuples: they sort in board
+# order as-is and duplicates on (name, ts, score) end up adjacent after a merge
+MERGE_CHUNK_RECORDS = 500000
+MERGE_READ_BYTES = 1 << 22
+MERGE_SPILL_BATCH = 20000
+
+def _merge_record(e):
+    # None for anything that isn't a scored entry: score, name and ts are required
     try:
-        if LEADERBOARD_PATH.exists():
-            with open(LEADERBOARD_PATH, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                if isinstance(data, list):
-                    return data
-    except Exception as e:
-        print("load_leaderboard error:", e)
-    return []
+        return (-int(e["score"]), str(e["ts"]), str(e["name"]), int(e.get("keys", 0)), int(e.get("lives", 0)))
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None
 
-def save_leaderboard(entries):
+def _decode_jsonl_batch(lines):
+    lines = [ln for ln in lines if ln.strip()]
+    if not lines:
+        return []
     try:
-        LEADERBOARD_PATH.parent.mkdir(parents=True, exist_ok=True)
-        with open(LEADERBOARD_PATH, "w", encoding="utf-8") as f:
-            json.dump(entries[:MAX_LEADERBOARD_ENTRIES], f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print("save_leaderboard error:", e)
+        return json.loads("[" + ",".join(lines) + "]")
+    except ValueError:
+        out = []
+        for ln in lines:
+            try:
+                out.append(json.loads(ln))
+            except ValueError:
+                pass
+        return out
+
+def iter_json_batches(path):
+    # streams lists of objects from a JSON array or a JSONL file, one read
+    # buffer at a time, so memory stays bounded whatever the file size
+    with open(path, "r", encoding="utf-8") as f:
+        head = f.read(MERGE_READ_BYTES)
+        if not head.lstrip().startswith("["):
+            tail = head
+            while True:
+                chunk = f.read(MERGE_READ_BYTES)
+                buf = tail + chunk
+                if not chunk:
+                    yield _decode_jsonl_batch(buf.split("\n"))
+                    return
+                body, sep, tail = buf.rpartition("\n")
+                if sep:
+                    yield _decode_jsonl_batch(body.split("\n"))
+        decoder = json.JSONDecoder()
+        buf = head[head.index("[") + 1:]
+        eof = False
+        while True:
+            # decode everything up to the last "}," in one call; a cut inside a
+            # string can't parse, in which case fall back to one object at a time
+            batch = None
+            cut = buf.rfind("},")
+            if cut > 0:
+                try:
+                    batch = json.loads("[" + buf[:cut + 1] + "]")
+                    buf = buf[cut + 2:]
+                except ValueError:
+                    batch = None
+            if batch is None:
+                batch = []
+                pos = 0
+                n = len(buf)
+                while True:
+                    while pos < n and buf[pos] in " \t\r\n,":
+                        pos += 1
+                    if pos >= n or buf[pos] == "]":
+                        break
+                    try:
+                        obj, pos = decoder.raw_decode(buf, pos)
+                    except ValueError:
+                        break
+                    batch.append(obj)
+                buf = buf[pos:]
+                if buf.lstrip().startswith("]"):
+                    eof = True
+            if batch:
+                yield batch
+            if eof:
+                return
+            chunk = f.read(MERGE_READ_BYTES)
+            if not chunk:
+                if buf.strip().rstrip("]").strip():
+                    try:
+                        obj, _ = decoder.raw_decode(buf.strip().lstrip(","))
+                        yield [obj]
+                    except ValueError:
+                        pass
+                return
+            buf += chunk
+
+def iter_leaderboard_records(path):
+    for batch in iter_json_batches(path):
+        yield from batch
+
+def _spill_run(records, tmpdir):
+    fd, name = tempfile.mkstemp(suffix=".run", dir=tmpdir)
+    with os.fdopen(fd, "wb") as f:
+        for i in range(0, len(records), MERGE_SPILL_BATCH):
+            pickle.dump(records[i:i + MERGE_SPILL_BATCH], f, protocol=pickle.HIGHEST_PROTOCOL)
+    return name
+
+def _read_run(name):
+    with open(name, "rb") as f:
+        while True:
+            try:
+                batch = pickle.load(f)
+            except EOFError:
+                return
+            yield from batch
+
+def _sorted_runs(paths, tmpdir, chunk_records, stats):
+    # all inputs share one buffer: list.sort on concatenated sorted exports is
+    # already a C-speed merge, so only full buffers become spilled runs;
+    # counts valid records in stats["read"] and skipped ones in stats["rejected"]
+    runs = []
+    buf = []
+    to_record = _merge_record
+    for p in paths:
+        for batch in iter_json_batches(p):
+            try:
+                buf.extend([(-int(e["score"]), str(e["ts"]), str(e["name"]), int(e["keys"]), int(e["lives"])) for e in batch])
+                stats["read"] += len(batch)
+            except (KeyError, TypeError, ValueError):
+                # odd records somewhere in this batch: normalise one by one
+                for e in batch:
+                    rec = to_record(e) if isinstance(e, dict) else None
+                    if rec is None:
+                        stats["rejected"] += 1
+                    else:
+                        buf.append(rec)
+                        stats["read"] += 1
+            if len(buf) >= chunk_records:
+                buf.sort()
+                runs.append(_read_run(_spill_run(buf, tmpdir)))
+                buf = []
+    if buf:
+        buf.sort()
+        runs.append(iter(buf))
+    return runs
+
+def merge_leaderboard_files(paths, out_path, top=None, chunk_records=MERGE_CHUNK_RECORDS):
+    # k-way merge of any number of exported boards into one ranked, deduplicated file
+    out_path = Path(out_path)
+    jsonl = out_path.suffix.lower() == ".jsonl"
+    stats = {"inputs": len(paths), "read": 0, "rejected": 0, "written": 0, "duplicates": 0}
+    enc = json.encoder.encode_basestring
+    with tempfile.TemporaryDirectory(prefix="lbmerge-") as tmpdir:
+        runs = _sorted_runs(paths, tmpdir, chunk_records, stats)
+        merged = runs[0] if len(runs) == 1 else heapq.merge(*runs)
+        tmp_out = out_path.with_name(out_path.name + ".tmp")
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        written = dups = 0
+        with open(tmp_out, "w", encoding="utf-8") as out:
+            sep = "\n" if jsonl else ",\n  "
+            opener = "" if jsonl else "[\n  "
+            lines = []
+            prev = None
+            rank = 0
+            prev_score = None
+            limit = top if top is not None else -1
+            for rec in merged:
+                ident = rec[:3]
+                if ident == prev:
+                    dups += 1
+                    continue
+                prev = ident
+                if written == limit:
+                    break           # the rest can't make the cut; duplicates past it go uncounted
+                if rec[0] != prev_score:
+                    rank += 1
+                    prev_score = rec[0]
+                lines.append(f'{{"name": {enc(rec[2])}, "keys": {rec[3]}, "lives": {rec[4]}, "score": {-rec[0]}, "ts": {enc(rec[1])}, "rank": {rank}}}')
+                written += 1
+                if len(lines) >= 20000:
+                    out.write(opener + sep.join(lines))
+                    opener = sep
+                    lines = []
+            if lines:
+                out.write(opener + sep.join(lines))
+            if jsonl:
+                out.write("\n" if written else "")
+            else:
+                out.write("\n]\n" if written else "[]\n")
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_out, out_path)
+    stats.update(written=written, duplicates=dups)
+    return stats
 
-def add_score_to_leaderboard(name, keys, lives):
+LEADERBOARD = open_leaderboard_store()
+atexit.register(lambda: LEADERBOARD.close())
+
+def load_leaderboard():
+    return list(LEADERBOARD.entries())
+
+def save_leaderboard(entries):
+    LEADERBOARD.save(sorted(entries, key=_leaderboard_sort_key))
+
+def score_value(keys, lives):
+    return (int(keys) * 100) + (int(lives) * 10)
+
+def make_score_entry(name, keys, lives):
     try:
         name = (name or "Unknown").strip()[:32]
-        score = (int(keys) * 100) + (int(lives) * 10)
+        score = score_value(keys, lives)
     except Exception:
         score = 0
-    entry = {"name": name or "Unknown", "keys": int(keys), "lives": int(lives), "score": score, "ts": datetime.utcnow().isoformat()+"Z"}
-    entries = load_leaderboard()
-    entries.append(entry)
-    entries.sort(key=lambda e: (e.get("score",0), e.get("ts","")), reverse=True)
-    save_leaderboard(entries)
+    return {"name": name or "Unknown", "keys": int(keys), "lives": int(lives), "score": score, "ts": datetime.utcnow().isoformat()+"Z"}
+
+def add_score_to_leaderboard(name, keys, lives):
+    entry = make_score_entry(name, keys, lives)
+    try:
+        LEADERBOARD.add(entry)
+    except Exception as e:
+        print("add_score_to_leaderboard error:", e)
     return entry
 
 def clear_leaderboard_file():
     try:
-        if LEADERBOARD_PATH.exists():
-            LEADERBOARD_PATH.unlink()
-        save_leaderboard([])
+        LEADERBOARD.clear()
     except Exception as e:
         print("clear_leaderboard_file error:", e)
 
+# Question bank
+# packs are JSON arrays or JSONL files of objects shaped like the built-in
+# questions, plus optional "topic", "difficulty" (1-5 or easy/medium/hard/expert)
+# and "tags"; "answer" may be a letter, an option index or the option text.
+# records are streamed through iter_json_batches, validated, and kept as plain
+# tuples; the topic/difficulty/tag indexes are array("I") lists of question ids
+QUESTIONS_DIR = SCRIPT_DIR / "questions"
+QUESTION_PACKS = os.environ.get("ADVENTURE_QUIZ_QUESTIONS") or None   # files or dirs, os.pathsep-separated
+QUESTION_PACK_EXTS = (".json", ".jsonl")
+STAGE_COUNT = 5
+ANSWER_LETTERS = "abcd"
+DIFFICULTY_LEVELS = {"easy": 1, "medium": 2, "hard": 3, "expert": 4}
+MAX_DIFFICULTY = 5
+DEFAULT_DIFFICULTY = 2
+DEFAULT_TOPIC = "general"
+QUESTION_ERRORS_KEPT = 20
+
+_ANSWER_INDEX = {}
+for _i, _letter in enumerate(ANSWER_LETTERS):
+    _ANSWER_INDEX[_letter] = _ANSWER_INDEX[_letter.upper()] = _i
+_DIFFICULTY_VALUE = {n: n for n in range(1, MAX_DIFFICULTY + 1)}
+for _name, _level in DIFFICULTY_LEVELS.items():
+    _DIFFICULTY_VALUE[_name] = _DIFFICULTY_VALUE[_name.capitalize()] = _DIFFICULTY_VALUE[_name.upper()] = _level
+
+# Free-text answers
+# a typed answer is normalized (case, spacing, quotes, print(...), number
+# words) and looked up in the question's accepted set, compiled once when the
+# question is loaded; records may add spellings under "accept" (a string or a
+# list). longer word answers also match within a small edit distance, unless
+# the typed text is as close to one of the wrong options
+FREE_TEXT_ANSWERS = os.environ.get("ADVENTURE_QUIZ_FREE_TEXT", "1") != "0"
+MAX_ACCEPTED = 16
+FUZZY_MIN_LENGTH = 4        # shorter answers must match exactly
+FUZZY_LONG_LENGTH = 8       # answers this long may be 2 edits off, shorter ones 1
+FUZZY_MAX_LENGTH = 64
+ANSWER_INPUT_MAX = 200      # longer input is never a match (keeps server grading bounded)
+
+_UNIT_WORDS = ("zero one two three four five six seven eight nine ten eleven twelve thirteen "
+               "fourteen fifteen sixteen seventeen eighteen nineteen").split()
+_TEN_WORDS = "twenty thirty forty fifty sixty seventy eighty ninety".split()
+_NUMBER_WORDS = {w: str(n) for n, w in enumerate(_UNIT_WORDS)}
+for _t, _tens in enumerate(_TEN_WORDS, 2):
+    _NUMBER_WORDS[_tens] = str(_t * 10)
+    for _u in range(1, 10):
+        _NUMBER_WORDS[f"{_tens} {_UNIT_WORDS[_u]}"] = _NUMBER_WORDS[f"{_tens}-{_UNIT_WORDS[_u]}"] = str(_t * 10 + _u)
+_PRINT_RE = re.compile(r"print\s*\((.*)\)")
+_accept_sets = {}       # identical accepted sets are shared between questions
+
+def normalize_answer(text):
+    # casefolded, whitespace-collapsed, without trailing punctuation, print(...) or quotes
+    s = " ".join(str(text).casefold().split())
+    s = s.rstrip(".!;").rstrip() or s
+    if s.startswith("print"):
+        m = _PRINT_RE.fullmatch(s)
+        if m:
+            s = m.group(1).strip()
+    if len(s) >= 2 and s[0] == s[-1] and s[0] in "'\"":
+        s = s[1:-1].strip()
+    return _NUMBER_WORDS.get(s, s)
+
+def compile_answers(opts, idx, extra=None):
+    # frozenset of normalized spellings for option idx plus any extras, minus any
+    # spelling a wrong option also normalizes to (5 vs '5', hi vs 'hi' vs HI)
+    if extra is None:
+        accepted = {normalize_answer(opts[idx])}
+    else:
+        if type(extra) is str:
+            extra = (extra,)
+        accepted = {normalize_answer(opts[idx])}
+        accepted.update(normalize_answer(a) for a in extra[:MAX_ACCEPTED])
+        accepted.discard("")
+    accepted.difference_update(normalize_answer(o) for i, o in enumerate(opts) if i != idx)
+    accepted = frozenset(accepted)
+    return _accept_sets.setdefault(accepted, accepted)
+
+def bounded_edit_distance(a, b, k):
+    # Levenshtein distance, or k + 1 as soon as it must exceed k
+    if abs(len(a) - len(b)) > k:
+        return k + 1
+    if a == b:
+        return 0
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > k:
+            return k + 1
+        prev = cur
+    return min(prev[-1], k + 1)
+
+def _fuzzy_budget(answer):
+    # edits allowed against answer; numbers and code-like answers get none
+    if not FUZZY_MIN_LENGTH <= len(answer) <= FUZZY_MAX_LENGTH or not answer.replace(" ", "").isalpha():
+        return 0
+    return 1 if len(answer) < FUZZY_LONG_LENGTH else 2
+
+def question_answers(q):
+    # the accepted set for a question dict, compiled on the fly if it has none
+    accepted = q.get("accept")
+    if type(accepted) is frozenset:
+        return accepted
+    opts = q.get("options") or ()
+    idx = _ANSWER_INDEX.get(str(q.get("answer", "")).strip())
+    if idx is None or idx >= len(opts):
+        return compile_answers((q.get("answer", ""),), 0, accepted)
+    return compile_answers(opts, idx, accepted)
+
+def check_answer(q, given):
+    # True if given picks the right option letter or spells out its answer
+    given = str(given).strip()
+    if len(given) > ANSWER_INPUT_MAX:
+        return False
+    letter = str(q.get("answer", "")).strip().lower()
+    if given.lower() == letter:
+        return True
+    if given in _ANSWER_INDEX:
+        return False            # some other option letter
+    # an option typed exactly picks that option, even where normalizing would
+    # blur it into another one
+    opts = q.get("options") or ()
+    idx = _ANSWER_INDEX.get(letter)
+    wrong = [] if idx is None or idx >= len(opts) else [o for i, o in enumerate(opts) if i != idx]
+    if wrong and given == opts[idx].strip():
+        return True
+    if given in (o.strip() for o in wrong):
+        return False
+    accepted = question_answers(q)
+    norm = normalize_answer(given)
+    if norm in (normalize_answer(o) for o in wrong):
+        return False            # reads as a wrong option
+    if norm in accepted:
+        return True
+    if not _fuzzy_budget(norm):
+        return False
+    best = None
+    for target in accepted:
+        k = _fuzzy_budget(target)
+        if k:
+            d = bounded_edit_distance(norm, target, k)
+            if d <= k and (best is None or d < best):
+                best = d
+    if best is None:
+        return False
+    # a typo must still be closer to the answer than to any wrong option
+    for opt in opts:
+        wrong = normalize_answer(opt)
+        if wrong not in accepted and bounded_edit_distance(norm, wrong, best) <= best:
+            return False
+    return True
+
+def answers_self_check(out=print):
+    # typed answers against options that normalize alike: the right spelling must
+    # pass and every wrong option, typed or blurred by case and quotes, must fail
+    cases = [
+        (["hi", "'hi'", "HI", "ih"], "hi", ["a", "hi", " hi "], ["b", "'hi'", "HI", "Hi", '"hi"', "print('hi')"]),
+        (["True", "'True'", "TRUE", "None"], "True", ["True"], ["'True'", "TRUE", "true"]),
+        (["5", "'5'", "6", "five"], "5", ["5"], ["'5'", '"5"', "6", "five"]),
+        (["Paris", "London", "Rome", "Berlin"], "Paris", ["paris", "PARIS.", "'Paris'", "Pariss"], ["london", "Rome"]),
+    ]
+    failures = 0
+    for opts, right, good, bad in cases:
+        item = _parse_question({"question": "?", "options": opts, "answer": right})
+        for accept in (item[7], None):
+            q = {"answer": ANSWER_LETTERS[item[3]], "options": list(item[2]), "accept": accept}
+            for given, want in [(g, True) for g in good] + [(b, False) for b in bad]:
+                if check_answer(q, given) != want:
+                    failures += 1
+                    out(f"  {opts}: {given!r} graded {'wrong' if want else 'right'}")
+    out(f"{sum(len(c[2]) + len(c[3]) for c in cases) * 2} answers checked, {failures} misgraded")
+    return failures == 0
+
+def _parse_question(rec):
+    # returns (story, question, options, answer index, topic, difficulty, tags,
+    # accepted free-text answers); raises ValueError naming the first problem
+    if not isinstance(rec, dict):
+        raise ValueError("not an object")
+    text = rec.get("question")
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError("missing question text")
+    opts = rec.get("options")
+    if (not isinstance(opts, list) or not 2 <= len(opts) <= len(ANSWER_LETTERS)
+            or not all(isinstance(o, str) for o in opts)):
+        raise ValueError(f"options must be 2-{len(ANSWER_LETTERS)} strings")
+    ans = rec.get("answer")
+    if isinstance(ans, str) and ans.strip() in _ANSWER_INDEX:
+        idx = _ANSWER_INDEX[ans.strip()]
+    elif isinstance(ans, int) and not isinstance(ans, bool):
+        idx = ans
+    elif isinstance(ans, str) and ans in opts:
+        idx = opts.index(ans)
+    else:
+        raise ValueError(f"bad answer {ans!r}")
+    if not 0 <= idx < len(opts):
+        raise ValueError(f"answer {ans!r} out of range")
+    diff = rec.get("difficulty")
+    if diff is None:
+        diff = DEFAULT_DIFFICULTY
+    elif isinstance(diff, (int, float, str)) and not isinstance(diff, bool) and diff in _DIFFICULTY_VALUE:
+        diff = _DIFFICULTY_VALUE[diff]
+    else:
+        raise ValueError(f"bad difficulty {diff!r}")
+    topic = rec.get("topic") or DEFAULT_TOPIC
+    if not isinstance(topic, str):
+        raise ValueError("topic must be a string")
+    tags = rec.get("tags") or ()
+    if isinstance(tags, str):
+        tags = (tags,)
+    if not isinstance(tags, (list, tuple)) or not all(isinstance(t, str) for t in tags):
+        raise ValueError("tags must be strings")
+    story = rec.get("story") or ""
+    if not isinstance(story, str):
+        raise ValueError("story must be a string")
+    extra = rec.get("accept")
+    if extra is not None and not isinstance(extra, str):
+        if not isinstance(extra, list) or not all(isinstance(a, str) for a in extra):
+            raise ValueError("accept must be a string or a list of strings")
+    # topics and tags are index keys shared by thousands of records, so intern them
+    return (story, text, tuple(opts), idx, sys.intern(topic.strip().lower()), diff,
+            tuple(sys.intern(t.lower()) for t in tags), compile_answers(opts, idx, extra))
+
+class _QuestionSource:
+    # filtering and drawing shared by the in-memory QuestionBank and the
+    # mmap'd QuestionPack; subclasses supply __len__, get() and _postings()
+
+    def ids(self, topic=None, difficulty=None, tag=None):
+        picked = []
+        if topic is not None:
+            picked.append(self._postings("topic", topic.strip().lower()))
+        if difficulty is not None:
+            picked.append(self._postings("difficulty", difficulty))
+        if tag is not None:
+            picked.append(self._postings("tag", tag.strip().lower()))
+        if not picked:
+            return range(len(self))
+        if len(picked) == 1:
+            return picked[0]
+        picked.sort(key=len)
+        common = set(picked[0])
+        for other in picked[1:]:
+            common.intersection_update(other)
+        return sorted(common)
+
+    def draw(self, n=STAGE_COUNT, topic=None, tag=None, rng=random):
+        # n distinct questions, falling back to the whole bank when a filter
+        # is too narrow; ordered hardest first. play starts at the last door,
+        # so the first door opened gets the easiest and door 1 the hardest
+        pool = self.ids(topic=topic, tag=tag)
+        if len(pool) < n:
+            pool = range(len(self))
+        picked = [self.get(qid) for qid in rng.sample(pool, min(n, len(pool)))]
+        picked.sort(key=lambda q: -q["difficulty"])
+        return picked
+
+class QuestionBank(_QuestionSource):
+    def __init__(self):
+        self._items = []
+        self._seen = set()
+        self.by_topic = {}
+        self.by_difficulty = {}
+        self.by_tag = {}
+        self.rejected = 0
+        self.duplicates = 0
+        self.errors = []    # first few (source, reason) pairs
+
+    def __len__(self):
+        return len(self._items)
+
+    def _index(self, qid, item):
+        index = self.by_topic.get(item[4])
+        if index is None:
+            index = self.by_topic[item[4]] = array("I")
+        index.append(qid)
+        index = self.by_difficulty.get(item[5])
+        if index is None:
+            index = self.by_difficulty[item[5]] = array("I")
+        index.append(qid)
+        self._index_tags(qid, item[6])
+
+    def _index_tags(self, qid, tags):
+        for tag in tags:
+            index = self.by_tag.get(tag)
+            if index is None:
+                index = self.by_tag[tag] = array("I")
+            index.append(qid)
+
+    def _reject(self, source, reason):
+        self.rejected += 1
+        if len(self.errors) < QUESTION_ERRORS_KEPT:
+            self.errors.append((source, reason))
+
+    def add(self, rec, source=""):
+        try:
+            item = _parse_question(rec)
+        except ValueError as e:
+            self._reject(source, str(e))
+            return False
+        key = item[:2]
+        if key in self._seen:
+            self.duplicates += 1
+            return False
+        self._seen.add(key)
+        self._index(len(self._items), item)
+        self._items.append(item)
+        return True
+
+    def load(self, path):
+        # streams one pack into the bank; returns the number of questions added
+        before = len(self._items)
+        source = str(path)
+        items, seen, parse = self._items, self._seen, _parse_question
+        by_topic, by_difficulty = self.by_topic, self.by_difficulty
+        qid = before
+        for batch in iter_json_batches(path):
+            for rec in batch:
+                try:
+                    item = parse(rec)
+                except ValueError as e:
+                    self._reject(source, str(e))
+                    continue
+                key = item[:2]    # story + question: code questions share their question text
+                if key in seen:
+                    self.duplicates += 1
+                    continue
+                seen.add(key)
+                items.append(item)
+                # _index() inlined: this loop is the whole cost of a big pack
+                try:
+                    by_topic[item[4]].append(qid)
+                except KeyError:
+                    by_topic[item[4]] = array("I", (qid,))
+                try:
+                    by_difficulty[item[5]].append(qid)
+                except KeyError:
+                    by_difficulty[item[5]] = array("I", (qid,))
+                if item[6]:
+                    self._index_tags(qid, item[6])
+                qid += 1
+        return len(items) - before
+
+    def get(self, qid):
+        # the dict shape draw_stage/submit_answer expect
+        story, text, opts, idx, topic, diff, tags, accept = self._items[qid]
+        return {"story": story, "question": text, "answer": ANSWER_LETTERS[idx], "options": list(opts),
+                "topic": topic, "difficulty": diff, "tags": list(tags), "accept": accept, "id": qid}
+
+    def _postings(self, kind, key):
+        index = self.by_topic if kind == "topic" else self.by_difficulty if kind == "difficulty" else self.by_tag
+        return index.get(key, ())
+
+    def stats(self):
+        return {
+            "questions": len(self._items),
+            "rejected": self.rejected,
+            "duplicates": self.duplicates,
+            "topics": {k: len(v) for k, v in sorted(self.by_topic.items())},
+            "difficulty": {k: len(v) for k, v in sorted(self.by_difficulty.items())},
+            "tags": len(self.by_tag),
+        }
+
+# Compiled question packs
+# a .aqpack file is opened with mmap and read in place, so opening one costs
+# the same for 5 questions or 5 million. layout, all little-endian:
+#   header      PACK_HEADER (magic, version, counts, section offsets)
+#   records     PACK_RECORD per question: string ids for story/question/options,
+#               tag-list and accept-list offsets, answer, difficulty,
+#               option/tag/accept counts, topic id
+#   str_offsets u64 per string + 1, byte offsets into the pool
+#   names       u32 string id per topic, then per tag
+#   tag_lists   u16 tag ids referenced by records
+#   accept_lists u32 string ids of normalized free-text answers
+#   directory   (start, count) u32 pairs into postings: topics, difficulty 1..MAX, tags
+#   postings    u32 question ids grouped by topic / difficulty / tag
+#   pool        UTF-8 strings, deduplicated at build time
+PACK_EXT = ".aqpack"
+PACK_MAGIC = b"AQPK"
+PACK_VERSION = 2
+PACK_HEADER = struct.Struct("<4sHHIIII9Q")
+PACK_RECORD = struct.Struct("<6IIIBBBBHBB")
+PACK_ALIGN = 8
+PACK_NO_STRING = 0xFFFFFFFF
+QUESTION_PACK_EXTS = QUESTION_PACK_EXTS + (PACK_EXT,)
+
+def _pack_pad(f):
+    pos = f.tell()
+    if pos % PACK_ALIGN:
+        f.write(b"\0" * (PACK_ALIGN - pos % PACK_ALIGN))
+    return f.tell()
+
+def _pack_sources(sources):
+    # (name, batch) pairs from pack paths, or from in-memory record lists
+    for src in sources:
+        if isinstance(src, (str, Path)):
+            for batch in iter_json_batches(src):
+                yield str(src), batch
+        else:
+            yield "built-in", list(src)
+
+def build_question_pack(sources, out_path):
+    # streams validated questions into a compiled pack; the string pool goes
+    # to a temp file, so memory holds only the dedupe map and fixed-size tables
+    bank = QuestionBank()            # only used for its reject bookkeeping
+    strings = {}
+    str_offsets = array("Q", [0])
+    records = bytearray()
+    tag_lists = array("H")
+    accept_lists = array("I")
+    topics, tags = {}, {}
+    by_topic, by_difficulty, by_tag = [], [array("I") for _ in range(MAX_DIFFICULTY)], []
+    seen = set()
+    out_path = Path(out_path)
+    pool = tempfile.TemporaryFile(dir=str(out_path.parent))
+    try:
+        def sid(text):
+            i = strings.get(text)
+            if i is None:
+                i = strings[text] = len(strings)
+                data = text.encode("utf-8")
+                pool.write(data)
+                str_offsets.append(str_offsets[-1] + len(data))
+            return i
+
+        def name_id(table, postings, name):
+            i = table.get(name)
+            if i is None:
+                if len(table) >= 0xFFFF:
+                    raise ValueError("too many distinct topics or tags for a pack")
+                i = table[name] = len(table)
+                postings.append(array("I"))
+            return i
+
+        count = 0
+        for source, batch in _pack_sources(sources):
+            for rec in batch:
+                try:
+                    story, text, opts, idx, topic, diff, qtags, accept = _parse_question(rec)
+                except ValueError as e:
+                    bank._reject(source, str(e))
+                    continue
+                key = (story, text)
+                if key in seen:
+                    bank.duplicates += 1
+                    continue
+                seen.add(key)
+                opt_ids = [sid(o) for o in opts] + [PACK_NO_STRING] * (len(ANSWER_LETTERS) - len(opts))
+                topic_id = name_id(topics, by_topic, topic)
+                qtags = qtags[:255]
+                tag_ids = [name_id(tags, by_tag, t) for t in qtags]
+                accept_ids = [sid(a) for a in sorted(accept)]
+                records += PACK_RECORD.pack(sid(story), sid(text), *opt_ids, len(tag_lists), len(accept_lists),
+                                            idx, diff, len(opts), len(tag_ids), topic_id, len(accept_ids), 0)
+                tag_lists.extend(tag_ids)
+                accept_lists.extend(accept_ids)
+                by_topic[topic_id].append(count)
+                by_difficulty[diff - 1].append(count)
+                for t in tag_ids:
+                    by_tag[t].append(count)
+                count += 1
+        names = array("I", [sid(t) for t in topics] + [sid(t) for t in tags])
+        directory, postings = array("I"), array("I")
+        for ids in by_topic + by_difficulty + by_tag:
+            directory.extend((len(postings), len(ids)))
+            postings.extend(ids)
+        if str_offsets[-1] > 0xFFFFFFFFFFFF or len(postings) > 0xFFFFFFFF:
+            raise ValueError("pack too large")
+
+        tmp = out_path.with_name(out_path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(b"\0" * PACK_HEADER.size)
+            offsets = []
+            for section in (records, str_offsets, names, tag_lists, accept_lists, directory, postings):
+                offsets.append(_pack_pad(f))
+                f.write(section)
+            offsets.append(_pack_pad(f))
+            pool.seek(0)
+            shutil.copyfileobj(pool, f, MERGE_READ_BYTES)
+            offsets.append(f.tell())
+            f.seek(0)
+            f.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, 0, count, len(strings), len(topics), len(tags), *offsets))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, out_path)
+    finally:
+        pool.close()
+    return count, bank
+
+class QuestionPack(_QuestionSource):
+    def __init__(self, path):
+        self.path = str(path)
+        self._mm = None
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = names = None
+        try:
+            (magic, version, _, self._count, n_strings, n_topics, n_tags,
+             rec_at, offs_at, names_at, tags_at, accept_at, dir_at, post_at, pool_at, end) = PACK_HEADER.unpack_from(self._mm, 0)
+            if magic != PACK_MAGIC or version != PACK_VERSION or end > len(self._mm):
+                raise ValueError(f"{path}: not a version {PACK_VERSION} question pack")
+            view = memoryview(self._mm)
+            self._rec_at = rec_at
+            self._str_offsets = view[offs_at:offs_at + 8 * (n_strings + 1)].cast("Q")
+            self._tag_lists = view[tags_at:accept_at].cast("H")
+            self._accept_lists = view[accept_at:dir_at].cast("I")
+            self._postings_view = view[post_at:pool_at].cast("I")
+            self._directory = view[dir_at:post_at].cast("I")
+            self._pool = view[pool_at:end]
+            names = view[names_at:names_at + 4 * (n_topics + n_tags)].cast("I")
+            # name tables are the only thing decoded up front: topics + tags, not questions
+            self._topic_names = [self._string(names[i]) for i in range(n_topics)]
+            self._tag_names = [self._string(names[n_topics + i]) for i in range(n_tags)]
+            # name -> directory slot
+            self.topics = {name: i for i, name in enumerate(self._topic_names)}
+            self.tags = {name: n_topics + MAX_DIFFICULTY + i for i, name in enumerate(self._tag_names)}
+        except Exception as e:
+            # these still export the mmap's buffer, and close() fails while they do
+            view = names = None
+            self.close()
+            if type(e) is ValueError:
+                raise
+            raise ValueError(f"{path}: corrupt question pack") from e
+        self.rejected = 0
+        self.duplicates = 0
+        self.errors = []
+
+    def close(self):
+        for name in ("_str_offsets", "_tag_lists", "_accept_lists", "_postings_view", "_directory", "_pool"):
+            view = self.__dict__.pop(name, None)
+            if view is not None:
+                view.release()
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+    def __len__(self):
+        return self._count
+
+    def _string(self, sid):
+        if sid == PACK_NO_STRING:
+            return ""
+        return str(self._pool[self._str_offsets[sid]:self._str_offsets[sid + 1]], "utf-8")
+
+    def get(self, qid):
+        if not 0 <= qid < self._count:
+            raise IndexError(qid)
+        (story, text, o0, o1, o2, o3, tags_at, accept_at, idx, diff, n_opts, n_tags, topic, n_accept, _) = \
+            PACK_RECORD.unpack_from(self._mm, self._rec_at + qid * PACK_RECORD.size)
+        opts = [self._string(o) for o in (o0, o1, o2, o3)[:n_opts]]
+        qtags = [self._tag_names[t] for t in self._tag_lists[tags_at:tags_at + n_tags]]
+        # stored already normalized, so this is just decoding
+        accept = frozenset(self._string(a) for a in self._accept_lists[accept_at:accept_at + n_accept])
+        return {"story": self._string(story), "question": self._string(text), "answer": ANSWER_LETTERS[idx], "options": opts,
+                "topic": self._topic_names[topic], "difficulty": diff, "tags": qtags, "accept": accept, "id": qid}
+
+    def _slot(self, slot):
+        start, count = self._directory[2 * slot], self._directory[2 * slot + 1]
+        return self._postings_view[start:start + count]
+
+    def _postings(self, kind, key):
+        if kind == "topic":
+            slot = self.topics.get(key)
+        elif kind == "difficulty":
+            slot = len(self.topics) + key - 1 if 1 <= key <= MAX_DIFFICULTY else None
+        else:
+            slot = self.tags.get(key)
+        return () if slot is None else self._slot(slot)
+
+    def stats(self):
+        return {
+            "questions": self._count,
+            "rejected": 0,
+            "duplicates": 0,
+            "topics": {k: len(self._slot(v)) for k, v in sorted(self.topics.items())},
+            "difficulty": {d: len(self._postings("difficulty", d)) for d in range(1, MAX_DIFFICULTY + 1) if len(self._postings("difficulty", d))},
+            "tags": len(self.tags),
+        }
+
+def question_pack_paths(spec=None):
+    # files named in spec (or $ADVENTURE_QUIZ_QUESTIONS), else the questions/ dir;
+    # directories expand to their .json/.jsonl files in name order
+    spec = spec if spec is not None else QUESTION_PACKS
+    roots = [Path(p) for p in spec.split(os.pathsep) if p] if spec else [QUESTIONS_DIR]
+    paths = []
+    for root in roots:
+        if root.is_dir():
+            paths.extend(sorted(p for p in root.iterdir() if p.suffix.lower() in QUESTION_PACK_EXTS))
+        elif root.exists():
+            paths.append(root)
+        elif spec:
+            print("question pack not found:", root)
+    return paths
+
+@traced("load_question_bank")
+def load_question_bank(paths=None):
+    paths = question_pack_paths() if paths is None else list(paths)
+    compiled = [p for p in paths if Path(p).suffix.lower() == PACK_EXT]
+    if compiled:
+        # a compiled pack is used on its own; JSON packs should be built into it
+        try:
+            pack = QuestionPack(compiled[0])
+            if len(paths) > 1:
+                print(f"Using compiled pack {compiled[0]}; ignoring {len(paths) - 1} other pack(s)")
+            if len(pack) >= STAGE_COUNT:
+                print(f"Opened {len(pack)} questions from {compiled[0]}")
+                return pack
+            pack.close()
+        except Exception as e:
+            print("question pack error:", compiled[0], e)
+        paths = [p for p in paths if p not in compiled]
+    bank = QuestionBank()
+    for path in paths:
+        try:
+            added = bank.load(path)
+            print(f"Loaded {added} questions from {path}")
+        except Exception as e:
+            print("question pack error:", path, e)
+    if bank.rejected:
+        print(f"{bank.rejected} invalid questions skipped, e.g. {bank.errors[0][1]}")
+    if len(bank) < STAGE_COUNT:
+        # not enough for a session: fall back to the built-in questions
+        for rec in questions:
+            bank.add(rec, "built-in")
+    return bank
+
+_question_bank = None
+
+def get_question_bank():
+    global _question_bank
+    if _question_bank is None:
+        _question_bank = load_question_bank()
+    return _question_bank
+
+# Code-output questions
+# "what does this print?" questions whose answer comes from actually running
+# the snippet. Snippets run in a pool of pre-started `python -I -S` workers,
+# each in an empty temp dir with address-space and file-size limits, and are
+# killed and replaced when they overrun the wall-clock timeout. This is a
+# guard against accidents, not hostile code. Replies go over a pipe the worker
+# moves off fd 1 and carry a per-run nonce, so a snippet writing to the raw
+# stdout can't forge a result. Finished runs are cached in SQLite by a hash
+# of the snippet and the Python version; timeouts, crashes and memory-limit
+# hits depend on the limits in force, so they are run again next time
+CODE_CACHE_PATH = SCRIPT_DIR / "code_cache.sqlite"
+CODE_TIMEOUT = 2.0               # wall-clock seconds per snippet
+CODE_MEMORY_MB = 256             # address-space limit per worker (POSIX only)
+CODE_MAX_OUTPUT = 4096           # captured stdout kept per run
+CODE_MAX_LINES = 4               # what fits in the stage's story box
+CODE_MAX_ANSWER = 40             # longest printed output usable as an option
+CODE_WORKER_JOBS = 500           # snippets a worker runs before it is replaced
+CODE_ERROR_OPTION = "Error"
+CODE_CRASHED = "worker crashed"
+CODE_OUT_OF_MEMORY = "memory limit"
+CODE_QUESTION_TEXT = "What does this code print?"
+
+_SANDBOX_WORKER = r"""
+import sys, io, json, contextlib
+try:
+    import resource
+    mem = int(sys.argv[1])
+    resource.setrlimit(resource.RLIMIT_AS, (mem, mem))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (1 << 20, 1 << 20))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+except Exception:
+    pass
+import os
+# replies leave on a private copy of the pipe; fd 1 itself goes to /dev/null
+proto_out = os.fdopen(os.dup(1), "w", encoding="utf-8")
+os.dup2(os.open(os.devnull, os.O_WRONLY), 1)
+proto_in, limit = sys.stdin, int(sys.argv[2])
+
+class Capped(io.StringIO):
+    # keeps the first `limit` characters, so an endless print loop runs into the timeout
+    def write(self, text):
+        room = limit - self.tell()
+        if room > 0:
+            super().write(text[:room])
+        return len(text)
+
+def run(code):
+    buf = Capped()
+    sys.stdin = io.StringIO("")
+    ok, err, oom = True, None, False
+    try:
+        with contextlib.redirect_stdout(buf):
+            exec(compile(code, "<snippet>", "exec"), {"__name__": "__main__", "__builtins__": __builtins__})
+    except MemoryError:
+        ok, err, oom = False, "MemoryError", True
+    except BaseException as e:
+        ok, err = False, (type(e).__name__ + ": " + str(e))[:200]
+    finally:
+        sys.stdin = proto_in
+    return ok, buf.getvalue(), err, oom
+
+for line in proto_in:
+    job = json.loads(line)
+    nonce = job.pop("nonce")
+    ok, out, err, oom = run(job.pop("code"))
+    proto_out.write(json.dumps({"nonce": nonce, "ok": ok, "out": out, "error": err, "oom": oom}) + "\n")
+    proto_out.flush()
+"""
+
+def snippet_key(code):
+    version = "%d.%d" % sys.version_info[:2]
+    return hashlib.sha256(f"{version}\0{code}".encode("utf-8")).hexdigest()
+
+class SandboxPool:
+    def __init__(self, workers=None, timeout=CODE_TIMEOUT, memory_mb=CODE_MEMORY_MB):
+        if os.name != "posix":
+            raise RuntimeError("the snippet sandbox needs a POSIX system (select on pipes, rlimits)")
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.timeout = timeout
+        self.memory = int(memory_mb) * 1024 * 1024
+        self._cwd = tempfile.mkdtemp(prefix="aq-sandbox-")
+        self._procs = [self._spawn() for _ in range(self.workers)]
+        self.executed = 0
+        self.timeouts = 0
+
+    def _spawn(self):
+        proc = subprocess.Popen([sys.executable, "-I", "-S", "-c", _SANDBOX_WORKER, str(self.memory), str(CODE_MAX_OUTPUT)],
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                cwd=self._cwd, env={"PYTHONIOENCODING": "utf-8"}, text=True, encoding="utf-8")
+        proc.jobs = 0
+        return proc
+
+    def _replace(self, slot):
+        proc = self._procs[slot]
+        try:
+            proc.kill()
+            proc.wait(5)
+        except Exception:
+            pass
+        self._procs[slot] = self._spawn()
+
+    def _run_one(self, slot, code):
+        proc = self._procs[slot]
+        if proc.jobs >= CODE_WORKER_JOBS or proc.poll() is not None:
+            self._replace(slot)
+            proc = self._procs[slot]
+        proc.jobs += 1
+        nonce = uuid.uuid4().hex
+        try:
+            proc.stdin.write(json.dumps({"nonce": nonce, "code": code}) + "\n")
+            proc.stdin.flush()
+            ready, _, _ = select.select([proc.stdout], [], [], self.timeout)
+            if not ready:
+                self.timeouts += 1
+                self._replace(slot)
+                return {"ok": False, "out": "", "error": "Timeout", "timeout": True}
+            line = proc.stdout.readline()
+            reply = json.loads(line)
+            if reply["nonce"] != nonce:
+                raise ValueError("reply for another run")
+            if reply["oom"]:
+                return {"ok": False, "out": "", "error": CODE_OUT_OF_MEMORY, "timeout": False}
+            return {"ok": reply["ok"], "out": reply["out"], "error": reply["error"], "timeout": False}
+        except (OSError, ValueError, KeyError):
+            # the snippet killed its worker or wrote over the protocol pipe
+            self._replace(slot)
+            return {"ok": False, "out": "", "error": CODE_CRASHED, "timeout": False}
+
+    def run(self, snippets):
+        # results in input order; one thread drives each worker process
+        jobs = queue.SimpleQueue()
+        for i, code in enumerate(snippets):
+            jobs.put((i, code))
+        results = [None] * len(snippets)
+
+        def drive(slot):
+            while True:
+                try:
+                    i, code = jobs.get_nowait()
+                except queue.Empty:
+                    return
+                results[i] = self._run_one(slot, code)
+
+        threads = [threading.Thread(target=drive, args=(slot,), daemon=True) for slot in range(self.workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.executed += len(snippets)
+        return results
+
+    def close(self):
+        for proc in self._procs:
+            try:
+                proc.stdin.close()
+                proc.wait(2)
+            except Exception:
+                proc.kill()
+        self._procs = []
+        shutil.rmtree(self._cwd, ignore_errors=True)
+
+class CodeResultCache:
+    def __init__(self, path=CODE_CACHE_PATH):
+        self._db = sqlite3.connect(str(path))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, ok INTEGER, out TEXT, error TEXT, timeout INTEGER)")
+
+    def get_many(self, keys):
+        found = {}
+        keys = list(keys)
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = self._db.execute(f"SELECT key, ok, out, error, timeout FROM results WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+            for key, ok, out, error, timeout in rows:
+                found[key] = {"ok": bool(ok), "out": out, "error": error, "timeout": bool(timeout)}
+        return found
+
+    def put_many(self, items):
+        with self._db:
+            self._db.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                                 [(k, int(r["ok"]), r["out"], r["error"], int(r["timeout"])) for k, r in items])
+
+    def close(self):
+        self._db.close()
+
+def finished_run(result):
+    # whether the snippet ran to an answer of its own, rather than into a limit
+    return not result["timeout"] and result["error"] not in (CODE_CRASHED, CODE_OUT_OF_MEMORY)
+
+def run_snippets(snippets, pool, cache=None):
+    # one result per snippet; cached and repeated snippets are not run again
+    keys = [snippet_key(code) for code in snippets]
+    known = cache.get_many(set(keys)) if cache is not None else {}
+    todo = {}
+    for key, code in zip(keys, snippets):
+        if key not in known and key not in todo:
+            todo[key] = code
+    if todo:
+        fresh = dict(zip(todo, pool.run(list(todo.values()))))
+        if cache is not None:
+            cache.put_many((k, r) for k, r in fresh.items() if finished_run(r))
+        known.update(fresh)
+    return [known[key] for key in keys], len(todo)
+
+def _code_distractors(answer, rng):
+    # plausible wrong outputs when a snippet record doesn't list its own
+    if answer == CODE_ERROR_OPTION:
+        out = ["None", "0", "True", "False", "''"]
+        rng.shuffle(out)
+        return out
+    out = [CODE_ERROR_OPTION, "None"]
+    try:
+        n = int(answer)
+        out += [str(n + 1), str(n - 1), str(n * 2), f"'{n}'"]
+    except ValueError:
+        try:
+            x = float(answer)
+            out += [str(int(x)), str(x * 2), str(round(x + 1, 2))]
+        except ValueError:
+            out += [f"'{answer}'", answer.upper(), answer[::-1]]
+    rng.shuffle(out)
+    return out
+
+def make_code_question(rec, result):
+    # a regular question record from a snippet record plus its sandbox result
+    code = rec["snippet"].rstrip()
+    if result["timeout"]:
+        raise ValueError("snippet timed out")
+    if result["error"] == CODE_CRASHED:
+        raise ValueError("snippet killed its sandbox worker")
+    if result["error"] == CODE_OUT_OF_MEMORY:
+        raise ValueError("snippet hit the memory limit")
+    if result["ok"]:
+        printed = result["out"].rstrip("\n")
+        if not printed:
+            raise ValueError("snippet prints nothing")
+        if "\n" in printed:
+            raise ValueError("output spans several lines")
+        if len(printed) > CODE_MAX_ANSWER:
+            raise ValueError("output too long for an option")
+        answer = printed
+    else:
+        answer = CODE_ERROR_OPTION
+    rng = random.Random(snippet_key(code))
+    wrong = [str(d) for d in rec.get("distractors") or [] if str(d) != answer]
+    wrong += [d for d in _code_distractors(answer, rng) if d != answer and d not in wrong]
+    opts = [answer] + wrong[:len(ANSWER_LETTERS) - 1]
+    rng.shuffle(opts)
+    tags = list(rec.get("tags") or [])
+    return {"story": code, "question": rec.get("question") or CODE_QUESTION_TEXT, "options": opts,
+            "answer": ANSWER_LETTERS[opts.index(answer)], "topic": rec.get("topic") or "code-output",
+            "difficulty": rec.get("difficulty", DEFAULT_DIFFICULTY), "tags": tags + ["code-output"]}
+
+def build_code_questions(paths, out_path, pool, cache=None):
+    # snippet records ({"snippet": ..., optional story fields}) -> JSONL question pack
+    report = QuestionBank()          # reject bookkeeping only
+    records = []
+    for source, batch in _pack_sources(paths):
+        for rec in batch:
+            code = rec.get("snippet") if isinstance(rec, dict) else None
+            if not isinstance(code, str) or not code.strip():
+                report._reject(source, "missing snippet")
+            elif code.rstrip().count("\n") >= CODE_MAX_LINES:
+                report._reject(source, f"snippet longer than {CODE_MAX_LINES} lines")
+            else:
+                records.append((source, rec))
+    results, executed = run_snippets([rec["snippet"].rstrip() for _, rec in records], pool, cache)
+    out_path = Path(out_path)
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    written = 0
+    with open(tmp, "w", encoding="utf-8") as f:
+        for (source, rec), result in zip(records, results):
+            try:
+                q = make_code_question(rec, result)
+                _parse_question(q)
+            except ValueError as e:
+                report._reject(source, f"{rec['snippet'].splitlines()[0][:30]}: {e}")
+                continue
+            f.write(json.dumps(q, ensure_ascii=False) + "\n")
+            written += 1
+    os.replace(tmp, out_path)
+    return written, executed, report
+
+# Adaptive difficulty
+# Rasch-style ratings on a logit scale: P(correct) = 1 / (1 + exp(b - theta)),
+# with theta per player and b per question, both nudged Elo-style after each
+# answer. Unplayed questions sit at the rating of their pack difficulty level
+# and are drawn from the bank's difficulty postings; played ones move into a
+# bisect-sorted index, so finding the question closest to the target
+# probability is a bisect plus a short walk, never a scan of the bank
+ADAPTIVE_ENABLED = os.environ.get("ADVENTURE_QUIZ_ADAPTIVE", "1") not in ("0", "false", "no", "off")
+RATINGS_PATH = SCRIPT_DIR / "ratings.json"
+ADAPTIVE_TARGET_P = 0.7          # chance of a correct answer the next question aims for
+DIFFICULTY_RATING_STEP = 0.8     # logits between pack difficulty levels, centred on the middle level
+PLAYER_K = (0.6, 0.15)           # (first answer, floor) step sizes for player ability
+ITEM_K = (0.4, 0.05)             # ...and for question difficulty
+ADAPTIVE_SCAN_LIMIT = 64         # rated neighbours walked past (already used) around the target
+ADAPTIVE_LEVEL_TRIES = 16        # random picks per difficulty level before trying the next one
+
+def difficulty_rating(level):
+    return (level - (MAX_DIFFICULTY + 1) / 2.0) * DIFFICULTY_RATING_STEP
+
+def answer_probability(theta, b):
+    return 1.0 / (1.0 + math.exp(b - theta))
+
+def _k_factor(k, n):
+    first, floor = k
+    return max(floor, first / (1.0 + n / 10.0))
+
+class AdaptiveEngine:
+    def __init__(self, bank, path=RATINGS_PATH, rng=random):
+        self.bank = bank
+        self.path = Path(path) if path else None
+        self.rng = rng
+        self.players = {}      # player key -> [theta, answers]
+        self.items = {}        # question id -> [b, answers]
+        self._keys = []        # sorted b of rated questions
+        self._ids = []         # question ids, parallel to _keys
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+    @staticmethod
+    def player_key(name):
+        return (name or "").strip().lower()
+
+    def _load(self):
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for key, (theta, n) in data.get("players", {}).items():
+                self.players[key] = [float(theta), int(n)]
+            # ratings are keyed by question id, which is only stable for the
+            # same packs; the stored question text catches a reshuffled bank
+            for qid, (b, n, text) in data.get("items", {}).items():
+                qid = int(qid)
+                if 0 <= qid < len(self.bank) and self.bank.get(qid)["question"] == text:
+                    self.items[qid] = [float(b), int(n)]
+        except Exception as e:
+            print("ratings load error:", e)
+        pairs = sorted((b, qid) for qid, (b, _) in self.items.items())
+        self._keys = [b for b, _ in pairs]
+        self._ids = [qid for _, qid in pairs]
+
+    def ability(self, player):
+        rec = self.players.get(self.player_key(player))
+        return rec[0] if rec else 0.0
+
+    def rating(self, qid):
+        rec = self.items.get(qid)
+        return rec[0] if rec else difficulty_rating(self.bank.get(qid)["difficulty"])
+
+    def select(self, player, exclude=(), target_p=ADAPTIVE_TARGET_P):
+        # id of the question whose predicted success chance is closest to target_p
+        with self._lock:
+            target = self.ability(player) - math.log(target_p / (1.0 - target_p))
+            best, best_d = None, float("inf")
+            keys, ids = self._keys, self._ids
+            hi = bisect.bisect_left(keys, target)
+            lo = hi - 1
+            for _ in range(ADAPTIVE_SCAN_LIMIT):
+                if lo < 0 and hi >= len(keys):
+                    break
+                if hi >= len(keys) or (lo >= 0 and target - keys[lo] <= keys[hi] - target):
+                    i, lo = lo, lo - 1
+                else:
+                    i, hi = hi, hi + 1
+                if ids[i] not in exclude:
+                    best, best_d = ids[i], abs(keys[i] - target)
+                    break
+            levels = sorted(range(1, MAX_DIFFICULTY + 1), key=lambda lvl: abs(difficulty_rating(lvl) - target))
+            for level in levels:
+                d = abs(difficulty_rating(level) - target)
+                if d >= best_d:
+                    break
+                pool = self.bank.ids(difficulty=level)
+                if not len(pool):
+                    continue
+                for _ in range(ADAPTIVE_LEVEL_TRIES):
+                    qid = pool[self.rng.randrange(len(pool))]
+                    if qid not in self.items and qid not in exclude:
+                        return qid
+            return best
+
+    def record(self, player, qid, correct):
+        # Elo-style update of both ratings; returns the predicted probability
+        with self._lock:
+            key = self.player_key(player)
+            prec = self.players.setdefault(key, [0.0, 0])
+            irec = self.items.get(qid)
+            b = irec[0] if irec else difficulty_rating(self.bank.get(qid)["difficulty"])
+            p = answer_probability(prec[0], b)
+            surprise = (1.0 if correct else 0.0) - p
+            prec[0] += _k_factor(PLAYER_K, prec[1]) * surprise
+            prec[1] += 1
+            if irec is None:
+                irec = self.items[qid] = [b, 0]
+            else:
+                i = bisect.bisect_left(self._keys, b)
+                while self._ids[i] != qid:
+                    i += 1
+                del self._keys[i], self._ids[i]
+            irec[0] = b - _k_factor(ITEM_K, irec[1]) * surprise
+            irec[1] += 1
+            i = bisect.bisect_right(self._keys, irec[0])
+            self._keys.insert(i, irec[0])
+            self._ids.insert(i, qid)
+            self._dirty = True
+            return p
+
+    def _snapshot(self):
+        with self._lock:
+            self._dirty = False
+            return {
+                "players": {k: list(v) for k, v in self.players.items()},
+                "items": {str(qid): [b, n, self.bank.get(qid)["question"]] for qid, (b, n) in self.items.items()},
+            }
+
+    @traced("ratings save", cat="io")
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        with self._save_lock:
+            try:
+                _atomic_write_json(self.path, self._snapshot())
+            except Exception as e:
+                self._dirty = True
+                print("ratings save error:", e)
+
+    def save_async(self):
+        # called at the end of a session; the write happens off the Tk thread
+        if self._dirty:
+            threading.Thread(target=self.save, name="ratings-save", daemon=True).start()
+
+_adaptive_engine = None
+
+def get_adaptive_engine():
+    global _adaptive_engine
+    if _adaptive_engine is None and ADAPTIVE_ENABLED:
+        _adaptive_engine = AdaptiveEngine(get_question_bank())
+        atexit.register(_adaptive_engine.save)
+    return _adaptive_engine
+
+# Quiz rules
+# the game rules without Tk: door gating, lives, keys and when the run ends.
+# AdventureQuiz wraps one QuizSession per run and only turns its results into
+# screens, so sessions can also be driven headless for tuning and regression
+START_LIVES = 3
+
+class QuizSession:
+    __slots__ = ("player", "questions", "lives", "keys_collected", "completed", "unlocked",
+                 "stage", "finished", "engine", "used")
+
+    def __init__(self, player="", stage_questions=None, lives=START_LIVES, engine=None):
+        self.player = player
+        self.questions = list(questions if stage_questions is None else stage_questions)
+        self.lives = lives
+        self.keys_collected = 0
+        self.completed = set()
+        self.unlocked = {len(self.questions)}   # play starts at the last door
+        self.stage = None
+        self.finished = False
+        self.engine = engine
+        self.used = set()
+
+    @property
+    def success(self):
+        return self.keys_collected >= len(self.questions) and self.lives > 0
+
+    def can_enter(self, door):
+        return not self.finished and door in self.unlocked
+
+    def enter(self, door):
+        # the question behind the door, or None if it is still locked
+        if not self.can_enter(door):
+            return None
+        self.stage = door
+        if self.engine is not None:
+            try:
+                qid = self.engine.select(self.player, exclude=self.used)
+                if qid is not None:
+                    self.questions[door - 1] = self.engine.bank.get(qid)
+            except Exception as e:
+                print("adaptive select error:", e)
+        return self.questions[door - 1]
+
+    def answer(self, given):
+        # True/False for the current stage's question, None outside a stage
+        stage = self.stage
+        if stage is None or self.finished:
+            return None
+        q = self.questions[stage - 1]
+        correct = check_answer(q, given)
+        qid = q.get("id")
+        if qid is not None:
+            self.used.add(qid)
+            if self.engine is not None:
+                try: self.engine.record(self.player, qid, correct)
+                except Exception as e: print("adaptive record error:", e)
+        self.stage = None
+        if correct:
+            self.keys_collected += 1
+            self.completed.add(stage)
+            if stage > 1:
+                self.unlocked.add(stage - 1)
+            else:
+                self.finished = True
+        else:
+            self.lives -= 1
+            if self.lives <= 0:
+                self.finished = True
+        return correct
+
+def simulate_sessions(count, bank=None, p_correct=0.75, engine=None, rng=None, redraw=True):
+    # plays count sessions with a player who is right with probability p_correct;
+    # returns (wins, total keys, total answers)
+    rng = rng or random.Random()
+    bank = bank if bank is not None else get_question_bank()
+    fixed = bank.draw(STAGE_COUNT, rng=rng)
+    rand = rng.random
+    wins = keys = answers = 0
+    for i in range(count):
+        session = QuizSession(f"sim{i % 1000}", bank.draw(STAGE_COUNT, rng=rng) if redraw else fixed, engine=engine)
+        door = len(session.questions)
+        while not session.finished:
+            q = session.enter(door)
+            if session.answer(q["answer"] if rand() < p_correct else "-"):
+                door -= 1
+            answers += 1
+        wins += session.success
+        keys += session.keys_collected
+    return wins, keys, answers
+
+# Session analytics
+# the Tk thread only builds a tuple and puts it on a SimpleQueue (a C-level queue
+# with no Python-side locking); a daemon writer batches records into a JSONL file
+# that is rolled into a timestamped .jsonl.gz once it grows past ANALYTICS_ROLL_BYTES
+ANALYTICS_ENABLED = os.environ.get("ADVENTURE_QUIZ_ANALYTICS", "1") not in ("0", "false", "no", "off")
+ANALYTICS_DIR = SCRIPT_DIR / "analytics"
+ANALYTICS_BATCH = 256
+ANALYTICS_FLUSH_INTERVAL = 1.0
+ANALYTICS_ROLL_BYTES = 4 * 1024 * 1024
+
+class EventLog:
+    _STOP = object()
+
+    def __init__(self, directory, enabled=True):
+        self.directory = Path(directory)
+        self.enabled = enabled
+        self.t0 = time.perf_counter()
+        self.wall0 = time.time()
+        self._q = queue.SimpleQueue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.dropped = 0
+
+    def log(self, kind, **fields):
+        if not self.enabled:
+            return
+        if self._thread is None:
+            self._start()
+        self._q.put((time.perf_counter(), kind, fields))
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="event-log-writer", daemon=True)
+                self._thread.start()
+
+    def _current_path(self):
+        return self.directory / "events-current.jsonl"
+
+    def _roll(self, fh):
+        # close the live file and gzip it under a timestamped name
+        path = self._current_path()
+        fh.close()
+        try:
+            if path.exists() and path.stat().st_size > 0:
+                stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+                with open(path, "rb") as src, gzip.open(self.directory / f"events-{stamp}.jsonl.gz", "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                path.unlink()
+        except Exception as e:
+            print("analytics roll error:", e)
+        return open(path, "a", encoding="utf-8")
+
+    def _run(self):
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fh = open(self._current_path(), "a", encoding="utf-8")
+        except Exception as e:
+            print("analytics disabled:", e)
+            self.enabled = False
+            return
+        header = {"t": 0.0, "e": "log_open", "wall": self.wall0, "pid": os.getpid()}
+        fh.write(json.dumps(header, separators=(",", ":")) + "\n")
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                batch.append(self._q.get(timeout=ANALYTICS_FLUSH_INTERVAL))
+                while len(batch) < ANALYTICS_BATCH:
+                    batch.append(self._q.get_nowait())
+            except queue.Empty:
+                pass
+            lines = []
+            for item in batch:
+                if item is self._STOP:
+                    stopping = True
+                    continue
+                t, kind, fields = item
+                rec = {"t": round(t - self.t0, 6), "e": kind}
+                # "t" and "e" are reserved; caller fields never overwrite them
+                rec.update((k, v) for k, v in fields.items() if k not in rec)
+                try:
+                    lines.append(json.dumps(rec, ensure_ascii=False, separators=(",", ":"), default=str))
+                except Exception:
+                    self.dropped += 1
+            if lines:
+                try:
+                    with TRACE.span("analytics write", cat="io", events=len(lines)):
+                        fh.write("\n".join(lines) + "\n")
+                        fh.flush()
+                    if fh.tell() >= ANALYTICS_ROLL_BYTES:
+                        fh = self._roll(fh)
+                except Exception as e:
+                    print("analytics write error:", e)
+        try:
+            self._roll(fh).close()
+        except Exception:
+            pass
+
+    def close(self, timeout=2.0):
+        if self._thread is None:
+            return
+        self._q.put(self._STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            # still draining: keep tracking it so a later close() can wait again
+            print("analytics close: writer still running after", timeout, "s")
+            return
+        self._thread = None
+
+EVENTS = EventLog(ANALYTICS_DIR, enabled=ANALYTICS_ENABLED)
+atexit.register(lambda: EVENTS.close())
+
+# Score persistence worker
+# finished games hand their score to a background thread so the leaderboard
+# write (journal append, fsync, compaction or a SQLite transaction) never runs
+# inside redraw(); results come back on a queue the Tk thread drains each frame
+SCORE_QUEUE_SIZE = 64
+SCORE_SAVE_RETRIES = 4
+SCORE_RETRY_DELAY = 0.25     # seconds, doubled after every failed attempt
+SCORE_FLUSH_TIMEOUT = 5.0
+
+class ScoreSaver:
+    _STOP = object()
+
+    def __init__(self, store_getter):
+        self._store_getter = store_getter
+        self._q = queue.Queue(maxsize=SCORE_QUEUE_SIZE)
+        self._results = queue.SimpleQueue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self.failed = []
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="score-saver", daemon=True)
+                self._thread.start()
+
+    def submit(self, entry):
+        # never blocks the caller: with the queue full the score waits for flush() on exit
+        self._start()
+        try:
+            self._q.put_nowait(entry)
+        except queue.Full:
+            self.failed.append(entry)
+            self._results.put((entry, None, queue.Full("score queue full")))
+            return entry
+        with self._pending_lock:
+            self._pending += 1
+        return entry
+
+    def _save(self, entry):
+        delay = SCORE_RETRY_DELAY
+        error = None
+        for attempt in range(SCORE_SAVE_RETRIES):
+            try:
+                with self._save_lock:       # flush() may save beside a worker that overran its timeout
+                    store = self._store_getter()
+                    store.add(entry)
+                    try:
+                        placement = store.placement(entry["score"])
+                    except Exception:
+                        placement = None
+                self._results.put((entry, placement, None))
+                break
+            except Exception as e:
+                error = e
+                print(f"score save attempt {attempt + 1} failed:", e)
+                if attempt + 1 < SCORE_SAVE_RETRIES:
+                    time.sleep(delay)
+                    delay *= 2
+        else:
+            self.failed.append(entry)
+            self._results.put((entry, None, error))
+        with self._pending_lock:
+            self._pending -= 1
+
+    def _run(self):
+        while True:
+            entry = self._q.get()
+            if entry is self._STOP:
+                return
+            with TRACE.span("score save", cat="io"):
+                self._save(entry)
+
+    def poll(self):
+        # (entry, placement, error) tuples finished since the last call; Tk thread only
+        out = []
+        while True:
+            try:
+                out.append(self._results.get_nowait())
+            except queue.Empty:
+                return out
+
+    def flush(self, timeout=SCORE_FLUSH_TIMEOUT):
+        # drain the queue on exit and give failed scores one more try; a worker
+        # still busy after timeout keeps its current entry, the rest are saved here
+        thread = self._thread
+        if thread is not None:
+            try:
+                self._q.put(self._STOP, timeout=timeout)
+            except queue.Full:
+                pass
+            thread.join(timeout)
+        queued = []
+        while True:
+            try:
+                entry = self._q.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not self._STOP:
+                queued.append(entry)
+        if thread is not None:
+            if thread.is_alive():
+                try:
+                    self._q.put_nowait(self._STOP)
+                except queue.Full:
+                    pass
+            else:
+                self._thread = None
+        retry, self.failed = self.failed, []
+        with self._pending_lock:
+            self._pending += len(retry)
+        for entry in queued + retry:
+            self._save(entry)
+        try:
+            self._store_getter().sync()
+        except Exception:
+            pass
+
+SCORE_SAVER = ScoreSaver(lambda: LEADERBOARD)
+atexit.register(lambda: SCORE_SAVER.flush())
+
 # Font helper
 def pick_pixel_like_font(root, preferred_names=None, body_size=18, title_size=36):
     if preferred_names is None:
@@ -577,6 +3102,7 @@ class LoadingScreen(tk.Toplevel):
     def __init__(self, master, duration=2.5, gif_path=LOADING_GIF, jingle_path=LOADING_JINGLE):
         super().__init__(master)
         self.duration = duration
+        self.clock = getattr(master, "clock", None) or TkClock(master)
         self.overrideredirect(True)
         self.configure(bg="black")
         master.update_idletasks()
@@ -610,20 +3136,14 @@ class LoadingScreen(tk.Toplevel):
         self.hint_id = self.canvas.create_text(sw//2, int(sh*0.62), text="", font=("Press Start 2P", 12), fill=WHITE)
 
     def start(self):
-        try:
-            if pygame_available and bg_music_loaded:
-                pygame.mixer.music.stop()
-        except Exception:
-            pass
-        try:
-            if pygame_available and LOADING_JINGLE.exists():
-                pygame.mixer.music.load(str(LOADING_JINGLE)); pygame.mixer.music.set_volume(0.9); pygame.mixer.music.play()
-        except Exception:
-            pass
-        self.start_time = time.time(); self._animate()
+        if LOADING_JINGLE.exists():
+            AUDIO.switch(LOADING_JINGLE, 0.9, loops=0, fade_ms=0)
+        else:
+            AUDIO.stop()
+        self.start_time = self.clock.now(); self._animate()
 
     def _animate(self):
-        elapsed = time.time() - self.start_time
+        elapsed = self.clock.now() - self.start_time
         progress = min(1.0, elapsed / self.duration)
         percent = int(progress * 100)
         self.canvas.itemconfigure(self.percent_text_id, text=f"{percent}%")
@@ -632,25 +3152,771 @@ class LoadingScreen(tk.Toplevel):
         hints = ["Sharpening your wits...", "Lighting the torches...", "Opening the ancient door..."]
         self.canvas.itemconfigure(self.hint_id, text=hints[int((elapsed*2) % len(hints))])
         if elapsed >= self.duration:
-            try:
-                if pygame_available and BG_MUSIC_PATH.exists():
-                    pygame.mixer.music.stop(); pygame.mixer.music.load(str(BG_MUSIC_PATH)); pygame.mixer.music.set_volume(0.25); pygame.mixer.music.play(-1, fade_ms=800)
-            except Exception:
-                pass
+            if BG_MUSIC_PATH.exists():
+                AUDIO.switch(BG_MUSIC_PATH, 0.25)
             return self.destroy()
         else:
-            self._after_id = self.after(33, self._animate)
+            self._after_id = self.clock.after(33, self._animate)
 
     def destroy(self):
         try:
-            if self._after_id: self.after_cancel(self._after_id)
+            if self._after_id: self.clock.cancel(self._after_id)
         except: pass
         super().destroy()
 
-class AdventureQuiz(tk.Tk):
+class LeaderboardView:
+    # virtualized board: only rows inside the viewport exist on the canvas, as a
+    # fixed pool of items tagged POOL_TAG that survive clear() and are re-pointed
+    # at new rows instead of being recreated, so frame cost is flat in board size
+    POOL_TAG = "lb_pool"
+
+    def __init__(self, app):
+        self.app = app
+        self.canvas = app.canvas
+        family = app.small_font.cget("family")
+        self.header_font = tkfont.Font(family=family, size=max(18, int(app.small_font.cget("size")) + 2), weight="bold")
+        self.body_font = tkfont.Font(family=family, size=app.small_font.cget("size"))
+        self.first_row = 0
+        self.rows_visible = 0
+        self.total = 0
+        self.search = ""
+        self.search_missed = False
+        self.highlight = None
+        self._pool = []
+        self._sig = None
+        self._shown = False
+        self._medals = {}
+
+    def reset(self):
+        self.first_row = 0
+        self.search = ""
+        self.search_missed = False
+        self.highlight = None
+        self._sig = None
+
+    def _make_row(self):
+        c, tag, hidden = self.canvas, self.POOL_TAG, "hidden"
+        return {
+            "hl": c.create_rectangle(0, 0, 0, 0, outline=HOVER_YELLOW, width=2, tags=tag, state=hidden),
+            "rank": c.create_text(0, 0, anchor="w", font=self.body_font, fill=WHITE, tags=tag, state=hidden),
+            "name": c.create_text(0, 0, anchor="w", font=self.body_font, fill=WHITE, tags=tag, state=hidden),
+            "medal": c.create_image(0, 0, anchor="w", tags=tag, state=hidden),
+            "lives": c.create_text(0, 0, anchor="e", font=self.body_font, fill=WHITE, tags=tag, state=hidden),
+            "keys": c.create_text(0, 0, anchor="e", font=self.body_font, fill=WHITE, tags=tag, state=hidden),
+        }
+
+    def hide(self):
+        if self._shown:
+            self.canvas.itemconfigure(self.POOL_TAG, state="hidden")
+            self._shown = False
+            self._sig = None
+
+    def _clamp(self):
+        self.first_row = max(0, min(self.first_row, max(0, self.total - self.rows_visible)))
+
+    def scroll(self, rows):
+        self.first_row += rows
+        self._clamp()
+
+    def jump_to(self, pos):
+        self.highlight = pos
+        self.first_row = pos - self.rows_visible // 2
+        self._clamp()
+
+    def find_next(self):
+        start = self.highlight + 1 if self.highlight is not None else self.first_row
+        pos = LEADERBOARD.find_name(self.search, start)
+        self.search_missed = pos is None
+        if pos is not None:
+            self.jump_to(pos)
+
+    def on_key(self, event):
+        page = max(1, self.rows_visible - 1)
+        moves = {"Up": -1, "Down": 1, "Prior": -page, "Next": page}
+        if event.keysym in moves:
+            self.scroll(moves[event.keysym])
+        elif event.keysym == "Home":
+            self.first_row = 0
+        elif event.keysym == "End":
+            self.first_row = self.total
+            self._clamp()
+        elif event.keysym == "BackSpace":
+            self.search = self.search[:-1]; self.search_missed = False
+        elif event.keysym == "Return":
+            if self.search:
+                self.find_next()
+        elif event.char and ord(event.char[0]) >= 32 and len(self.search) < 24:
+            self.search += event.char; self.search_missed = False; self.highlight = None
+
+    def draw(self, rows_top, rows_bottom, line_h, cols):
+        rank_x, name_x, lives_right, keys_right, allowed_name_w, hl_left, hl_right = cols
+        self.total = len(LEADERBOARD)
+        self.rows_visible = max(1, (rows_bottom - rows_top) // max(1, line_h))
+        self._clamp()
+        while len(self._pool) < self.rows_visible:
+            self._pool.append(self._make_row())
+        rows = LEADERBOARD.ranked(self.first_row, self.first_row + self.rows_visible)
+        sig = (WIDTH, HEIGHT, rows_top, line_h, self.first_row, self.highlight,
+               tuple((rk, id(e), e.get("name"), e.get("score")) for rk, e in rows))
+        if sig != self._sig:
+            self._sig = sig
+            self._update_rows(rows, rows_top, line_h, rank_x, name_x, lives_right, keys_right, allowed_name_w, hl_left, hl_right)
+        self._shown = True
+        self.canvas.tag_raise(self.POOL_TAG)
+        return self.total
+
+    def _update_rows(self, rows, rows_top, line_h, rank_x, name_x, lives_right, keys_right, allowed_name_w, hl_left, hl_right):
+        c, font = self.canvas, self.body_font
+        medal_size = max(50, int(line_h * 0.85))
+        for i, items in enumerate(self._pool):
+            if i >= len(rows):
+                for item in items.values():
+                    c.itemconfigure(item, state="hidden")
+                continue
+            rank_num, e = rows[i]
+            y = rows_top + i * line_h
+            name_disp = str(e.get("name", "Unknown"))
+            if font.measure(name_disp) > allowed_name_w:
+                while name_disp and font.measure(name_disp + "...") > allowed_name_w:
+                    name_disp = name_disp[:-1]
+                name_disp = name_disp + "..."
+            c.coords(items["rank"], rank_x, y); c.itemconfigure(items["rank"], text=ordinal(rank_num), state="normal")
+            c.coords(items["name"], name_x, y); c.itemconfigure(items["name"], text=name_disp, state="normal")
+            c.coords(items["lives"], lives_right, y); c.itemconfigure(items["lives"], text=str(e.get("lives", 0)), state="normal")
+            c.coords(items["keys"], keys_right, y); c.itemconfigure(items["keys"], text=str(e.get("keys", 0)), state="normal")
+            medal_tk = self.app._medal_photo(rank_num, medal_size) if rank_num <= 3 else None
+            if medal_tk is not None:
+                self._medals[i] = medal_tk
+                c.coords(items["medal"], name_x + font.measure(name_disp) + 35, y - (medal_size // 6))
+                c.itemconfigure(items["medal"], image=medal_tk, state="normal")
+            else:
+                c.itemconfigure(items["medal"], state="hidden")
+            if self.highlight is not None and self.first_row + i == self.highlight:
+                c.coords(items["hl"], hl_left, y - line_h // 2, hl_right, y + line_h // 2)
+                c.itemconfigure(items["hl"], state="normal")
+            else:
+                c.itemconfigure(items["hl"], state="hidden")
+
+# Frame profiler
+# F3 (or ADVENTURE_QUIZ_PROFILE=1) toggles an overlay drawn at the end of
+# redraw(). while it is off the app holds None instead of a profiler, so the
+# only cost left in the hot paths is one attribute test per frame/cache lookup
+PROFILE_ENABLED = os.environ.get("ADVENTURE_QUIZ_PROFILE", "0") == "1"
+PROFILE_FRAMES = 240            # frame intervals kept for the percentiles
+PROFILE_OVERLAY_TAG = "profile_overlay"
+
+class FrameProfiler:
+    def __init__(self, frames=PROFILE_FRAMES, overlay=True):
+        self.intervals = array("d", [0.0] * frames)   # ring of ms between redraw starts
+        self.durations = array("d", [0.0] * frames)   # ring of redraw ms
+        self.count = 0
+        self.frames = 0
+        self.last_start = None
+        self.overlay = overlay
+        self.scenes = {}            # state -> [frames, total ms, worst ms, last ms]
+        self.cache = {}             # cache name -> [hits, misses]
+
+    def frame(self, state, start, end):
+        if self.last_start is not None:
+            self.intervals[self.count % len(self.intervals)] = (start - self.last_start) * 1000.0
+            self.count += 1
+        self.last_start = start
+        ms = (end - start) * 1000.0
+        self.durations[self.frames % len(self.durations)] = ms
+        self.frames += 1
+        scene = self.scenes.get(state)
+        if scene is None:
+            scene = self.scenes[state] = [0, 0.0, 0.0, 0.0]
+        scene[0] += 1; scene[1] += ms; scene[3] = ms
+        if ms > scene[2]:
+            scene[2] = ms
+
+    def lookup(self, name, hit):
+        counts = self.cache.get(name)
+        if counts is None:
+            counts = self.cache[name] = [0, 0]
+        counts[0 if hit else 1] += 1
+
+    def percentiles(self, points=(50, 95, 99), redraw=False):
+        # frame-interval percentiles, or redraw-duration ones with redraw=True
+        ring, count = (self.durations, self.frames) if redraw else (self.intervals, self.count)
+        n = min(count, len(ring))
+        if not n:
+            return {}
+        ordered = sorted(ring[:n])
+        out = {p: ordered[min(n - 1, int(n * p / 100.0))] for p in points}
+        out["max"] = ordered[-1]
+        return out
+
+    def report_lines(self, state, gauges):
+        # text for the overlay; gauges are the app's point-in-time counts
+        pct = self.percentiles()
+        lines = ["frame ms      " + ("  ".join(f"{k if k == 'max' else 'p%d' % k} {v:.1f}" for k, v in pct.items()) or "-"),
+                 "redraw ms by scene (> current)"]
+        for name, (n, total, worst, last) in sorted(self.scenes.items(), key=lambda kv: -kv[1][1] / kv[1][0]):
+            mark = ">" if name == state else " "
+            lines.append(f"{mark}{name:<13} avg {total / n:6.2f}  max {worst:6.2f}  last {last:6.2f}  n {n}")
+        for name, (hits, misses) in sorted(self.cache.items()):
+            lines.append(f"{name:<14} hit {100.0 * hits / max(1, hits + misses):5.1f}%  ({hits}/{hits + misses})")
+        lines.extend(f"{k:<14} {v}" for k, v in gauges)
+        return lines
+
+# Leak tracking
+# ADVENTURE_QUIZ_LEAKS=1 (and the leak-check command) replaces tkinter.PhotoImage
+# with a subclass that remembers where each image was made; ImageTk.PhotoImage
+# builds on it, so both are covered. the site is the innermost line of this
+# script on the stack. redraw() samples Tk's own image count and the canvas
+# item count per scene, and a report is printed at exit
+LEAK_TRACKING = os.environ.get("ADVENTURE_QUIZ_LEAKS", "0") == "1"
+LEAK_CYCLES = 6
+LEAK_FRAMES = 8                 # frames drawn on each screen of a leak-check cycle
+LEAK_SITES_SHOWN = 12
+
+class LeakTracker:
     def __init__(self):
+        self.live = {}          # id(image) -> allocation site
+        self.created = {}       # site -> images ever made there
+        self.scenes = {}        # state -> [samples, last images, last items, max images, max items]
+        self._original = None
+
+    def install(self):
+        if self._original is not None:
+            return
+        tracker = self
+        self._original = original = tk.PhotoImage
+
+        class TrackedPhotoImage(original):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                tracker._track(self)
+
+        tk.PhotoImage = TrackedPhotoImage
+
+    def uninstall(self):
+        if self._original is not None:
+            tk.PhotoImage = self._original
+            self._original = None
+
+    def _track(self, image):
+        frame = sys._getframe(2)
+        here = LeakTracker._track.__code__.co_filename
+        while frame is not None and frame.f_code.co_filename != here:
+            frame = frame.f_back
+        site = f"{frame.f_code.co_name}:{frame.f_lineno}" if frame is not None else "?"
+        self.live[id(image)] = site
+        self.created[site] = self.created.get(site, 0) + 1
+        weakref.finalize(image, self.live.pop, id(image), None)
+
+    def counts(self, app):
+        # (Tk images alive, canvas items) right now
+        return len(app.tk.splitlist(app.tk.call("image", "names"))), len(app.canvas.find_all())
+
+    def sample(self, state, app):
+        images, items = self.counts(app)
+        rec = self.scenes.get(state)
+        if rec is None:
+            rec = self.scenes[state] = [0, 0, 0, 0, 0]
+        rec[0] += 1; rec[1] = images; rec[2] = items
+        rec[3] = max(rec[3], images); rec[4] = max(rec[4], items)
+
+    def live_by_site(self):
+        sites = {}
+        for site in self.live.values():
+            sites[site] = sites.get(site, 0) + 1
+        return sites
+
+    def snapshot(self, app):
+        images, items = self.counts(app)
+        return {"tk_images": images, "canvas_items": items, "tracked": len(self.live), "sites": self.live_by_site()}
+
+    def report(self, out=print):
+        out(f"{'scene':<14}{'frames':>8}{'images':>8}{'max':>6}{'items':>8}{'max':>6}")
+        for state, (n, images, items, max_images, max_items) in sorted(self.scenes.items()):
+            out(f"{state:<14}{n:>8}{images:>8}{max_images:>6}{items:>8}{max_items:>6}")
+        out(f"live PhotoImages by allocation site ({len(self.live)} alive):")
+        live = self.live_by_site()
+        for site, n in sorted(live.items(), key=lambda kv: -kv[1])[:LEAK_SITES_SHOWN]:
+            out(f"  {site:<40}{n:>6} alive {self.created.get(site, 0):>8} made")
+
+LEAK_TRACKER = LeakTracker() if LEAK_TRACKING else None
+if LEAK_TRACKER is not None:
+    LEAK_TRACKER.install()
+    atexit.register(LEAK_TRACKER.report)
+
+# Memory accounting
+# ADVENTURE_QUIZ_MEMORY=1 starts tracemalloc and counts decoded image bytes per
+# asset: PIL images at their mode's pixel size, PhotoImages at 4 bytes a pixel
+# (Tk's photo format). redraw() notes the traced peak between state changes;
+# F4 prints the report on demand and it is printed once more when the game closes
+MEMORY_TRACKING = os.environ.get("ADVENTURE_QUIZ_MEMORY", "0") == "1"
+MEMORY_TRACE_FRAMES = 1
+MEMORY_TOP_LINES = 10
+MEMORY_MAX_DEPTH = 3
+_PIXEL_BYTES = {"1": 1, "L": 1, "P": 1, "I;16": 2, "LA": 4, "PA": 4, "RGB": 4, "RGBA": 4, "RGBX": 4, "CMYK": 4, "YCbCr": 4, "I": 4, "F": 4}
+# exact asset name -> the scene that shows it; _img_cache entries are named
+# "cache:" + their key family (door numbers and sizes stripped)
+MEMORY_ASSET_SCENES = {
+    "_bg_pil": "all", "_bg_tk_images": "all",
+    "_door_bg": "hallway", "_door_bg_tk": "hallway", "door_closed_img": "hallway", "door_open_img": "hallway",
+    "hero_img": "hallway", "hero_frames": "hallway", "hero_intro_tk": "story_intro",
+    "cache:open": "hallway", "cache:opening": "hallway", "cache:closed": "hallway",
+    "cache:hero_full": "hallway", "cache:hero_resized_intro": "story_intro",
+    "_cry_pil": "help_choice", "_cry_tk": "help_choice", "cry_frames": "help_choice",
+    "_happy_pil": "help_happy", "_happy_tk": "help_happy", "happy_frames": "help_happy",
+    "_ending_tk": "ending", "ending_frames": "ending",
+    "_medal_pils": "leaderboards", "_medals": "leaderboards", "_lb_view": "leaderboards",
+    "cache:medal_gold": "leaderboards", "cache:medal_silver": "leaderboards", "cache:medal_bronze": "leaderboards",
+}
+
+def image_bytes(obj, depth=0, seen=None):
+    # decoded pixel bytes held by obj: PIL images, PhotoImages and containers of them;
+    # objects whose id() is already in seen are skipped, and every object visited is added
+    if obj is None or depth > MEMORY_MAX_DEPTH:
+        return 0
+    if seen is not None:
+        if id(obj) in seen:
+            return 0
+        seen.add(id(obj))
+    if PIL_AVAILABLE and isinstance(obj, Image.Image):
+        return obj.width * obj.height * _PIXEL_BYTES.get(obj.mode, 4)
+    if isinstance(obj, tk.PhotoImage) or (PIL_AVAILABLE and isinstance(obj, ImageTk.PhotoImage)):
+        try:
+            return obj.width() * obj.height() * 4
+        except Exception:
+            return 0
+    if isinstance(obj, dict):
+        return sum(image_bytes(v, depth + 1, seen) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(image_bytes(v, depth + 1, seen) for v in obj)
+    return 0
+
+def asset_scene(name):
+    if name.startswith("panel:"):
+        return "prologue"
+    return MEMORY_ASSET_SCENES.get(name, "shared")
+
+def process_rss():
+    # (current, peak) resident bytes; current is None where /proc is missing
+    current = None
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak *= 1 if sys.platform == "darwin" else 1024
+    except Exception:
+        peak = None
+    return current, peak
+
+def _mb(n):
+    return "-" if n is None else f"{n / 1048576:.1f} MB"
+
+class MemoryAccountant:
+    def __init__(self, frames=MEMORY_TRACE_FRAMES):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.state = None
+        self.base = 0
+        self.transitions = {}   # (from, to) -> [count, worst peak above the start, last growth]
+
+    def sample(self, state):
+        if state == self.state:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        if self.state is not None:
+            rec = self.transitions.get((self.state, state))
+            if rec is None:
+                rec = self.transitions[(self.state, state)] = [0, 0, 0]
+            rec[0] += 1
+            rec[1] = max(rec[1], peak - self.base)
+            rec[2] = current - self.base
+        tracemalloc.reset_peak()
+        self.state, self.base = state, current
+
+def app_image_assets(app):
+    # [(name, scene, bytes)] for the app's image attributes and cache entries; each
+    # image is counted once, caches first, however many containers hold it
+    seen = set()
+    per_key = {}
+    for key, img in list(app._img_cache.items()):
+        name = "cache:" + str(key[0] if isinstance(key, tuple) else key).rstrip("0123456789_")
+        per_key[name] = per_key.get(name, 0) + image_bytes(img, seen=seen)
+    for key, img in list(app._tk_image_cache.items()):
+        name = "panel:" + Path(str(key[0] if isinstance(key, tuple) else key)).name
+        per_key[name] = per_key.get(name, 0) + image_bytes(img, seen=seen)
+    seen.update((id(app._img_cache), id(app._tk_image_cache)))
+    assets = []
+    for name, value in list(vars(app).items()):
+        n = image_bytes(value, seen=seen)
+        if n:
+            assets.append((name, asset_scene(name), n))
+    assets.extend((name, asset_scene(name), n) for name, n in per_key.items() if n)
+    return assets
+
+def app_cache_sizes(app):
+    return {
+        "_img_cache": (len(app._img_cache), image_bytes(app._img_cache)),
+        "_tk_image_cache": (len(app._tk_image_cache), image_bytes(app._tk_image_cache)),
+        "image pyramids": (len(_image_pyramids), sum(image_bytes(levels) for _, levels in _image_pyramids.values())),
+        "decoded music": AUDIO.decoded(),
+    }
+
+def memory_report(assets, caches, accountant=None, out=print):
+    current, peak = process_rss()
+    out(f"RSS {_mb(current)} (peak {_mb(peak)})")
+    if tracemalloc.is_tracing():
+        traced, traced_peak = tracemalloc.get_traced_memory()
+        out(f"python heap (tracemalloc) {_mb(traced)}, peak since the last state change {_mb(traced_peak)}")
+    total = sum(n for _, _, n in assets)
+    out(f"decoded images: {_mb(total)} in {len(assets)} assets")
+    for name, scene, n in sorted(assets, key=lambda a: -a[2]):
+        out(f"  {name:<32}{scene:<14}{_mb(n):>12}")
+    scenes = {}
+    for _, scene, n in assets:
+        scenes[scene] = scenes.get(scene, 0) + n
+    out("by scene:")
+    for scene, n in sorted(scenes.items(), key=lambda kv: -kv[1]):
+        out(f"  {scene:<46}{_mb(n):>12}")
+    out("caches:")
+    for name, (entries, n) in caches.items():
+        out(f"  {name:<32}{entries:>6} entries{_mb(n):>12}")
+    if accountant is not None and accountant.transitions:
+        out("state transitions (peak above the start / growth, tracemalloc):")
+        for (a, b), (count, worst, growth) in sorted(accountant.transitions.items(), key=lambda kv: -kv[1][1]):
+            out(f"  {a + ' -> ' + b:<34}x{count:<4}{_mb(worst):>12}{_mb(growth):>12}")
+    if tracemalloc.is_tracing():
+        out("top allocation lines:")
+        for stat in tracemalloc.take_snapshot().statistics("lineno")[:MEMORY_TOP_LINES]:
+            frame = stat.traceback[0]
+            out(f"  {Path(frame.filename).name + ':' + str(frame.lineno):<40}{_mb(stat.size):>12}{stat.count:>9} blocks")
+
+if MEMORY_TRACKING:
+    tracemalloc.start(MEMORY_TRACE_FRAMES)     # as early as possible, so start-up loads are counted
+
+# Clocks
+# the game's timers go through AdventureQuiz.after(), which hands them to a
+# clock: TkClock is Tk's own timer queue, VirtualClock keeps them in a heap
+# and runs them only when told to advance, at their exact due times. the
+# loading screen, the background scroll and answer timing read clock.now(),
+# and wait_window() is the clock's too, so on a VirtualClock a full run
+# (typewriters, loader, walks, ending) takes only as long as its drawing
+class TkClock:
+    def __init__(self, widget):
+        self.widget = widget
+
+    def now(self):
+        return time.perf_counter()
+
+    def after(self, ms, func=None, *args):
+        return tk.Misc.after(self.widget, ms, func, *args)
+
+    def cancel(self, after_id):
+        tk.Misc.after_cancel(self.widget, after_id)
+
+    def pending(self):
+        return len(self.widget.tk.splitlist(self.widget.tk.call("after", "info")))
+
+    def wait_window(self, window):
+        tk.Misc.wait_window(self.widget, window)
+
+class VirtualClock:
+    def __init__(self, start=0.0):
+        self.t = start
+        self._heap = []         # (due, seq, id, func, args)
+        self._live = set()      # ids still waiting to run
+        self._seq = 0
+        self.ran = 0
+
+    def now(self):
+        return self.t
+
+    def after(self, ms, func=None, *args):
+        if ms == "idle":
+            ms = 0              # after_idle(): runs with the next due callbacks
+        self._seq += 1
+        after_id = f"vafter#{self._seq}"
+        if func is None:
+            self.run_until(self.t + max(0, ms) / 1000.0)    # after(ms) alone sleeps
+            return after_id
+        heapq.heappush(self._heap, (self.t + max(0, ms) / 1000.0, self._seq, after_id, func, args))
+        self._live.add(after_id)
+        return after_id
+
+    def cancel(self, after_id):
+        self._live.discard(after_id)
+
+    def pending(self):
+        return len(self._live)
+
+    def wait_window(self, window):
+        # jumps from one due callback to the next until window is gone
+        while self._heap and window.winfo_exists():
+            self.run_until(self._heap[0][0])
+
+    def run_until(self, t):
+        # runs every callback due by t (including ones they schedule), then sets the time to t
+        heap = self._heap
+        while heap and heap[0][0] <= t:
+            due, _, after_id, func, args = heapq.heappop(heap)
+            if after_id not in self._live:
+                continue
+            self._live.discard(after_id)
+            self.t = due
+            self.ran += 1
+            try:
+                func(*args)
+            except Exception as e:
+                print("virtual clock callback error:", e)
+        self.t = max(self.t, t)
+
+# Input recording and replay
+# ADVENTURE_QUIZ_RECORD=run.aqrec logs every key, click, mouse move, wheel step
+# and window resize that reaches the game, with its time in ms since start, as
+# gzip'd JSON lines: a header (window size, random seed), then one short list
+# per event plus "S" lines for state changes. the replay command feeds the
+# events back on a VirtualClock, so every timer fires at the recorded offsets,
+# and checks that the same state transitions come out
+RECORD_PATH = os.environ.get("ADVENTURE_QUIZ_RECORD") or None
+RECORD_VERSION = 1
+REPLAY_TAIL_MS = 3000           # virtual time run after the last event
+REPLAY_FRAMES = 100000          # redraw durations kept for the replay's percentiles
+PLAYTHROUGH_STEP = 0.033        # virtual seconds advanced per frame while waiting on the game
+PLAYTHROUGH_STEP_LIMIT = 120.0  # virtual seconds a scripted step may wait before it counts as stuck
+
+class InputRecorder:
+    def __init__(self, clock, path=None, seed=None, size=None):
+        self.clock = clock
+        self.t0 = clock.now()
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.transitions = []   # (ms, state)
+        self._state = None
+        self._fh = None
+        if path:
+            self._fh = gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+            stamp = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+            self._fh.write(json.dumps({"v": RECORD_VERSION, "size": list(size) if size else None, "seed": self.seed, "ts": stamp}) + "\n")
+
+    def _ms(self):
+        return round((self.clock.now() - self.t0) * 1000.0, 1)
+
+    def _write(self, rec):
+        if self._fh is not None:
+            try:
+                self._fh.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+            except Exception as e:
+                print("input recording error:", e)
+                self._fh = None
+
+    def key(self, event):
+        self._write([self._ms(), "k", event.keysym, event.char])
+
+    def click(self, event):
+        self._write([self._ms(), "c", event.x, event.y])
+
+    def move(self, event):
+        self._write([self._ms(), "m", event.x, event.y])
+
+    def wheel(self, event):
+        self._write([self._ms(), "w", getattr(event, "delta", 0), getattr(event, "num", 0)])
+
+    def size(self, w, h):
+        self._write([self._ms(), "s", w, h])
+
+    def state(self, state):
+        if state != self._state:
+            self._state = state
+            ms = self._ms()
+            self.transitions.append((ms, state))
+            self._write([ms, "S", state])
+
+    def close(self):
+        if self._fh is not None:
+            try:
+                self._fh.close()
+            except Exception as e:
+                print("input recording error:", e)
+            self._fh = None
+
+def read_recording(path):
+    # (header, events, transitions) from a .aqrec file
+    events, transitions = [], []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("v") != RECORD_VERSION:
+            raise ValueError(f"{path}: not a version {RECORD_VERSION} recording")
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                break               # a recording cut off mid-line by a crash
+            if rec[1] == "S":
+                transitions.append((rec[0], rec[2]))
+            else:
+                events.append(rec)
+    return header, events, transitions
+
+class _ReplayEvent:
+    # carries the attributes the input handlers read from a Tk event
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+def replay_recording(app, clock, events, tail_ms=REPLAY_TAIL_MS, size=None):
+    # drives app through events on clock, starting at the recorded window size;
+    # returns the number dispatched
+    handlers = {
+        "k": lambda r: app.on_key(_ReplayEvent(keysym=r[2], char=r[3])),
+        "c": lambda r: app.on_click(_ReplayEvent(x=r[2], y=r[3])),
+        "m": lambda r: app.on_mouse_move(_ReplayEvent(x=r[2], y=r[3])),
+        "w": lambda r: (app.on_mousewheel_linux if r[3] in (4, 5) else app.on_mousewheel_windows)(_ReplayEvent(delta=r[2], num=r[3])),
+        "s": lambda r: (app.geometry(f"{r[2]}x{r[3]}"), app.update()),
+    }
+    if size:
+        handlers["s"]([0, "s"] + list(size))
+    n = 0
+    for rec in events:
+        clock.run_until(rec[0] / 1000.0)
+        handler = handlers.get(rec[1])
+        if handler is None:
+            continue
+        try:
+            handler(rec)
+        except Exception as e:
+            print("replay event error:", rec, e)
+        app.update_idletasks()
+        n += 1
+    clock.run_until(clock.now() + tail_ms / 1000.0)
+    app.update_idletasks()
+    return n
+
+def compare_transitions(recorded, replayed):
+    # (identical, first differing index or None, worst timing difference in ms)
+    for i, (a, b) in enumerate(zip(recorded, replayed)):
+        if a[1] != b[1]:
+            return False, i, None
+    if len(recorded) != len(replayed):
+        return False, min(len(recorded), len(replayed)), None
+    worst = max((abs(a[0] - b[0]) for a, b in zip(recorded, replayed)), default=0.0)
+    return True, None, worst
+
+class _ReplayCheckApp:
+    # a Tk-free stand-in with the input handlers replay_recording calls: Return
+    # starts a 500 ms timer to the next state, a click in the top half toggles
+    # "menu"/"about", and a 33 ms redraw loop reports the state to the recorder
+    STATES = ("menu", "enter_name", "prologue", "hallway")
+
+    def __init__(self, clock, recorder, skew=0):
+        self.clock, self._recorder, self.skew = clock, recorder, skew
+        self.state = "menu"
+        self.size = None
+        self.clock.after(0, self.redraw)
+
+    def redraw(self):
+        self._recorder.state(self.state)
+        self.clock.after(33, self.redraw)
+
+    def _next(self):
+        i = self.STATES.index(self.state) if self.state in self.STATES else 0
+        self.state = self.STATES[min(i + 1 + self.skew, len(self.STATES) - 1)]
+
+    def on_key(self, event):
+        self._recorder.key(event)
+        if event.keysym == "Return":
+            self.clock.after(500, self._next)
+
+    def on_click(self, event):
+        self._recorder.click(event)
+        if event.y < 300:
+            self.state = "about" if self.state == "menu" else "menu"
+
+    def on_mouse_move(self, event):
+        self._recorder.move(event)
+
+    def on_mousewheel_linux(self, event):
+        self._recorder.wheel(event)
+
+    on_mousewheel_windows = on_mousewheel_linux
+
+    def geometry(self, spec):
+        # stands in for the <Configure> handler, which records real resizes
+        if spec != self.size:
+            self.size = spec
+            self._recorder.size(*map(int, spec.split("x")))
+
+    def update(self):
+        pass
+
+    def update_idletasks(self):
+        pass
+
+def replay_self_check(out=print):
+    # records a scripted session of _ReplayCheckApp to a real .aqrec file, replays
+    # it, and checks a faithful replay matches while a skewed one is caught
+    script = [(100, "m", 10, 400), (250, "k", "Return", "\r"), (900, "c", 50, 100), (1000, "c", 50, 100),
+              (1200, "w", 120, 0), (1300, "k", "Return", "\r"), (2100, "s", 640, 480), (2200, "k", "Return", "\r")]
+    tmp = tempfile.TemporaryDirectory(prefix="aq-replay-check-")
+    try:
+        path = Path(tmp.name) / "check.aqrec"
+        clock = VirtualClock()
+        recorder = InputRecorder(clock, path, seed=1, size=(800, 600))
+        app = _ReplayCheckApp(clock, recorder)
+        # the scripted player plays "live" through the same dispatch table a replay uses
+        replay_recording(app, clock, [list(ev) for ev in script], tail_ms=1000)
+        recorder.close()
+        header, events, recorded = read_recording(path)
+        ok = header["size"] == [800, 600] and [e[1] for e in events] == [e[1] for e in script]
+        results = {}
+        for skew in (0, 1):
+            clock = VirtualClock()
+            replayer = InputRecorder(clock, seed=header["seed"])
+            app = _ReplayCheckApp(clock, replayer, skew)
+            replay_recording(app, clock, events, tail_ms=1000, size=header["size"])
+            results[skew] = compare_transitions(recorded, replayer.transitions)
+        ok = ok and results[0][0] and results[0][2] == 0 and not results[1][0]
+        ok = ok and not compare_transitions(recorded, recorded + [(9e9, "menu")])[0]
+        out(f"recorded {len(events)} events and {len(recorded)} transitions; faithful replay {results[0]}, skewed replay {results[1]}")
+        return ok
+    finally:
+        tmp.cleanup()
+
+class AdventureQuiz(tk.Tk):
+    # the run's rules and counters live on self.session; the screens read them here
+    lives = property(lambda self: self.session.lives)
+    keys_collected = property(lambda self: self.session.keys_collected)
+    completed = property(lambda self: self.session.completed)
+    unlocked = property(lambda self: self.session.unlocked)
+    questions = property(lambda self: self.session.questions)
+    # state -> how to draw it; draw_scene() dispatches through this table, and
+    # bench, leak-check and memory-report walk SCENE_STATES, so they can't drift apart
+    SCENES = {
+        "menu": lambda app: app.draw_menu(),
+        "instructions": lambda app: app.draw_boxed_text("INSTRUCTIONS", instructions_text, app.scroll_offset),
+        "about": lambda app: app.draw_boxed_text("ABOUT US", about_text, app.scroll_offset),
+        "enter_name": lambda app: app.draw_enter_name(),
+        "prologue": lambda app: app.draw_prologue(),
+        "help_choice": lambda app: app.draw_help_choice(),
+        "help_happy": lambda app: app.draw_help_happy(),
+        "story_intro": lambda app: app.draw_story_intro(app.story_text),
+        "hallway": lambda app: app.draw_hallway(),
+        "anim_walk": lambda app: app.draw_hallway(),
+        "anim_open": lambda app: app.draw_hallway(),
+        "stage1": lambda app: app.draw_stage(0, app.answer_input),
+        "stage2": lambda app: app.draw_stage(1, app.answer_input),
+        "stage3": lambda app: app.draw_stage(2, app.answer_input),
+        "stage4": lambda app: app.draw_stage(3, app.answer_input),
+        "stage5": lambda app: app.draw_stage(4, app.answer_input),
+        "ending": lambda app: (app._maybe_save_score(), app.draw_ending()),
+        "final_scene": lambda app: app.draw_final_scene(),
+        "leaderboards": lambda app: app.draw_leaderboards(),
+    }
+    SCENE_STATES = tuple(SCENES)
+
+    def __init__(self, clock=None, recorder=None):
         global WIDTH, HEIGHT
         super().__init__()
+        self.clock = clock or TkClock(self)
         self.title("Python Adventure Quiz")
 
         # Full-screen
@@ -692,6 +3958,11 @@ class AdventureQuiz(tk.Tk):
         self.canvas.pack(fill="both", expand=True)
         self.canvas.bind("<Enter>", lambda e: self.canvas.focus_set())
 
+        # input recording: seeded so a replay draws the same questions
+        self._recorder = recorder or (InputRecorder(self.clock, RECORD_PATH, size=(WIDTH, HEIGHT)) if RECORD_PATH else None)
+        if self._recorder is not None:
+            random.seed(self._recorder.seed)
+
         # bind keys & events
         self.bind("<F11>", self._toggle_fullscreen)
         self.bind("<Escape>", self._exit_fullscreen)
@@ -706,20 +3977,26 @@ class AdventureQuiz(tk.Tk):
         # fonts
         self.small_font, self.title_font, _ = pick_pixel_like_font(self)
         self.button_font = self.small_font
+        self._lb_view = LeaderboardView(self)
 
         # state
         self.state = "menu"
         self.scroll_offset = 0
         self.player_name = ""
         self.answer_input = ""
-        self.lives = 3
-        self.keys_collected = 0
+        self.session = QuizSession()
         self.cursor_visible = True
 
-        self.completed = set()
-        self.unlocked = {5}
         self.auto_next_door = None
         self._score_saved = False
+        self._placement = None
+        get_question_bank()   # load packs at startup rather than on the first PLAY
+        get_adaptive_engine()
+        self._last_entry = None
+        self._save_status = None
+        self._session_id = None
+        self._stage_entered_at = None
+        self._answer_option = None
         self.hero_img = None; self.hero_frames = None; self.hero_frame_durations = []; self.hero_frame_idx = 0; self.hero_is_animated = False
 
         # background & door bg placeholders
@@ -897,7 +4174,12 @@ class AdventureQuiz(tk.Tk):
 
         self._img_cache = {}
         self._tk_image_cache = {}
-        self._medal_tks = {}
+        self._profiler = FrameProfiler() if PROFILE_ENABLED else None
+        self._leaks = LEAK_TRACKER
+        self._traced_state = None; self._traced_frame_at = None
+        self._memory = MemoryAccountant() if MEMORY_TRACKING else None
+        self.bind("<F4>", self.print_memory_report)
+        self.bind("<F3>", self._toggle_profiler)
 
      # hero size
         self.hero_w, self.hero_h = 180, 280
@@ -936,10 +4218,11 @@ class AdventureQuiz(tk.Tk):
         self.help_choice_visible = False; self.help_happy_shown = False
         self.help_text_full = ""; self.help_text_shown = ""; self.help_char_idx = 0; self.help_done = False; self._help_after_id = None
 
-        self._last_time = time.time()
+        self._last_time = self.clock.now()
         self._tick(); self.redraw(); self._blink_loop()
 
     # helpers background
+    @traced("prepare_bg_tiles")
     def _prepare_bg_tiles(self):
         self.bg_loaded = False
         self._bg_pil = None
@@ -972,6 +4255,7 @@ class AdventureQuiz(tk.Tk):
                     break
             if self.bg_loaded: break
 
+    @traced("prepare_door_bg")
     def _prepare_door_bg(self, panel_w=None, panel_h=None):
         try:
             panel_w = WIDTH
@@ -1046,6 +4330,7 @@ class AdventureQuiz(tk.Tk):
             if event.width != WIDTH or event.height != HEIGHT:
                 WIDTH = max(1, event.width)
                 HEIGHT = max(1, event.height)
+                if self._recorder is not None: self._recorder.size(WIDTH, HEIGHT)
                 try:
                     self.canvas.config(width=WIDTH, height=HEIGHT)
                 except Exception:
@@ -1094,12 +4379,13 @@ class AdventureQuiz(tk.Tk):
             x += tw; tile_idx += 1
 
     def _tick(self):
-        now = time.time(); dt = now - getattr(self, "_last_time", now); self._last_time = now
+        now = self.clock.now(); dt = now - getattr(self, "_last_time", now); self._last_time = now
         self._update_bg_offset(dt); self.after(16, self._tick)
 
 
     def clear(self):
-        self.canvas.delete("all"); self.click_areas = {}
+        if self.state != "leaderboards": self._lb_view.hide()
+        self.canvas.delete("!" + LeaderboardView.POOL_TAG); self.click_areas = {}
 
     def draw_button(self, text, y, tag, x=None, w=BUTTON_W, h=BUTTON_H):
         if x is None:
@@ -1185,8 +4471,20 @@ class AdventureQuiz(tk.Tk):
         self._enter_name_available_width = available_width
         self._enter_name_padding_x = padding_x
 
+    def _log_event(self, kind, **fields):
+        EVENTS.log(kind, session=self._session_id, **fields)
+
+    @traced("start_prologue", cat="scene")
     def start_prologue(self, player_name):
         self.player_name = player_name.strip() if player_name.strip() else "Arthan"
+        self._session_id = uuid.uuid4().hex[:12]
+        try:
+            drawn = get_question_bank().draw(STAGE_COUNT)
+        except Exception as e:
+            print("question draw error:", e); drawn = None
+        # recorded runs skip adaptive picks: ratings.json changes between record and replay
+        self.session = QuizSession(self.player_name, drawn, engine=get_adaptive_engine() if self._recorder is None else None)
+        self._log_event("session_start", player=self.player_name, questions=[q.get("id") for q in self.questions])
         self.prologue_scenes = []
         for imgpath, text in PROLOGUE_SCENES_TEMPLATE:
             text_sub = text.replace("{name}", self.player_name)
@@ -1197,15 +4495,9 @@ class AdventureQuiz(tk.Tk):
         self.scene_done = (len(self.scene_text_full) == 0); self.state = "prologue"
         self.help_choice_visible = False; self.help_happy_shown = False
         self.help_text_full = ""; self.help_text_shown = ""; self.help_char_idx = 0; self.help_done = False
-        self._score_saved = False
-        try:
-            if pygame_available:
-                try: pygame.mixer.music.fadeout(600)
-                except Exception: pass
-                if STORY_MUSIC_PATH.exists():
-                    pygame.mixer.music.load(str(STORY_MUSIC_PATH)); pygame.mixer.music.set_volume(0.38); pygame.mixer.music.play(-1, fade_ms=800)
-        except Exception as e:
-            print("Failed to switch to story music:", e)
+        self._score_saved = False; self._placement = None; self._save_status = None
+        if STORY_MUSIC_PATH.exists():
+            AUDIO.switch(STORY_MUSIC_PATH, 0.38)
         panel_w, panel_h = WIDTH - 2*PANEL_MARGIN, HEIGHT - 2*PANEL_MARGIN
         for s in self.prologue_scenes:
             try: self._get_tk_image_for_panel(s['img'], panel_w, panel_h)
@@ -1255,15 +4547,8 @@ class AdventureQuiz(tk.Tk):
         self.final_char_idx = 0
         self.final_done = False
 
-        try:
-            if pygame_available:
-                pygame.mixer.music.stop()
-                if STORY_MUSIC_PATH.exists():
-                    pygame.mixer.music.load(str(STORY_MUSIC_PATH))
-                    pygame.mixer.music.set_volume(0.38)
-                    pygame.mixer.music.play(-1, fade_ms=400)
-        except Exception:
-            pass
+        if STORY_MUSIC_PATH.exists():
+            AUDIO.switch(STORY_MUSIC_PATH, 0.38, fade_ms=400)
 
         self._schedule_final_type_step(0)
 
@@ -1368,15 +4653,8 @@ class AdventureQuiz(tk.Tk):
         self.final_char_idx = 0
         self.final_done = False
 
-        try:
-            if pygame_available:
-                pygame.mixer.music.stop()
-                if STORY_MUSIC_PATH.exists():
-                    pygame.mixer.music.load(str(STORY_MUSIC_PATH))
-                    pygame.mixer.music.set_volume(0.38)
-                    pygame.mixer.music.play(-1, fade_ms=400)
-        except Exception:
-            pass
+        if STORY_MUSIC_PATH.exists():
+            AUDIO.switch(STORY_MUSIC_PATH, 0.38, fade_ms=400)
 
         self._schedule_final_type_step(0)
 
@@ -1391,20 +4669,13 @@ class AdventureQuiz(tk.Tk):
 
   
     def _restore_bg_music(self):
-        if pygame_available:
-            try:
-                if BG_MUSIC_PATH.exists():
-                    pygame.mixer.music.stop(); pygame.mixer.music.load(str(BG_MUSIC_PATH)); pygame.mixer.music.set_volume(0.25); pygame.mixer.music.play(-1, fade_ms=800)
-            except Exception:
-                pass
+        if BG_MUSIC_PATH.exists():
+            AUDIO.switch(BG_MUSIC_PATH, 0.25)
 
+    @traced("restore_bg_music", cat="audio")
     def _restore_bg_music(self):
-        if pygame_available:
-            try:
-                if BG_MUSIC_PATH.exists():
-                    pygame.mixer.music.stop(); pygame.mixer.music.load(str(BG_MUSIC_PATH)); pygame.mixer.music.set_volume(0.25); pygame.mixer.music.play(-1, fade_ms=800)
-            except Exception:
-                pass
+        if BG_MUSIC_PATH.exists():
+            AUDIO.switch(BG_MUSIC_PATH, 0.25)
 
     def draw_prologue(self):
         panel_x, panel_y = 0, 0
@@ -1908,7 +5179,7 @@ class AdventureQuiz(tk.Tk):
 
 
     def draw_stage(self, stage_idx, user_input):
-        q = questions[stage_idx]
+        q = self.questions[stage_idx]
         self.canvas.create_rectangle(47, 47, WIDTH-47, 247, fill=BORDER, outline=BORDER)
         self.canvas.create_rectangle(50, 50, WIDTH-50, 250, fill=BLACK)
         y = 70
@@ -1939,6 +5210,10 @@ class AdventureQuiz(tk.Tk):
             self.draw_mc_button(label, x, y, w, h, tag)
         status = f"Lives: {'♥'*self.lives}   Keys: {'🔑'*self.keys_collected}"
         self.canvas.create_text(70, opt_area_top + opt_h*2 + opt_gap_y + 16, anchor="nw", text=status, fill=ORANGE, font=self.small_font)
+        if FREE_TEXT_ANSWERS:
+            typed = f"Answer: {user_input}_" if user_input else "...or type an answer and press Enter"
+            self.canvas.create_text(WIDTH-70, opt_area_top + opt_h*2 + opt_gap_y + 16, anchor="ne", text=typed,
+                                    fill=WHITE if user_input else DARK_ORANGE, font=self.small_font)
     def draw_ending(self):
         try:
             if self.ending_frames:
@@ -1966,7 +5241,20 @@ class AdventureQuiz(tk.Tk):
         left_x = 80
         right_x = WIDTH - btn_w - 80
         self.draw_button("EXIT", btn_y, "exit_game", x=left_x, w=btn_w, h=btn_h)
-        total_questions = len(questions)
+        placed = None
+        if self._placement:
+            rank, total, pct = self._placement
+            placed = f"You placed {ordinal(rank)} of {total:,}"
+            if total > 1:
+                placed += f"  (better than {pct:.0f}% of players)"
+        elif self._save_status == "saving":
+            placed = "saving..."
+        elif self._save_status == "failed":
+            placed = "score not saved yet - will retry on exit"
+        if placed:
+            self.canvas.create_text(WIDTH//2 + 2, btn_y + btn_h//2 + 2, text=placed, font=self.small_font, fill="#000000")
+            self.canvas.create_text(WIDTH//2, btn_y + btn_h//2, text=placed, font=self.small_font, fill=HOVER_YELLOW)
+        total_questions = len(self.questions)
         all_answered = (int(getattr(self, "keys_collected", 0)) >= total_questions)
         self.draw_button("DONE", btn_y, "done_end", x=right_x, w=btn_w, h=btn_h)
    
@@ -1975,39 +5263,15 @@ class AdventureQuiz(tk.Tk):
         self.canvas.create_rectangle(box_x-6, box_y-6, box_x+box_w+6, box_y+box_h+6, fill=BORDER)
         self.canvas.create_rectangle(box_x, box_y, box_x+box_w, box_y+box_h, fill=BLACK)
         self.canvas.create_text(WIDTH//2, box_y+40, text="LEADERBOARDS", font=self.title_font, fill=ORANGE)
-        header_font = tkfont.Font(family=self.small_font.cget("family"), size=max(18, int(self.small_font.cget("size")) + 2), weight="bold")
-        body_font = tkfont.Font(family=self.small_font.cget("family"), size=self.small_font.cget("size"))
-        entries = load_leaderboard() or []
-        entries = sorted(entries, key=lambda e: (-int(e.get("score", 0)), e.get("ts", "")))
-        ranks = []
-        prev_score = None
-        prev_rank = 0
-        for e in entries:
-            sc = int(e.get("score", 0))
-            if prev_score is None:
-                rank = 1
-            elif sc == prev_score:
-                rank = prev_rank
-            else:
-                rank = prev_rank + 1
-            ranks.append(rank)
-            prev_score = sc
-            prev_rank = rank
-        ranked_entries = []
-        for e, r in zip(entries, ranks):
-            e_copy = dict(e)
-            e_copy["_rank"] = r
-            ranked_entries.append(e_copy)
-        TOP_N = 10
-        visible = ranked_entries[:TOP_N]
+        view = self._lb_view
+        header_font, body_font = view.header_font, view.body_font
         headers = ["#", "Name", "Lives", "Keys"]
         header_y = box_y + 100
         left_margin = box_x + 36
-        right_margin = box_x + box_w - 36
         line_h = body_font.metrics("linespace") + 10
         rank_w = max(header_font.measure("#"), body_font.measure("999.")) + 12
-        keys_w = max(header_font.measure("Keys"), max((body_font.measure(str(e.get("keys",0))) for e in visible), default=body_font.measure("0"))) + 18
-        lives_w = max(header_font.measure("Lives"), max((body_font.measure(str(e.get("lives",0))) for e in visible), default=body_font.measure("0"))) + 18
+        keys_w = max(header_font.measure("Keys"), body_font.measure("0")) + 18
+        lives_w = max(header_font.measure("Lives"), body_font.measure("0")) + 18
         gap_between_numeric = 120
         numeric_total = keys_w + lives_w + gap_between_numeric
         available_for_name = (box_x + box_w - 40) - (left_margin + rank_w + numeric_total)
@@ -2021,85 +5285,158 @@ class AdventureQuiz(tk.Tk):
         self.canvas.create_text(name_x, header_y, anchor="w", text=headers[1], font=header_font, fill=HOVER_YELLOW)
         self.canvas.create_text(keys_right, header_y, anchor="e", text=headers[3], font=header_font, fill=HOVER_YELLOW)
         self.canvas.create_text(lives_right, header_y, anchor="e", text=headers[2], font=header_font, fill=HOVER_YELLOW)
-        def ordinal(n):
-            if 10 <= (n % 100) <= 20:
-                suf = "th"
-            else:
-                suf = {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
-            return f"{n}{suf}"
-        start_y = header_y + 36
-        for i, e in enumerate(visible):
-            y = start_y + i * line_h
-            rank_num = e.get("_rank", i+1)
-            rank_text = ordinal(rank_num)
-            raw_name = e.get("name", "Unknown")
-            keys_text = str(e.get("keys", 0))
-            lives_text = str(e.get("lives", 0))
-            name_disp = raw_name
-            if body_font.measure(name_disp) > allowed_name_w:
-                while name_disp and body_font.measure(name_disp + "...") > allowed_name_w:
-                    name_disp = name_disp[:-1]
-                name_disp = name_disp + "..."
-            self.canvas.create_text(rank_x, y, anchor="w", text=rank_text, font=body_font, fill=WHITE)
-            self.canvas.create_text(name_x, y, anchor="w", text=name_disp, font=body_font, fill=WHITE)
-            medal_size = max(50, int(line_h * 0.85))
-            medal_map = {1: "gold", 2: "silver", 3: "bronze"}
-            med = medal_map.get(rank_num)
-            if med:
-                pil_medal = self._medal_pils.get(med)
-                if pil_medal:
-                    name_width_px = body_font.measure(name_disp)
-                    medal_x = name_x + name_width_px + 35
-                    try:
-                        medal_tk = self._get_resized_photo(pil_medal, f"medal_{med}_{i}_{medal_size}", medal_size, medal_size)
-                        if medal_tk:
-                            self._medal_tks[(med, i)] = medal_tk
-                            self.canvas.create_image(medal_x, y - (medal_size//6), image=medal_tk, anchor="w")
-                    except Exception:
-                        pass
-            self.canvas.create_text(lives_right, y, anchor="e", text=lives_text, font=body_font, fill=WHITE)
-            self.canvas.create_text(keys_right, y, anchor="e", text=keys_text, font=body_font, fill=WHITE)
-        if not entries:
+        btn_y = box_y + box_h - 70
+        rows_top = header_y + 36
+        rows_bottom = btn_y - 44
+        total = view.draw(rows_top, rows_bottom, line_h, (rank_x, name_x, lives_right, keys_right, allowed_name_w, box_x + 12, box_x + box_w - 12))
+        footer_y = btn_y - 24
+        if not total:
             self.canvas.create_text(WIDTH//2, box_y + box_h//2, text="No scores yet.", font=self.small_font, fill=WHITE)
-        btn_w = 350
+        else:
+            last = min(total, view.first_row + view.rows_visible)
+            self.canvas.create_text(rank_x, footer_y, anchor="w", text=f"{view.first_row + 1:,}-{last:,} of {total:,}", font=self.small_font, fill="#888888")
+        search_text = "Search: " + view.search + ("_" if self.cursor_visible else " ")
+        if view.search and view.search_missed:
+            search_text += "  (no match)"
+        self.canvas.create_text(keys_right, footer_y, anchor="e", text=search_text, font=self.small_font, fill="#888888")
         btn_h = 50
-        gap = 415
-        total_w = btn_w * 2 + gap
-        start_x = box_x + max(20, (box_w - total_w) // 2)
-        btn_y = box_y + box_h - 70
-        if start_x + total_w > box_x + box_w - 20:
-            avail = box_w - 80 - gap
-            btn_w = max(140, int(avail // 2))
-            total_w = btn_w * 2 + gap
-            start_x = box_x + (box_w - total_w) // 2
-        clear_x = start_x
-        back_x = start_x + btn_w + gap
-        self.draw_button("CLEAR LEADERBOARD", btn_y, "clear_leaderboard", x=clear_x, w=btn_w, h=btn_h)
-        self.draw_button("BACK TO MENU", btn_y, "back_to_menu", x=back_x, w=btn_w, h=btn_h)
+        btn_w = max(140, min(350, (box_w - 80) // 3 - 20))
+        gap = max(20, (box_w - 80 - 3 * btn_w) // 2)
+        xs = [box_x + 40 + i * (btn_w + gap) for i in range(3)]
+        self.draw_button("CLEAR LEADERBOARD", btn_y, "clear_leaderboard", x=xs[0], w=btn_w, h=btn_h)
+        if total and (self._last_entry is not None or (self.player_name or "").strip()):
+            self.draw_button("MY RANK", btn_y, "lb_my_rank", x=xs[1], w=btn_w, h=btn_h)
+        self.draw_button("BACK TO MENU", btn_y, "back_to_menu", x=xs[2], w=btn_w, h=btn_h)
+
+    def _medal_photo(self, rank_num, size):
+        med = {1: "gold", 2: "silver", 3: "bronze"}.get(rank_num)
+        pil_medal = self._medal_pils.get(med) if med else None
+        if not pil_medal:
+            return None
+        try:
+            return self._get_resized_photo(pil_medal, f"medal_{med}_{size}", size, size)
+        except Exception:
+            return None
+
+    def _jump_to_my_rank(self):
+        pos = None
+        try:
+            if self._last_entry is not None:
+                pos = LEADERBOARD.position_of(self._last_entry)
+            if pos is None and (self.player_name or "").strip():
+                pos = LEADERBOARD.find_name(self.player_name.strip())
+        except Exception as e:
+            print("jump to rank error:", e)
+        if pos is not None:
+            self._lb_view.jump_to(pos)
 
     def redraw(self):
-        self.clear(); self._draw_background()
-        if self.state == "menu": self.draw_menu()
-        elif self.state == "instructions": self.draw_boxed_text("INSTRUCTIONS", instructions_text, self.scroll_offset)
-        elif self.state == "about": self.draw_boxed_text("ABOUT US", about_text, self.scroll_offset)
-        elif self.state == "enter_name": self.draw_enter_name()
-        elif self.state == "prologue": self.draw_prologue()
-        elif self.state == "help_choice": self.draw_help_choice()
-        elif self.state == "help_happy": self.draw_help_happy()
-        elif self.state in ("story_intro",): self.draw_story_intro(self.story_text)
-        elif self.state in ("hallway","anim_walk","anim_open"): self.draw_hallway()
-        elif self.state == "stage1": self.draw_stage(0, self.answer_input)
-        elif self.state == "stage2": self.draw_stage(1, self.answer_input)
-        elif self.state == "stage3": self.draw_stage(2, self.answer_input)
-        elif self.state == "stage4": self.draw_stage(3, self.answer_input)
-        elif self.state == "stage5": self.draw_stage(4, self.answer_input)
-        elif self.state == "ending": self._maybe_save_score(); self.draw_ending()
-        elif self.state == "final_scene":
-            self.draw_final_scene()
-        elif self.state == "leaderboards": self.draw_leaderboards()
-        else: self.draw_menu()
+        prof = self._profiler
+        state = self.state      # the state this frame draws, before any handler changes it
+        if prof is not None:
+            start = time.perf_counter()
+        self._poll_score_saver()    # results land on whatever screen the player is on
+        self.draw_scene()
+        if prof is not None:
+            prof.frame(state, start, time.perf_counter())
+            if prof.overlay:
+                self._draw_profiler_overlay(prof)
+        if self._leaks is not None:
+            self._leaks.sample(self.state, self)
+        if self._recorder is not None:
+            self._recorder.state(self.state)
+        if self._memory is not None:
+            self._memory.sample(self.state)
+        if TRACE.enabled:
+            self._trace_frame(state)
         self.after(33, self.redraw)
 
+    def _trace_frame(self, state):
+        # a marker per state change (clicks, walks, answers all end up here) and
+        # per slow frame, so stalls show up on the Tk lane between click spans
+        if state != self._traced_state:
+            TRACE.instant("state " + state, cat="state", before=self._traced_state)
+            self._traced_state = state
+        now = time.perf_counter()
+        if self._traced_frame_at is not None and now - self._traced_frame_at > TRACE_SLOW_FRAME:
+            TRACE.instant("slow frame", cat="frame", gap_ms=round((now - self._traced_frame_at) * 1000.0, 1), state=state)
+        self._traced_frame_at = now
+
+    def draw_scene(self):
+        # one frame of the current state, without scheduling the next
+        self.clear(); self._draw_background()
+        self.SCENES.get(self.state, self.SCENES["menu"])(self)
+
+    def print_memory_report(self, event=None):
+        try:
+            print(f"--- memory report ({self.state}) ---")
+            memory_report(app_image_assets(self), app_cache_sizes(self), self._memory)
+        except Exception as e:
+            print("memory report error:", e)
+
+    def after(self, ms, func=None, *args):
+        # every game timer goes through the clock, so a replay can run it on virtual time
+        return self.clock.after(ms, func, *args)
+
+    def after_cancel(self, after_id):
+        self.clock.cancel(after_id)
+
+    def after_idle(self, func, *args):
+        return self.clock.after("idle", func, *args)
+
+    def wait_window(self, window=None):
+        self.clock.wait_window(self if window is None else window)
+
+    def destroy(self):
+        if getattr(self, "_recorder", None) is not None:
+            self._recorder.close()
+        if getattr(self, "_memory", None) is not None:
+            self.print_memory_report()
+            self._memory = None
+        AUDIO.stop(wait=True)
+        if PROFILE_ENABLED and AUDIO.stats()[0]:
+            print("\n".join(AUDIO.report_lines()))
+        super().destroy()
+
+    def _toggle_profiler(self, event=None):
+        self._profiler = None if self._profiler is not None else FrameProfiler()
+        if self._profiler is None:
+            self.canvas.delete(PROFILE_OVERLAY_TAG)
+
+    def _typewriter_backlog(self):
+        # characters still to be typed across the prologue, help and final typewriters
+        backlog = 0
+        for full, idx in (("scene_text_full", "scene_char_idx"), ("help_text_full", "help_char_idx"), ("final_text_full", "final_char_idx")):
+            backlog += max(0, len(getattr(self, full, "") or "") - getattr(self, idx, 0))
+        return backlog
+
+    def _music_gauge(self):
+        if not AUDIO.enabled:
+            return "off"
+        current, last = AUDIO.current, AUDIO.stats()[1]
+        return (current[0].stem if current else "-") + (f", last switch {last[1]:.0f} ms" if last else "")
+
+    def _draw_profiler_overlay(self, prof):
+        # gauges are only read here, so they cost nothing while the overlay is off
+        try:
+            gauges = [
+                ("canvas items", len(self.canvas.find_all())),
+                ("tk images", len(self.tk.splitlist(self.tk.call("image", "names")))),
+                ("after pending", self.clock.pending()),
+                ("typing backlog", self._typewriter_backlog()),
+                ("img caches", f"{len(self._img_cache)} resized, {len(self._tk_image_cache)} panels"),
+                ("music", self._music_gauge()),
+            ]
+            text = "\n".join(prof.report_lines(self.state, gauges))
+            item = self.canvas.create_text(12, 12, anchor="nw", text=text, fill=HOVER_YELLOW,
+                                           font="TkFixedFont", tags=PROFILE_OVERLAY_TAG)
+            x0, y0, x1, y1 = self.canvas.bbox(item)
+            bg = self.canvas.create_rectangle(x0 - 6, y0 - 6, x1 + 6, y1 + 6, fill=BLACK, outline=ORANGE,
+                                              stipple="gray75", tags=PROFILE_OVERLAY_TAG)
+            self.canvas.tag_lower(bg, item)
+        except Exception as e:
+            print("profiler overlay error:", e)
+
     def _blink_loop(self):
         self.cursor_visible = not self.cursor_visible; self.after(500, self._blink_loop)
 
@@ -2161,9 +5498,14 @@ class AdventureQuiz(tk.Tk):
             self.animating = False
             self.state = f"stage{which}"
             self.answer_input = ""
+            self.session.enter(which)
+            self._stage_entered_at = self.clock.now()
+            self._log_event("stage_enter", stage=which, lives=self.lives, keys=self.keys_collected,
+                            question=self.questions[which - 1].get("id") if 0 < which <= len(self.questions) else None)
         self.after(600, proceed)
 
     def on_key(self, event):
+        if self._recorder is not None: self._recorder.key(event)
         if self.state == "enter_name":
             if event.keysym == "BackSpace":
                 play_typing_generic(); self.player_name = self.player_name[:-1]
@@ -2185,17 +5527,23 @@ class AdventureQuiz(tk.Tk):
             if event.keysym == "BackSpace":
                 self.answer_input = self.answer_input[:-1]
             elif event.keysym == "Return":
-                pass
+                if FREE_TEXT_ANSWERS and self.answer_input.strip():
+                    self._answer_option = None
+                    self.submit_answer()
             else:
-                if len(event.char) > 0:
+                if len(event.char) > 0 and ord(event.char[0]) >= 32 and len(self.answer_input) < ANSWER_INPUT_MAX:
                     self.answer_input += event.char
         elif self.state == "menu":
             if event.keysym == "Return": self.state = "enter_name"
+        elif self.state == "leaderboards":
+            self._lb_view.on_key(event)
 
     def on_mousewheel_windows(self, event):
+        if self._recorder is not None: self._recorder.wheel(event)
         delta = event.delta // 120; self._scroll_box(delta * 30)
 
     def on_mousewheel_linux(self, event):
+        if self._recorder is not None: self._recorder.wheel(event)
         if event.num == 4: self._scroll_box(30)
         elif event.num == 5: self._scroll_box(-30)
 
@@ -2206,11 +5554,15 @@ class AdventureQuiz(tk.Tk):
             line_height = self.small_font.metrics("linespace") + 6; inner_h = (HEIGHT - 200) - 140
             max_scroll = max(0, len(lines) * line_height - inner_h)
             self.scroll_offset = max(-max_scroll, min(0, self.scroll_offset + delta_pixels))
+        elif self.state == "leaderboards":
+            self._lb_view.scroll(-3 if delta_pixels > 0 else 3)
 
     def on_mouse_move(self, event):
+        if self._recorder is not None: self._recorder.move(event)
         self.mouse_x = event.x; self.mouse_y = event.y
 
     def on_click(self, event):
+        if self._recorder is not None: self._recorder.click(event)
         for tag, (x1, y1, x2, y2) in list(self.click_areas.items()):
             if x1 <= event.x <= x2 and y1 <= event.y <= y2:
                 self.handle_click(tag); return
@@ -2231,14 +5583,22 @@ class AdventureQuiz(tk.Tk):
                     self._advance_scene()
 
     def handle_click(self, tag):
+        # every click is one span, tagged with the state before and after it
+        with TRACE.span("click " + tag, cat="ui", before=self.state) as span:
+            self._handle_click(tag)
+            span.set(after=self.state)
+
+    def _handle_click(self, tag):
         play_click()
         if tag == "play":
-            self.state = "enter_name"; self.player_name = ""; self.answer_input = ""; self.lives = 3; self.keys_collected = 0; self.scroll_offset = 0
-            self.completed = set(); self.unlocked = {5}; self.hero_x = 120; self.animating = False; self._score_saved = False
+            self.state = "enter_name"; self.player_name = ""; self.answer_input = ""; self.session = QuizSession(); self.scroll_offset = 0
+            self.hero_x = 120; self.animating = False; self._score_saved = False
         elif tag == "instructions":
             self.state = "instructions"; self.scroll_offset = 0
         elif tag == "leaderboards":
-            self.state = "leaderboards"; self.scroll_offset = 0
+            self.state = "leaderboards"; self.scroll_offset = 0; self._lb_view.reset()
+        elif tag == "lb_my_rank":
+            self._jump_to_my_rank()
         elif tag == "about":
             self.state = "about"; self.scroll_offset = 0
         elif tag == "back_to_menu":
@@ -2248,17 +5608,14 @@ class AdventureQuiz(tk.Tk):
         elif tag == "intro_back":
             self.state = "enter_name"
         elif tag == "start_game":
-            loader = LoadingScreen(self, duration=2.8, gif_path=LOADING_GIF, jingle_path=LOADING_JINGLE)
-            loader.start()
-            self.wait_window(loader)
+            with TRACE.span("loading screen", cat="scene"):
+                loader = LoadingScreen(self, duration=2.8, gif_path=LOADING_GIF, jingle_path=LOADING_JINGLE)
+                loader.start()
+                self.wait_window(loader)
             self.state = "hallway"
             self.answer_input = ""
             self.hero_x = WIDTH - 200
             self.animating = False
-            try:
-                self.unlocked.add(5)
-            except Exception:
-                self.unlocked = {5}
             self.hero_visible = True
             self.hero_opacity = 1.0
 
@@ -2270,20 +5627,21 @@ class AdventureQuiz(tk.Tk):
                     q_idx = n - 1
                 except Exception:
                     q_idx = None
-            if q_idx is not None and 0 <= q_idx < len(questions):
-                opts = questions[q_idx].get("options")
+            if q_idx is not None and 0 <= q_idx < len(self.questions):
+                opts = self.questions[q_idx].get("options")
                 if not opts or len(opts) < 4:
-                    correct = questions[q_idx].get("answer",""); opts = [correct,"","",""]
+                    correct = self.questions[q_idx].get("answer",""); opts = [correct,"","",""]
                 chosen_label = opts[idx] if idx < len(opts) else ""
                 letter = ["a","b","c","d"][idx]
                 self.answer_input = letter
+                self._answer_option = tag
                 self.submit_answer()
         elif tag == "prologue_skip":
             if pygame_available:
                 try:
                     if story_typing: story_typing.stop()
-                    pygame.mixer.music.fadeout(600); self.after(650, self._restore_bg_music)
                 except Exception: pass
+            self._restore_bg_music()
             self.state = "help_choice"; self.help_choice_visible = True; self.help_happy_shown = False
             try: self.start_help_typing()
             except Exception: pass
@@ -2331,25 +5689,8 @@ class AdventureQuiz(tk.Tk):
             except Exception:
                 pass
 
-            try:
-                if pygame_available:
-                    try:
-                        pygame.mixer.music.stop()
-                    except Exception:
-                        pass
-                    try:
-                        self._restore_bg_music()  
-                    except Exception:
-                        try:
-                            if BG_MUSIC_PATH.exists():
-                                pygame.mixer.music.load(str(BG_MUSIC_PATH))
-                                pygame.mixer.music.set_volume(0.25)
-                                pygame.mixer.music.play(-1, fade_ms=800)
-                        except Exception:
-                            pass
-            except Exception:
-                pass
-            self.state = "menu"; self.answer_input = ""; self.lives = 3; self.keys_collected = 0; self.completed = set(); self.unlocked = {5}; self.hero_x = 120; self.animating = False; self._score_saved = False
+            self._restore_bg_music()
+            self.state = "menu"; self.answer_input = ""; self.session = QuizSession(); self.hero_x = 120; self.animating = False; self._score_saved = False
 
         elif tag == "done_end":   
             try:
@@ -2360,18 +5701,11 @@ class AdventureQuiz(tk.Tk):
                 pass
 
             # story-type music
-            try:
-                if pygame_available:
-                    pygame.mixer.music.stop()
-                    if STORY_MUSIC_PATH.exists():
-                        pygame.mixer.music.load(str(STORY_MUSIC_PATH))
-                        pygame.mixer.music.set_volume(0.38)
-                        pygame.mixer.music.play(-1, fade_ms=400)
-            except Exception:
-                pass
+            if STORY_MUSIC_PATH.exists():
+                AUDIO.switch(STORY_MUSIC_PATH, 0.38, fade_ms=400)
 
             player = (self.player_name or "FRIEND").strip().upper()
-            success = (self.keys_collected >= len(questions) and self.lives > 0)
+            success = self.session.success
 
             if success:
                 self.final_text_full = (
@@ -2402,18 +5736,11 @@ class AdventureQuiz(tk.Tk):
 
 
             # story-type music
-            try:
-                if pygame_available:
-                    pygame.mixer.music.stop()
-                    if STORY_MUSIC_PATH.exists():
-                        pygame.mixer.music.load(str(STORY_MUSIC_PATH))
-                        pygame.mixer.music.set_volume(0.38)
-                        pygame.mixer.music.play(-1, fade_ms=400)
-            except Exception:
-                pass
+            if STORY_MUSIC_PATH.exists():
+                AUDIO.switch(STORY_MUSIC_PATH, 0.38, fade_ms=400)
 
             player = (self.player_name or "FRIEND").strip().upper()
-            success = (self.keys_collected >= len(questions) and self.lives > 0)
+            success = self.session.success
 
             if success:
                 self.final_text_full = (
@@ -2446,14 +5773,10 @@ class AdventureQuiz(tk.Tk):
 
       
         elif tag == "exit_game":
-            try:
-                if pygame_available and bg_music_loaded: pygame.mixer.music.stop()
-            except Exception:
-                pass
             self.destroy()
         elif tag == "clear_leaderboard":
             clear_leaderboard_file()
-            self.state = "leaderboards"
+            self.state = "leaderboards"; self._lb_view.reset()
         elif tag == "confirm_clear_no":
             self.state = "leaderboards"
         elif tag.startswith("door"):
@@ -2463,6 +5786,7 @@ class AdventureQuiz(tk.Tk):
                 which = None
             if which:
                 if which in self.unlocked:
+                    self._log_event("door_open", door=which)
                     self.hero_visible = True
                     self.hero_opacity = 1.0
 
@@ -2516,34 +5840,28 @@ class AdventureQuiz(tk.Tk):
         except Exception:
             return
         q_idx = stage_num - 1
-        if q_idx < 0 or q_idx >= len(questions):
+        if q_idx < 0 or q_idx >= len(self.questions):
             return
-        correct_answer = str(questions[q_idx].get("answer", "")).strip().lower()
-        given = str(self.answer_input).strip().lower()
-        correct = (given == correct_answer)
-        if correct:
-            self.keys_collected += 1
-            self.completed.add(stage_num)
-            if stage_num > 1:
-                door_to_unlock = stage_num - 1
-                self.unlocked.add(door_to_unlock)
-                self.state = "hallway"
-                self.answer_input = ""
-                return
-            if stage_num == 1:
-                self.answer_input = ""
-                self.state = "ending"
-                self._maybe_save_score()
-                return
-        else:
-            self.lives -= 1
-            self.answer_input = ""
-            if self.lives <= 0:
-                self.state = "ending"
-                self._maybe_save_score()
-                return
-            self.state = "hallway"
+        given = str(self.answer_input).strip()
+        qid = self.questions[q_idx].get("id")
+        correct = self.session.answer(given)
+        if correct is None:
+            return
+        elapsed_ms = None
+        if self._stage_entered_at is not None:
+            elapsed_ms = round((self.clock.now() - self._stage_entered_at) * 1000.0, 1)
+        self._log_event("answer", stage=stage_num, question=qid, option=self._answer_option, given=given, correct=correct, ms=elapsed_ms)
+        self._answer_option = None
+        if not correct:
+            self._log_event("life_lost", stage=stage_num, lives_left=self.lives)
+        self.answer_input = ""
+        if self.session.finished:
+            self.state = "ending"
+            self._maybe_save_score()
+            return
+        self.state = "hallway"
 
+    @traced("maybe_save_score", cat="score")
     def _maybe_save_score(self):
         if getattr(self, "_score_saved", False): return
         name = (self.player_name or "").strip() or "Unknown"
@@ -2552,12 +5870,28 @@ class AdventureQuiz(tk.Tk):
         try: lives = int(self.lives)
         except: lives = 0
         try:
-            add_score_to_leaderboard(name, keys, lives)
+            entry = SCORE_SAVER.submit(make_score_entry(name, keys, lives))
             self._score_saved = True
-            print(f"Saved score for {name}: keys={keys} lives={lives}")
+            self._last_entry = entry
+            self._save_status = "saving"
+            self._log_event("session_end", keys=keys, lives=lives, score=entry.get("score"))
+            if _adaptive_engine is not None:
+                _adaptive_engine.save_async()
         except Exception as e:
             print("Failed to save score:", e)
 
+    def _poll_score_saver(self):
+        for entry, placement, error in SCORE_SAVER.poll():
+            if entry is not self._last_entry:
+                continue
+            if error is None:
+                self._placement = placement
+                self._save_status = "saved"
+                print(f"Saved score for {entry['name']}: keys={entry['keys']} lives={entry['lives']}")
+            else:
+                self._save_status = "failed"
+                print("Failed to save score:", error)
+
     # image caching helpers
     def _schedule_hero_frame(self):
         if not self.hero_is_animated or not self.hero_frames: return
@@ -2583,6 +5917,7 @@ class AdventureQuiz(tk.Tk):
     def _get_resized_photo(self, pil_img, key_id, w, h):
         if pil_img is None: return None
         ck = (key_id, int(w), int(h))
+        if self._profiler is not None: self._profiler.lookup("_img_cache", ck in self._img_cache)
         if ck in self._img_cache: return self._img_cache[ck]
         try:
             resized = pil_img.resize((int(w), int(h)), Image.LANCZOS)
@@ -2590,8 +5925,10 @@ class AdventureQuiz(tk.Tk):
         except Exception as e:
             return None
 
+    @traced("panel image", detail=1)
     def _get_tk_image_for_panel(self, path, w, h):
         key = (str(path), int(w), int(h))
+        if self._profiler is not None: self._profiler.lookup("_tk_image_cache", key in self._tk_image_cache)
         if key in self._tk_image_cache: return self._tk_image_cache[key]
         if PIL_AVAILABLE:
             pil = safe_load_image(Path(path), target_w=w, target_h=h)
@@ -2611,7 +5948,1240 @@ class AdventureQuiz(tk.Tk):
             pass
         return None
 
+# Classroom server
+# one asyncio process hosts the quiz for a whole class: plain HTTP for the page
+# and the board, WebSocket (RFC 6455, stdlib only) for play. Each socket gets
+# its own QuizSession over the shared question bank; finished scores are
+# queued and written in batches off the event loop, and after each batch
+# every connected player is pushed their live rank
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SERVER_FLUSH_INTERVAL = 0.5      # seconds between leaderboard batches and rank pushes
+SERVER_MAX_MESSAGE = 64 * 1024
+SERVER_BACKLOG = 1024
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+CLASSROOM_PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Python Adventure Quiz</title>
+<style>body{background:#111;color:#eee;font-family:monospace;max-width:760px;margin:2em auto}
+button{font:inherit;margin:4px;padding:6px 12px}#rank{color:#fc3}</style></head>
+<body><h1>Python Adventure Quiz</h1>
+<div id="join"><input id="name" placeholder="your name"> <button onclick="join()">PLAY</button></div>
+<p id="status"></p><p id="rank"></p><div id="doors"></div><pre id="story"></pre><h3 id="q"></h3><div id="opts"></div>
+<script>
+var ws, st = {};
+function $(id) { return document.getElementById(id); }
+function send(m) { ws.send(JSON.stringify(m)); }
+function join() {
+  ws = new WebSocket((location.protocol == "https:" ? "wss://" : "ws://") + location.host + "/ws");
+  ws.onopen = function () { send({type: "join", name: $("name").value}); };
+  ws.onmessage = function (ev) { show(JSON.parse(ev.data)); };
+}
+function show(m) {
+  if (m.type == "rank") { $("rank").textContent = "Rank " + m.rank + " of " + m.total; return; }
+  if (m.type == "error") { $("status").textContent = m.error; return; }
+  if (m.type == "question") {
+    $("story").textContent = m.story; $("q").textContent = m.question; $("opts").innerHTML = "";
+    m.options.forEach(function (o, i) {
+      var b = document.createElement("button"); b.textContent = "abcd"[i] + ") " + o;
+      b.onclick = function () { send({type: "answer", answer: "abcd"[i]}); }; $("opts").appendChild(b);
+    });
+    var t = document.createElement("input"); t.placeholder = "or type an answer";
+    t.onkeydown = function (e) { if (e.key == "Enter" && t.value.trim()) send({type: "answer", answer: t.value}); };
+    $("opts").appendChild(t);
+    return;
+  }
+  st = m; $("story").textContent = ""; $("q").textContent = ""; $("opts").innerHTML = "";
+  $("status").textContent = (m.correct === undefined ? "" : m.correct ? "Correct! " : "Wrong! ") +
+    "Lives: " + m.lives + "  Keys: " + m.keys + (m.finished ? "  -  finished, score " + m.score : "");
+  $("doors").innerHTML = "";
+  if (!m.finished) m.unlocked.forEach(function (d) {
+    var b = document.createElement("button"); b.textContent = "Door " + d;
+    b.onclick = function () { send({type: "enter", door: d}); }; $("doors").appendChild(b);
+  });
+}
+</script></body></html>
+"""
+
+def ws_accept_key(key):
+    return base64.b64encode(hashlib.sha1((key + WS_GUID).encode("ascii")).digest()).decode("ascii")
+
+def _ws_mask(data, key):
+    n = len(data)
+    if not n:
+        return data
+    # XOR the whole payload as one big integer instead of byte by byte
+    mask = int.from_bytes((key * (n // 4 + 1))[:n], "big")
+    return (int.from_bytes(data, "big") ^ mask).to_bytes(n, "big")
+
+def ws_frame(payload, opcode=0x1, mask=False):
+    # one unfragmented frame; clients must mask, servers must not
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    n = len(payload)
+    bit = 0x80 if mask else 0
+    if n < 126:
+        head = struct.pack("!BB", 0x80 | opcode, bit | n)
+    elif n < 65536:
+        head = struct.pack("!BBH", 0x80 | opcode, bit | 126, n)
+    else:
+        head = struct.pack("!BBQ", 0x80 | opcode, bit | 127, n)
+    if mask:
+        key = os.urandom(4)
+        return head + key + _ws_mask(payload, key)
+    return head + payload
+
+async def ws_read_message(reader, max_size=SERVER_MAX_MESSAGE):
+    # (opcode, payload) of the next complete message; control frames come back as-is
+    parts, size, opcode = [], 0, None
+    while True:
+        b0, b1 = await reader.readexactly(2)
+        n = b1 & 0x7F
+        if n == 126:
+            n = struct.unpack("!H", await reader.readexactly(2))[0]
+        elif n == 127:
+            n = struct.unpack("!Q", await reader.readexactly(8))[0]
+        size += n
+        if size > max_size:
+            raise ValueError("websocket message too large")
+        key = await reader.readexactly(4) if b1 & 0x80 else None
+        data = await reader.readexactly(n) if n else b""
+        if key:
+            data = _ws_mask(data, key)
+        op = b0 & 0x0F
+        if op >= 0x8:
+            return op, data
+        if op:
+            opcode = op
+        parts.append(data)
+        if b0 & 0x80:
+            return opcode, b"".join(parts)
+
+class _ClassroomPlayer:
+    __slots__ = ("writer", "name", "session", "entry", "sent_rank")
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.name = ""
+        self.session = None
+        self.entry = None
+        self.sent_rank = None
+
+class ClassroomServer:
+    def __init__(self, host=SERVER_HOST, port=SERVER_PORT, bank=None, store=None, engine=None):
+        self.host, self.port = host, port
+        self.bank = bank if bank is not None else get_question_bank()
+        self.store = store if store is not None else LEADERBOARD
+        self.engine = engine
+        self.players = set()
+        self._pending = []          # finished entries waiting for the next batch
+        self._changed = False       # any score moved since the last rank push
+        self._server = None
+        self._flusher = None
+        self.stats = {"connections": 0, "sessions": 0, "answers": 0, "saved": 0, "batches": 0}
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, backlog=SERVER_BACKLOG)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._flusher = asyncio.ensure_future(self._flush_loop())
+        return self
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        if self._server is not None:
+            self._server.close()
+            for player in list(self.players):
+                player.writer.close()
+            await self._server.wait_closed()
+        await self._flush()
+
+    # HTTP
+    async def _handle(self, reader, writer):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            request = lines[0].split()
+            if len(request) < 2:
+                return
+            method, path = request[0], request[1].split("?", 1)[0]
+            headers = {}
+            for line in lines[1:]:
+                k, sep, v = line.partition(":")
+                if sep:
+                    headers[k.strip().lower()] = v.strip()
+            if path == "/ws" and headers.get("upgrade", "").lower() == "websocket" and "sec-websocket-key" in headers:
+                await self._websocket(reader, writer, headers["sec-websocket-key"])
+            elif method != "GET":
+                self._http(writer, 405, "text/plain", "method not allowed")
+            elif path == "/":
+                self._http(writer, 200, "text/html; charset=utf-8", CLASSROOM_PAGE)
+            elif path == "/leaderboard":
+                board = [dict(e, rank=r) for r, e in self.store.ranked(0, 50)]
+                self._http(writer, 200, "application/json", json.dumps(board))
+            elif path == "/stats":
+                self._http(writer, 200, "application/json", json.dumps(dict(self.stats, players=len(self.players), pending=len(self._pending))))
+            else:
+                self._http(writer, 404, "text/plain", "not found")
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        except Exception as e:
+            print("classroom server error:", e)
+        finally:
+            writer.close()
+
+    def _http(self, writer, status, ctype, body):
+        data = body.encode("utf-8")
+        reason = {200: "OK", 404: "Not Found", 405: "Method Not Allowed"}.get(status, "")
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: {ctype}\r\nContent-Length: {len(data)}\r\n"
+                     f"Cache-Control: no-store\r\nConnection: close\r\n\r\n".encode("ascii") + data)
+
+    # WebSocket play
+    async def _websocket(self, reader, writer, key):
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {ws_accept_key(key)}\r\n\r\n").encode("ascii"))
+        player = _ClassroomPlayer(writer)
+        self.players.add(player)
+        self.stats["connections"] += 1
+        try:
+            while True:
+                op, data = await ws_read_message(reader)
+                if op == 0x8:
+                    writer.write(ws_frame(data[:2], 0x8))
+                    break
+                if op == 0x9:
+                    writer.write(ws_frame(data, 0xA))
+                    continue
+                if op != 0x1:
+                    continue
+                try:
+                    msg = json.loads(data)
+                    reply = self._dispatch(player, msg) if isinstance(msg, dict) else {"type": "error", "error": "expected an object"}
+                except ValueError:
+                    reply = {"type": "error", "error": "bad json"}
+                writer.write(ws_frame(json.dumps(reply)))
+                await writer.drain()
+        except ValueError as e:
+            writer.write(ws_frame(struct.pack("!H", 1009) + str(e).encode("utf-8"), 0x8))
+        finally:
+            self.players.discard(player)
+
+    def _state(self, player, kind):
+        s = player.session
+        return {"type": kind, "lives": s.lives, "keys": s.keys_collected, "doors": len(s.questions),
+                "unlocked": sorted(s.unlocked), "completed": sorted(s.completed), "finished": s.finished}
+
+    def _dispatch(self, player, msg):
+        # the same rules as the desktop game: QuizSession + make_score_entry
+        kind = msg.get("type")
+        if kind == "join":
+            player.name = str(msg.get("name") or "").strip()[:32] or "Player"
+            player.session = QuizSession(player.name, self.bank.draw(STAGE_COUNT), engine=self.engine)
+            player.entry = None
+            player.sent_rank = None
+            self.stats["sessions"] += 1
+            return self._state(player, "joined")
+        s = player.session
+        if s is None:
+            return {"type": "error", "error": "join first"}
+        if kind == "enter":
+            door = msg.get("door")
+            q = s.enter(door) if isinstance(door, int) and not isinstance(door, bool) else None
+            if q is None:
+                return {"type": "error", "error": "that door is locked"}
+            return {"type": "question", "door": door, "story": q.get("story", ""),
+                    "question": q.get("question", ""), "options": list(q.get("options") or [])}
+        if kind == "answer":
+            correct = s.answer(msg.get("answer", ""))
+            if correct is None:
+                return {"type": "error", "error": "enter a door first"}
+            self.stats["answers"] += 1
+            self._changed = True
+            reply = self._state(player, "result")
+            reply["correct"] = correct
+            if s.finished:
+                player.entry = make_score_entry(player.name, s.keys_collected, s.lives)
+                self._pending.append(player.entry)
+                reply["score"] = player.entry["score"]
+            return reply
+        return {"type": "error", "error": f"unknown message type {kind!r}"}
+
+    # batched saves and rank pushes
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(SERVER_FLUSH_INTERVAL)
+            try:
+                await self._flush()
+            except Exception as e:
+                print("classroom flush error:", e)
+
+    async def _flush(self):
+        batch, self._pending = self._pending, []
+        if batch:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.store.add_many, batch)
+                self.stats["saved"] += len(batch)
+                self.stats["batches"] += 1
+            except Exception as e:
+                print("classroom save error:", e)
+                self._pending[:0] = batch
+                return
+        if batch or self._changed:
+            self._changed = False
+            await self._push_ranks()
+
+    def _placements(self, scores):
+        # score -> placement, one store call per distinct score; runs in the executor
+        out = {}
+        for score in scores:
+            try:
+                out[score] = self.store.placement(score)
+            except Exception:
+                pass
+        return out
+
+    async def _push_ranks(self):
+        # store lookups can wait on the store lock or run COUNT queries, so they
+        # go to the executor in one batch; only the sends happen on the loop
+        players = []
+        for player in list(self.players):
+            s = player.session
+            if s is None:
+                continue
+            players.append((player, player.entry["score"] if player.entry else score_value(s.keys_collected, s.lives)))
+        if not players:
+            return
+        placements = await asyncio.get_running_loop().run_in_executor(None, self._placements, {score for _, score in players})
+        for player, score in players:
+            placed = placements.get(score)
+            if placed is None or placed == player.sent_rank:
+                continue
+            player.sent_rank = placed
+            rank, total, pct = placed
+            try:
+                player.writer.write(ws_frame(json.dumps({"type": "rank", "rank": rank, "total": total, "percentile": round(pct, 1),
+                                                         "score": score, "final": player.entry is not None})))
+            except Exception:
+                pass
+
+async def run_classroom_server(host=SERVER_HOST, port=SERVER_PORT, store=None, engine=None):
+    server = await ClassroomServer(host, port, store=store, engine=engine).start()
+    print(f"Classroom server on http://{server.host}:{server.port}/ ({len(server.bank)} questions)")
+    stop = asyncio.Event()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+    except (NotImplementedError, RuntimeError):
+        pass    # Windows: Ctrl+C only
+    try:
+        await stop.wait()
+    finally:
+        await server.close()
+
+# load test
+async def _load_client(host, port, n, rounds, think, rng, stats):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        key = base64.b64encode(os.urandom(16)).decode("ascii")
+        writer.write((f"GET /ws HTTP/1.1\r\nHost: {host}:{port}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode("ascii"))
+        head = await reader.readuntil(b"\r\n\r\n")
+        if b" 101 " not in head.split(b"\r\n", 1)[0] or ws_accept_key(key).encode("ascii") not in head:
+            raise ConnectionError("websocket handshake failed")
+        latencies = stats["latency"]
+
+        async def call(msg):
+            t0 = time.perf_counter()
+            writer.write(ws_frame(json.dumps(msg), mask=True))
+            while True:
+                op, data = await ws_read_message(reader)
+                if op != 0x1:
+                    continue
+                reply = json.loads(data)
+                if reply.get("type") == "rank":
+                    stats["ranks"] += 1
+                    continue
+                latencies.append(time.perf_counter() - t0)
+                if reply.get("type") == "error":
+                    raise RuntimeError(reply.get("error"))
+                return reply
+
+        for _ in range(rounds):
+            state = await call({"type": "join", "name": f"bot{n}"})
+            door = state["doors"]
+            while not state["finished"]:
+                await call({"type": "enter", "door": door})
+                if think:
+                    await asyncio.sleep(rng.uniform(0, 2 * think))
+                state = await call({"type": "answer", "answer": rng.choice(ANSWER_LETTERS)})
+                if state["correct"]:
+                    door -= 1
+            stats["sessions"] += 1
+        writer.write(ws_frame(struct.pack("!H", 1000), 0x8, mask=True))
+        await writer.drain()
+    finally:
+        writer.close()
+
+async def run_load_test(host, port, clients, rounds=3, think=0.05, seed=None):
+    rng = random.Random(seed)
+    stats = {"latency": [], "sessions": 0, "ranks": 0, "errors": 0}
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(_load_client(host, port, i, rounds, think, random.Random(rng.random()), stats)
+                                     for i in range(clients)), return_exceptions=True)
+    stats["elapsed"] = time.perf_counter() - t0
+    errors = [r for r in results if isinstance(r, BaseException)]
+    stats["errors"] = len(errors)
+    if errors:
+        stats["first_error"] = repr(errors[0])
+    return stats
+
+# Monte Carlo simulator
+# plays whole populations of sessions at once as NumPy arrays to tune the score
+# formula, the life count and the door order. Player i's accuracy on the
+# door played j-th is drawn once per session from a Beta distribution with
+# mean accuracy[j]; a wrong answer costs a life and the door is retried
+SIM_BATCH = 1000000
+SIM_CONCENTRATION = 8.0          # Beta a+b: lower means players differ more
+
+def simulate_scoring(sessions, accuracy, concentration=SIM_CONCENTRATION, lives=START_LIVES,
+                     key_points=100, life_points=10, seed=None, batch=SIM_BATCH):
+    # needs NumPy (NUMPY_AVAILABLE); the game itself runs without it
+    rng = np.random.default_rng(seed)
+    acc = np.clip(np.asarray(accuracy, dtype=np.float64), 1e-6, 1 - 1e-6)
+    doors = len(acc)
+    max_score = doors * key_points + lives * life_points
+    score_counts = np.zeros(max_score + 1, dtype=np.int64)
+    keys_hist = np.zeros(doors + 1, dtype=np.int64)
+    lives_hist = np.zeros(lives + 1, dtype=np.int64)
+    answers = 0
+    done = 0
+    while done < sessions:
+        n = min(batch, sessions - done)
+        if concentration:
+            p = rng.beta(acc * concentration, (1 - acc) * concentration, size=(n, doors))
+        else:
+            p = np.broadcast_to(acc, (n, doors))
+        keys = np.zeros(n, dtype=np.int16)
+        left = np.full(n, lives, dtype=np.int16)
+        active = np.arange(n)
+        # every step each live session answers once: at most doors + lives - 1 steps
+        while active.size:
+            answers += active.size
+            hit = rng.random(active.size) < p[active, keys[active]]
+            keys[active[hit]] += 1
+            left[active[~hit]] -= 1
+            active = active[(keys[active] < doors) & (left[active] > 0)]
+        score_counts += np.bincount(keys.astype(np.int64) * key_points + left.astype(np.int64) * life_points, minlength=max_score + 1)
+        keys_hist += np.bincount(keys, minlength=doors + 1)
+        lives_hist += np.bincount(left, minlength=lives + 1)
+        done += n
+    share = score_counts / max(1, sessions)
+    values = np.nonzero(score_counts)[0]
+    mean = float((values * share[values]).sum())
+    cum = np.cumsum(score_counts)
+    pct = lambda q: int(np.searchsorted(cum, q * sessions, side="left"))
+    return {
+        "sessions": sessions,
+        "answers_per_session": answers / max(1, sessions),
+        "mean": mean,
+        "std": float(np.sqrt(((values - mean) ** 2 * share[values]).sum())),
+        "percentiles": {q: pct(q / 100.0) for q in (10, 25, 50, 75, 90, 99)},
+        "win_rate": float(keys_hist[doors] / max(1, sessions)),
+        # chance two random players share a score, and how crowded the top score is
+        "tie_rate": float((share ** 2).sum()),
+        "top_tie_share": float(share[values[-1]]) if values.size else 0.0,
+        "distinct_scores": int(values.size),
+        "scores": {int(v): int(score_counts[v]) for v in values},
+        "keys": [int(c) for c in keys_hist],
+        "lives": [int(c) for c in lives_hist],
+    }
+
+# Command-line tools
+RESIZE_BENCH_SIZES = [(1370, 730), (1920, 1080), (1280, 720), (1024, 600), (800, 480), (1600, 900), (640, 360)]
+
+def _legacy_load_resized(path, target_w, target_h):
+    # the pre-pyramid path: decode the original and LANCZOS it straight to size
+    pil = Image.open(str(path)).convert("RGBA")
+    iw, ih = pil.size
+    ratio_src = iw / max(1, ih)
+    if ratio_src > target_w / max(1, target_h):
+        new_w, new_h = int(ratio_src * target_h), target_h
+    else:
+        new_w, new_h = target_w, int(target_w / max(1, ratio_src))
+    pil = pil.resize((max(1, new_w), max(1, new_h)), Image.LANCZOS)
+    left = max(0, (pil.width - target_w) // 2)
+    upper = max(0, (pil.height - target_h) // 2)
+    return pil.crop((left, upper, left + target_w, upper + target_h))
+
+def cmd_bench_resize(argv):
+    ap = argparse.ArgumentParser(prog="Tkinter.py bench-resize", description="Compare per-resize cost of the full LANCZOS path against the image pyramid.")
+    ap.add_argument("images", nargs="*", help="images to test (default: door background and prologue panels)")
+    ap.add_argument("--repeat", type=int, default=3, help="passes over the size list")
+    args = ap.parse_args(argv)
+    if not PIL_AVAILABLE:
+        print("bench-resize needs Pillow: pip install pillow")
+        return 1
+    paths = [Path(p) for p in args.images] or [p for p in (DOOR_BG_PATH, IMG_S1, IMG_S4, IMG_S7) if p and Path(p).exists()]
+    if not paths:
+        print("no images found")
+        return 1
+    print(f"{'image':<24}{'legacy ms/resize':>18}{'pyramid cold ms':>18}{'pyramid ms/resize':>20}{'speedup':>10}")
+    for p in paths:
+        n = len(RESIZE_BENCH_SIZES) * max(1, args.repeat)
+        t0 = time.perf_counter()
+        for _ in range(max(1, args.repeat)):
+            for w, h in RESIZE_BENCH_SIZES:
+                _legacy_load_resized(p, w, h)
+        legacy = (time.perf_counter() - t0) * 1000.0 / n
+        clear_image_pyramids()
+        t0 = time.perf_counter()
+        load_image_pyramid(Path(p).resolve())
+        cold = (time.perf_counter() - t0) * 1000.0
+        t0 = time.perf_counter()
+        for _ in range(max(1, args.repeat)):
+            for w, h in RESIZE_BENCH_SIZES:
+                safe_load_image(p, target_w=w, target_h=h)
+        warm = (time.perf_counter() - t0) * 1000.0 / n
+        print(f"{Path(p).name[:23]:<24}{legacy:>18.1f}{cold:>18.1f}{warm:>20.1f}{legacy / max(1e-9, warm):>9.1f}x")
+    return 0
+
+def cmd_bench_sessions(argv):
+    ap = argparse.ArgumentParser(prog="Tkinter.py bench-sessions", description="Play simulated quiz sessions headless and report sessions per second.")
+    ap.add_argument("-n", "--sessions", type=int, default=200000, help="sessions to play")
+    ap.add_argument("--p-correct", type=float, default=0.75, help="chance the simulated player answers correctly")
+    ap.add_argument("--redraw", action="store_true", help="draw fresh questions from the bank every session")
+    ap.add_argument("--adaptive", action="store_true", help="pick questions with an in-memory adaptive engine")
+    ap.add_argument("--seed", type=int, default=None)
+    args = ap.parse_args(argv)
+    bank = get_question_bank()
+    engine = AdaptiveEngine(bank, path=None) if args.adaptive else None
+    rng = random.Random(args.seed)
+    t0 = time.perf_counter()
+    wins, keys, answers = simulate_sessions(args.sessions, bank, args.p_correct, engine, rng, redraw=args.redraw)
+    elapsed = time.perf_counter() - t0
+    n = max(1, args.sessions)
+    print(f"{args.sessions:,} sessions in {elapsed:.2f}s: {args.sessions / max(1e-9, elapsed):,.0f} sessions/s, {answers / max(1e-9, elapsed):,.0f} answers/s")
+    print(f"win rate {wins / n:.1%}, mean keys {keys / n:.2f}, mean answers {answers / n:.2f}")
+    return 0
+
+BENCH_REPEAT = 20
+BENCH_THRESHOLD = 0.15      # warm-median slowdown against the baseline that counts as a regression
+BENCH_NOISE_MS = 0.05       # timings below this are never flagged
+BENCH_BOARD_SIZE = 10000
+BENCH_IMAGE_SIZES = [(1370, 730), (1920, 1080), (800, 480)]
+
+class _PilMeasureFont:
+    # stands in for a tkfont.Font in PIL-only runs: same measure() contract, Pillow metrics
+    def __init__(self, size=18):
+        from PIL import ImageFont
+        try:
+            self.font = ImageFont.load_default(size=size)
+        except TypeError:
+            self.font = ImageFont.load_default()
+
+    def measure(self, text):
+        return int(self.font.getlength(text))
+
+def _bench_time(fn, repeat, reset=None):
+    # cold: the first call after reset() empties the caches; warm: the next `repeat` calls
+    if reset is not None:
+        reset()
+    t0 = time.perf_counter()
+    fn()
+    cold = (time.perf_counter() - t0) * 1000.0
+    warm = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        fn()
+        warm.append((time.perf_counter() - t0) * 1000.0)
+    warm.sort()
+    return {"cold_ms": round(cold, 4), "warm_ms": round(warm[len(warm) // 2], 4), "warm_min_ms": round(warm[0], 4),
+            "warm_p95_ms": round(warm[min(len(warm) - 1, int(len(warm) * 0.95))], 4), "runs": len(warm)}
+
+def _bench_scene_setup(app, state):
+    # puts the app in `state` with the data its draw method reads, without the
+    # side effects of the real transitions (music, analytics, score saving)
+    app.player_name = "Bench"
+    if not app.prologue_scenes:
+        app.prologue_scenes = [{'img': img, 'text': text.replace("{name}", "Bench")} for img, text in PROLOGUE_SCENES_TEMPLATE]
+        app.scene_index = 0
+        app.scene_text_full = app.scene_text_shown = app.prologue_scenes[0]['text']
+        app.scene_char_idx = len(app.scene_text_full); app.scene_done = True
+        app.story_text = "In a mysterious land... Bench..."
+        app.final_text_full = app.final_text_shown = "Your courage freed me, Bench"
+        app.final_char_idx = len(app.final_text_full); app.final_done = True
+    app._score_saved = True
+    app.state = state
+
+def _bench_cases(args, font, app):
+    # (name, fn, reset) for every benchmark this run can do; skipped ones carry a reason instead of fn
+    cases = []
+    text = (instructions_text + "\n" + about_text) * 4
+    cases.append(("wrap_text_to_lines", lambda: wrap_text_to_lines(font, text, 900), None))
+    images = [Path(p) for p in (DOOR_BG_PATH, IMG_S1, IMG_S4) if p and Path(p).exists()]
+    if PIL_AVAILABLE and images:
+        def load_images():
+            for p in images:
+                for w, h in BENCH_IMAGE_SIZES:
+                    safe_load_image(p, target_w=w, target_h=h)
+        cases.append(("safe_load_image", load_images, clear_image_pyramids))
+        sprite = safe_load_image(images[0], target_w=220, target_h=340)
+        cases.append(("make_transparent", lambda: make_transparent(sprite), None))
+    else:
+        cases.append(("safe_load_image", "needs Pillow and the scene images", None))
+    gifs = [Path(p) for p in (ENDING_GIF_PATH, IMG_S_CRY, IMG_S_HAPPY) if p and Path(p).exists()]
+    if PIL_AVAILABLE and gifs:
+        cases.append(("load_gif_frames", lambda: [load_gif_frames(str(p)) for p in gifs], None))
+    video = args.video or next((p for p in (CHAR_SPRITE_PATH,) if p and Path(p).suffix.lower() == ".mp4"), None)
+    if video and Path(video).exists():
+        cases.append(("load_video_frames", lambda: load_video_frames(str(video), max_frames=48, target_w=220, target_h=340), None))
+    else:
+        cases.append(("load_video_frames", "no video asset (pass --video)", None))
+
+    tmp = Path(tempfile.mkdtemp(prefix="aq-bench-"))
+    rng = random.Random(1)
+    board = [make_score_entry(f"player{i}", rng.randint(0, STAGE_COUNT), rng.randint(0, START_LIVES)) for i in range(args.board_size)]
+    board_path = tmp / "board.json"
+    _atomic_write_json(board_path, board)
+    cases.append(("leaderboard.load", lambda: LeaderboardStore(board_path, retention=None).entries(), None))
+    store = LeaderboardStore(tmp / "live.json", retention=None)
+    store.save(board)
+    cases.append(("leaderboard.add", lambda: store.add(make_score_entry("bench", rng.randint(0, STAGE_COUNT), rng.randint(0, START_LIVES))), None))
+    cases.append(("leaderboard.rank", lambda: (store.placement(rng.randint(0, 600)), store.ranked(0, 20)), None))
+
+    if app is None:
+        cases.append(("redraw.*", "needs a display (run under Xvfb: xvfb-run python Tkinter.py bench)", None))
+    else:
+        def reset_images():
+            app._img_cache.clear(); app._tk_image_cache.clear(); clear_image_pyramids()
+        for state in AdventureQuiz.SCENE_STATES:
+            def frame(state=state):
+                _bench_scene_setup(app, state)
+                app.draw_scene(); app.update_idletasks()
+            cases.append((f"redraw.{state}", frame, reset_images))
+    return cases, tmp
+
+def compare_bench(results, baseline, threshold=BENCH_THRESHOLD):
+    # {name: (baseline warm ms, warm ms, change)} and the names that regressed
+    changes, regressed = {}, []
+    for name, r in results.items():
+        b = baseline.get(name)
+        if not b or "warm_ms" not in r or "warm_ms" not in b:
+            continue
+        change = (r["warm_ms"] - b["warm_ms"]) / max(1e-9, b["warm_ms"])
+        changes[name] = (b["warm_ms"], r["warm_ms"], change)
+        if change > threshold and r["warm_ms"] - b["warm_ms"] > BENCH_NOISE_MS:
+            regressed.append(name)
+    return changes, regressed
+
+def cmd_bench(argv):
+    ap = argparse.ArgumentParser(prog="Tkinter.py bench", description="Time the hot paths (text wrap, image/GIF/video loads, leaderboard, redraw per state) with cold/warm splits.")
+    ap.add_argument("--mode", choices=("auto", "tk", "pil"), default="auto", help="tk needs a display (e.g. Xvfb); pil skips the redraw benchmarks")
+    ap.add_argument("-r", "--repeat", type=int, default=BENCH_REPEAT, help="warm runs per benchmark")
+    ap.add_argument("-k", "--only", default=None, help="run benchmarks whose name contains this")
+    ap.add_argument("--board-size", type=int, default=BENCH_BOARD_SIZE, help="leaderboard entries")
+    ap.add_argument("--video", default=None, help="video file for load_video_frames")
+    ap.add_argument("-o", "--out", default=None, help="write results as JSON")
+    ap.add_argument("--baseline", default=None, help="JSON results to compare against; exits 1 on a regression")
+    ap.add_argument("--threshold", type=float, default=BENCH_THRESHOLD, help="allowed warm-median slowdown (0.15 = 15%%)")
+    args = ap.parse_args(argv)
+    app = None
+    if args.mode != "pil":
+        try:
+            app = AdventureQuiz()
+        except tk.TclError as e:
+            if args.mode == "tk":
+                print("bench: no display:", e)
+                return 1
+    font = app.small_font if app is not None else _PilMeasureFont()
+    cases, tmp = _bench_cases(args, font, app)
+    results, skipped = {}, {}
+    try:
+        for name, fn, reset in cases:
+            if args.only and args.only not in name:
+                continue
+            if isinstance(fn, str):
+                skipped[name] = fn
+                continue
+            try:
+                results[name] = _bench_time(fn, args.repeat, reset)
+            except Exception as e:
+                skipped[name] = f"error: {e}"
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if app is not None:
+            try: app.destroy()
+            except Exception: pass
+    baseline = {}
+    if args.baseline:
+        try:
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f).get("results", {})
+        except Exception as e:
+            print("bench baseline error:", e)
+            return 1
+    changes, regressed = compare_bench(results, baseline, args.threshold)
+    print(f"{'benchmark':<26}{'cold ms':>10}{'warm ms':>10}{'p95 ms':>10}{'baseline':>10}{'change':>9}")
+    for name, r in results.items():
+        line = f"{name:<26}{r['cold_ms']:>10.2f}{r['warm_ms']:>10.2f}{r['warm_p95_ms']:>10.2f}"
+        if name in changes:
+            b, _, change = changes[name]
+            line += f"{b:>10.2f}{change:>+8.0%}" + (" !" if name in regressed else "")
+        print(line)
+    for name, why in skipped.items():
+        print(f"{name:<26}skipped: {why}")
+    if args.out:
+        _atomic_write_json(args.out, {
+            "mode": "tk" if app is not None else "pil", "python": sys.version.split()[0], "platform": sys.platform,
+            "repeat": args.repeat, "ts": datetime.utcnow().isoformat() + "Z", "results": results, "skipped": skipped,
+        }, indent=2)
+        print("results written to", args.out)
+    if regressed:
+        print(f"{len(regressed)} regression(s) over {args.threshold:.0%}: {', '.join(regressed)}")
+        return 1
+    return 0
+
+def _leak_play_cycle(app, tracker, frames):
+    # one menu -> play -> ending -> menu round through the real click handlers;
+    # score saving, analytics and adaptive ratings are kept out of it
+    def show():
+        for _ in range(frames):
+            app.draw_scene(); app.update()
+            tracker.sample(app.state, app)
+    app.state = "menu"; show()
+    app.handle_click("play"); show()
+    app.player_name = "LeakCheck"
+    app.handle_click("submit_name")
+    app.session.engine = None; app._score_saved = True
+    show()
+    app.handle_click("prologue_skip"); show()
+    app.handle_click("help_no"); show()
+    app.handle_click("start_game"); show()
+    for attempt in range(len(app.questions) + 1):
+        if app.session.finished:
+            break
+        door = max(app.unlocked - app.completed)
+        q = app.session.enter(door)
+        if q is None:
+            break
+        app.state = f"stage{door}"; show()
+        # miss the first question once so the life-lost path runs too
+        app.answer_input = "-" if attempt == 0 else q.get("answer", ""); app.submit_answer(); show()
+    app.state = "ending"; show()
+    app.handle_click("done_end"); show()
+    app.handle_click("play_again"); show()
+
+def cmd_leak_check(argv):
+    ap = argparse.ArgumentParser(prog="Tkinter.py leak-check", description="Play menu -> game -> ending cycles and report PhotoImage / canvas item growth (needs a display, e.g. xvfb-run).")
+    ap.add_argument("-n", "--cycles", type=int, default=LEAK_CYCLES, help="play cycles; the first one is warm-up")
+    ap.add_argument("--frames", type=int, default=LEAK_FRAMES, help="frames drawn on each screen")
+    args = ap.parse_args(argv)
+    tracker = LEAK_TRACKER or LeakTracker()
+    tracker.install()
+    EVENTS.enabled = False
+    try:
+        app = AdventureQuiz()
+    except tk.TclError as e:
+        print("leak-check: no display:", e)
+        return 1
+    app._leaks = tracker
+    snapshots = []
+    try:
+        for i in range(max(2, args.cycles)):
+            _leak_play_cycle(app, tracker, args.frames)
+            gc.collect(); app.update()
+            snap = tracker.snapshot(app)
+            snapshots.append(snap)
+            print(f"cycle {i + 1}: {snap['tk_images']} Tk images, {snap['tracked']} tracked PhotoImages, {snap['canvas_items']} canvas items")
+    finally:
+        try: app.destroy()
+        except Exception: pass
+    tracker.report()
+    # growth is measured from the end of the warm-up cycle, when every cache has been filled once
+    first, last, cycles = snapshots[0], snapshots[-1], len(snapshots) - 1
+    growth = {k: (last[k] - first[k]) / cycles for k in ("tk_images", "tracked", "canvas_items")}
+    grown = {site: n - first["sites"].get(site, 0) for site, n in last["sites"].items() if n > first["sites"].get(site, 0)}
+    print("per cycle: " + ", ".join(f"{k} {v:+.1f}" for k, v in growth.items()))
+    for site, n in sorted(grown.items(), key=lambda kv: -kv[1])[:LEAK_SITES_SHOWN]:
+        print(f"  growing: {site:<40}+{n} over {cycles} cycles")
+    if any(v > 0 for v in growth.values()):
+        print("LEAK: live objects keep growing across cycles")
+        return 1
+    print("no growth across cycles")
+    return 0
+
+def headless_image_assets():
+    # the same decodes AdventureQuiz.__init__ and the scenes do, without Tk
+    panel_w, panel_h = WIDTH - 2 * PANEL_MARGIN, HEIGHT - 2 * PANEL_MARGIN
+    assets = []
+    def add(name, obj):
+        n = image_bytes(obj)
+        if n:
+            assets.append((name, asset_scene(name), n))
+    bg = next((d / f for d in SEARCH_DIRS if d.exists() for f in ("bg.gif", "bg.png", "bg.jpg") if (d / f).exists()), None)
+    if bg is not None:
+        pil = Image.open(str(bg)).convert("RGBA")
+        add("_bg_pil", pil.resize((max(1, int(pil.width * HEIGHT / max(1, pil.height))), HEIGHT)))
+    add("_door_bg", safe_load_image(DOOR_BG_PATH, panel_w, panel_h))
+    for name, path in (("door_closed_img", DOOR_CLOSED_PATH), ("door_open_img", DOOR_OPEN_PATH)):
+        if path and Path(path).exists():
+            add(name, Image.open(str(path)).convert("RGBA"))
+    for name, path in (("hero_frames", CHAR_SPRITE_PATH), ("cry_frames", IMG_S_CRY), ("happy_frames", IMG_S_HAPPY), ("ending_frames", ENDING_GIF_PATH)):
+        if path and Path(path).exists():
+            add(name, load_gif_frames(str(path))[0])
+    add("_medal_pils", {m: Image.open(str(p)).convert("RGBA") for m, p in (("gold", GOLD_MEDAL_PATH), ("silver", SILVER_MEDAL_PATH), ("bronze", BRONZE_MEDAL_PATH)) if p.exists()})
+    for img, _ in PROLOGUE_SCENES_TEMPLATE:
+        if img and Path(img).exists():
+            add("panel:" + Path(img).name, safe_load_image(Path(img), panel_w, panel_h))
+    return assets
+
+def cmd_memory_report(argv):
+    ap = argparse.ArgumentParser(prog="Tkinter.py memory-report", description="Report decoded image bytes per asset and scene, cache sizes and per-transition peaks.")
+    ap.add_argument("--mode", choices=("auto", "tk", "pil"), default="auto", help="tk draws every scene (needs a display); pil only decodes the assets")
+    ap.add_argument("--frames", type=int, default=3, help="frames drawn per scene in tk mode")
+    args = ap.parse_args(argv)
+    if not PIL_AVAILABLE:
+        print("memory-report needs Pillow: pip install pillow")
+        return 1
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(MEMORY_TRACE_FRAMES)
+    EVENTS.enabled = False
+    app = None
+    if args.mode != "pil":
+        try:
+            app = AdventureQuiz()
+        except tk.TclError as e:
+            if args.mode == "tk":
+                print("memory-report: no display:", e)
+                return 1
+    if app is None:
+        print("(no display: decoded assets only, without PhotoImages or scene transitions)")
+        assets = headless_image_assets()
+        memory_report(assets, {"image pyramids": (len(_image_pyramids), sum(image_bytes(levels) for _, levels in _image_pyramids.values()))})
+        return 0
+    accountant = app._memory = app._memory or MemoryAccountant()
+    try:
+        for state in AdventureQuiz.SCENE_STATES:
+            _bench_scene_setup(app, state)
+            for _ in range(max(1, args.frames)):
+                app.draw_scene(); app.update()
+                accountant.sample(app.state)
+        memory_report(app_image_assets(app), app_cache_sizes(app), accountant)
+    finally:
+        app._memory = None
+        app.destroy()
+    return 0
+
+class _ScratchLeaderboard:
+    # swaps LEADERBOARD for one in a temp dir, so scripted runs never touch the real board
+    def __enter__(self):
+        global LEADERBOARD
+        self._tmp = tempfile.TemporaryDirectory(prefix="aq-scratch-")
+        self._saved, LEADERBOARD = LEADERBOARD, LeaderboardStore(Path(self._tmp.name) / "leaderboard.json")
+        return LEADERBOARD
+
+    def __exit__(self, *exc):
+        global LEADERBOARD
+        SCORE_SAVER.flush()
+        LEADERBOARD = self._saved
+        self._tmp.cleanup()
+
+def cmd_replay(argv):
+    ap = argparse.ArgumentParser(prog="Tkinter.py replay", description="Replay an ADVENTURE_QUIZ_RECORD input recording on a virtual clock and check it reaches the same states (needs a display, e.g. xvfb-run).")
+    ap.add_argument("recording", nargs="?", help=".aqrec file written with ADVENTURE_QUIZ_RECORD")
+    ap.add_argument("--tail", type=int, default=REPLAY_TAIL_MS, help="ms of virtual time run after the last event")
+    ap.add_argument("--self-check", action="store_true", help="check recording and replay on a stand-in app (no display needed)")
+    args = ap.parse_args(argv)
+    if args.self_check:
+        ok = replay_self_check()
+        print("replay self-check " + ("ok" if ok else "FAILED"))
+        return 0 if ok else 1
+    if not args.recording:
+        ap.error("a recording is required")
+    try:
+        header, events, recorded = read_recording(args.recording)
+    except (OSError, ValueError) as e:
+        print("replay:", e)
+        return 1
+    # the replay must not write scores or analytics into the real files
+    EVENTS.enabled = False
+    clock = VirtualClock()
+    recorder = InputRecorder(clock, seed=header["seed"])
+    with _ScratchLeaderboard():
+        try:
+            app = AdventureQuiz(clock=clock, recorder=recorder)
+        except tk.TclError as e:
+            print("replay: no display:", e)
+            return 1
+        prof = app._profiler = app._profiler or FrameProfiler(REPLAY_FRAMES, overlay=False)
+        start = time.perf_counter()
+        try:
+            dispatched = replay_recording(app, clock, events, args.tail, header.get("size"))
+        finally:
+            elapsed = time.perf_counter() - start
+            try: app.destroy()
+            except Exception: pass
+    replayed = recorder.transitions
+    print(f"{dispatched} events, {clock.ran} timer callbacks, {clock.now():.1f}s virtual in {elapsed:.2f}s real")
+    print(f"{'scene':<14}{'frames':>8}{'avg ms':>9}{'max ms':>9}")
+    for state, (n, total, worst, _) in sorted(prof.scenes.items(), key=lambda kv: -kv[1][1]):
+        print(f"{state:<14}{n:>8}{total / n:>9.2f}{worst:>9.2f}")
+    pct = prof.percentiles(redraw=True)
+    if pct:
+        print("redraw ms " + "  ".join(f"{k if k == 'max' else 'p%d' % k} {v:.2f}" for k, v in pct.items()))
+    same, index, worst = compare_transitions(recorded, replayed)
+    if not same:
+        want = recorded[index] if index < len(recorded) else None
+        got = replayed[index] if index < len(replayed) else None
+        print(f"DIVERGED at transition {index + 1}: recorded {want}, replayed {got}")
+        return 1
+    print(f"{len(recorded)} state transitions match; worst timing difference {worst:.0f} ms")
+    return 0
+
+def _play_wait(app, clock, ready, limit):
+    # advances virtual time a frame at a time until ready(); False after limit seconds
+    deadline = clock.now() + limit
+    while not ready():
+        if clock.now() >= deadline:
+            return False
+        clock.run_until(clock.now() + PLAYTHROUGH_STEP)
+        app.update_idletasks()
+    return True
+
+def _play_click(app, clock, tag, think):
+    # waits for the button to be drawn, then clicks its centre through on_click
+    if not _play_wait(app, clock, lambda: tag in app.click_areas, PLAYTHROUGH_STEP_LIMIT):
+        raise RuntimeError(f"'{tag}' never appeared (state {app.state})")
+    clock.run_until(clock.now() + think / 1000.0)
+    x1, y1, x2, y2 = app.click_areas.get(tag, (0, 0, 0, 0))
+    app.on_click(_ReplayEvent(x=(x1 + x2) // 2, y=(y1 + y2) // 2))
+    app.update_idletasks()
+
+def _playthrough(app, clock, misses, think):
+    # menu -> name -> prologue -> help -> loader -> every door -> ending -> menu;
+    # returns [(phase, virtual seconds)]
+    phases = []
+    def phase(name, t0):
+        phases.append((name, clock.now() - t0))
+        return clock.now()
+    t = clock.now()
+    _play_click(app, clock, "play", think)
+    for ch in "Player":
+        app.on_key(_ReplayEvent(keysym=ch, char=ch))
+    _play_click(app, clock, "submit_name", think)
+    t = phase("menu + name", t)
+    while app.state == "prologue":
+        _play_click(app, clock, "prologue_continue", think)
+    t = phase("prologue", t)
+    _play_click(app, clock, "help_yes", think)
+    _play_click(app, clock, "start_game", think)
+    t = phase("help + loader", t)
+    wrong = misses
+    while not app.session.finished:
+        door = max(app.unlocked - app.completed)
+        _play_click(app, clock, f"door{door}", think)
+        if not _play_wait(app, clock, lambda: app.state == f"stage{door}", PLAYTHROUGH_STEP_LIMIT):
+            raise RuntimeError(f"walk to door {door} never finished (state {app.state})")
+        t = phase(f"walk to door {door}", t)
+        q = app.questions[door - 1]
+        right = [i for i in range(4) if check_answer(q, "abcd"[i])] or [0]
+        pick = right[0] if not wrong else (right[0] + 1) % 4
+        wrong = max(0, wrong - 1)
+        _play_click(app, clock, f"option{pick + 1}", think)
+        t = phase(f"door {door} answer", t)
+    # the save runs on the real score-saver thread: wait for it, then let a frame pick up the result
+    SCORE_SAVER.flush()
+    if not _play_wait(app, clock, lambda: app._save_status in ("saved", "failed"), PLAYTHROUGH_STEP_LIMIT):
+        raise RuntimeError(f"score save never reported back (status {app._save_status})")
+    if app._save_status == "failed":
+        raise RuntimeError("score save failed")
+    _play_click(app, clock, "done_end", think)
+    _play_click(app, clock, "play_again", think)
+    phase("ending", t)
+    return phases
+
+def cmd_playthrough(argv):
+    ap = argparse.ArgumentParser(prog="Tkinter.py playthrough", description="Play the whole game through its click handlers on a virtual clock, so typewriters, the loader and walks take no real time (needs a display, e.g. xvfb-run).")
+    ap.add_argument("-n", "--runs", type=int, default=1, help="playthroughs in one window")
+    ap.add_argument("--misses", type=int, default=1, help="wrong answers given before answering correctly")
+    ap.add_argument("--think", type=int, default=0, help="virtual ms waited before each click")
+    ap.add_argument("--seed", type=int, default=0, help="random seed for the question draw")
+    args = ap.parse_args(argv)
+    EVENTS.enabled = False
+    clock = VirtualClock()
+    with _ScratchLeaderboard():
+        try:
+            app = AdventureQuiz(clock=clock, recorder=InputRecorder(clock, seed=args.seed))
+        except tk.TclError as e:
+            print("playthrough: no display:", e)
+            return 1
+        status = 0
+        try:
+            for run in range(max(1, args.runs)):
+                v0, r0 = clock.now(), time.perf_counter()
+                try:
+                    phases = _playthrough(app, clock, args.misses, args.think)
+                except RuntimeError as e:
+                    print(f"run {run + 1}: stuck: {e}")
+                    status = 1
+                    break
+                real = time.perf_counter() - r0
+                for name, secs in phases:
+                    print(f"  {name:<22}{secs:8.2f}s virtual")
+                print(f"run {run + 1}: {clock.now() - v0:.1f}s of game time in {real * 1000.0:.0f} ms "
+                      f"({app.session.keys_collected} keys, {app.session.lives} lives, {len(LEADERBOARD)} scores on the scratch board)")
+        finally:
+            try: app.destroy()
+            except Exception: pass
+    return status
+
+def cmd_import_leaderboard(argv):
+    ap = argparse.ArgumentParser(prog="Tkinter.py import-leaderboard", description="Import leaderboard.json files into a SQLite leaderboard.")
+    ap.add_argument("files", nargs="*", help="JSON leaderboard files (default: the local leaderboard.json)")
+    ap.add_argument("--db", default=LEADERBOARD_DB_PATH, help="SQLite file (default: $ADVENTURE_QUIZ_LEADERBOARD_DB)")
+    args = ap.parse_args(argv)
+    if not args.db:
+        print("no database given: pass --db or set ADVENTURE_QUIZ_LEADERBOARD_DB")
+        return 1
+    store = SqliteLeaderboardStore(args.db)
+    files = [Path(f) for f in args.files] or [LEADERBOARD_PATH]
+    for f in files:
+        try:
+            added = import_json_leaderboard(store, f)
+            print(f"{f}: {added} new entries")
+        except Exception as e:
+            print(f"{f}: import failed: {e}")
+    print(f"{args.db}: {len(store)} entries total")
+    store.close()
+    return 0
+
+def cmd_merge_leaderboards(argv):
+    ap = argparse.ArgumentParser(prog="Tkinter.py merge-leaderboards", description="Merge leaderboard exports (JSON or JSONL) from many kiosks into one ranked board.")
+    ap.add_argument("files", nargs="+", help="leaderboard.json / .jsonl files to merge")
+    ap.add_argument("-o", "--output", required=True, help="output file; .jsonl writes one entry per line, anything else a JSON array")
+    ap.add_argument("--top", type=int, default=None, help="keep only the best N entries")
+    ap.add_argument("--chunk", type=int, default=MERGE_CHUNK_RECORDS, help="records sorted in memory before spilling a run to disk")
+    args = ap.parse_args(argv)
+    t0 = time.perf_counter()
+    stats = merge_leaderboard_files(args.files, args.output, top=args.top, chunk_records=max(1000, args.chunk))
+    dt = time.perf_counter() - t0
+    print(f"merged {stats['read']:,} entries from {stats['inputs']} files into {args.output}: "
+          f"{stats['written']:,} written, {stats['duplicates']:,} duplicates dropped, {stats['rejected']:,} invalid records skipped in {dt:.2f}s")
+    return 0
+
+def cmd_check_questions(argv):
+    ap = argparse.ArgumentParser(prog="Tkinter.py check-questions", description="Validate question packs and show what the bank would hold.")
+    ap.add_argument("files", nargs="*", help="JSON/JSONL/" + PACK_EXT + " packs or directories (default: $ADVENTURE_QUIZ_QUESTIONS or questions/)")
+    ap.add_argument("--self-check", action="store_true", help="check free-text grading against options that normalize alike")
+    args = ap.parse_args(argv)
+    if args.self_check:
+        ok = answers_self_check()
+        print("answer self-check " + ("ok" if ok else "FAILED"))
+        return 0 if ok else 1
+    paths = question_pack_paths(os.pathsep.join(args.files) if args.files else None)
+    if not paths:
+        print("no question packs found")
+        return 1
+    t0 = time.perf_counter()
+    if paths[0].suffix.lower() == PACK_EXT:
+        # compiled packs are checked one at a time, the way the game opens them
+        try:
+            bank = QuestionPack(paths[0])
+        except Exception as e:
+            print(f"{paths[0]}: open failed: {e}")
+            return 1
+        print(f"{paths[0]}: compiled pack")
+    else:
+        bank = QuestionBank()
+        for p in paths:
+            if p.suffix.lower() == PACK_EXT:
+                print(f"{p}: skipped (compiled pack)")
+                continue
+            try:
+                print(f"{p}: {bank.load(p)} questions")
+            except Exception as e:
+                print(f"{p}: load failed: {e}")
+    elapsed = time.perf_counter() - t0
+    stats = bank.stats()
+    print(f"{stats['questions']:,} questions in {elapsed:.2f}s ({stats['rejected']} invalid, {stats['duplicates']} duplicates, {stats['tags']} tags)")
+    print("topics:", ", ".join(f"{k}={v}" for k, v in stats["topics"].items()))
+    print("difficulty:", ", ".join(f"{k}={v}" for k, v in stats["difficulty"].items()))
+    for source, reason in bank.errors:
+        print(f"  {source}: {reason}")
+    return 0 if len(bank) >= STAGE_COUNT else 1
+
+def cmd_build_questions(argv):
+    ap = argparse.ArgumentParser(prog="Tkinter.py build-questions", description="Compile JSON/JSONL question packs into a memory-mapped " + PACK_EXT + " pack.")
+    ap.add_argument("files", nargs="*", help="JSON/JSONL packs or directories (default: the built-in questions)")
+    ap.add_argument("-o", "--output", required=True, help="output " + PACK_EXT + " file")
+    args = ap.parse_args(argv)
+    if args.files:
+        sources = [p for p in question_pack_paths(os.pathsep.join(args.files)) if p.suffix.lower() != PACK_EXT]
+    else:
+        sources = [questions]
+    t0 = time.perf_counter()
+    count, report = build_question_pack(sources, args.output)
+    print(f"{args.output}: {count:,} questions in {time.perf_counter() - t0:.2f}s ({report.rejected} invalid, {report.duplicates} duplicates)")
+    for source, reason in report.errors:
+        print(f"  {source}: {reason}")
+    t0 = time.perf_counter()
+    QuestionPack(args.output).close()
+    print(f"opens in {(time.perf_counter() - t0) * 1000:.2f} ms")
+    return 0
+
+def cmd_serve(argv):
+    ap = argparse.ArgumentParser(prog="Tkinter.py serve", description="Host the quiz for a classroom over HTTP + WebSocket.")
+    ap.add_argument("--host", default=SERVER_HOST, help="address to bind (0.0.0.0 to serve the LAN)")
+    ap.add_argument("--port", type=int, default=SERVER_PORT)
+    ap.add_argument("--board", default=None, help="JSON leaderboard file to use instead of the game's leaderboard")
+    ap.add_argument("--adaptive", action="store_true", help="pick questions with the adaptive engine")
+    args = ap.parse_args(argv)
+    store = LeaderboardStore(args.board) if args.board else None
+    try:
+        asyncio.run(run_classroom_server(args.host, args.port, store=store, engine=get_adaptive_engine() if args.adaptive else None))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if store is not None:
+            store.close()
+    return 0
+
+def _wait_for_port(host, port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+def cmd_load_test(argv):
+    ap = argparse.ArgumentParser(prog="Tkinter.py load-test", description="Drive a classroom server with many simulated WebSocket players.")
+    ap.add_argument("-c", "--clients", type=int, default=500, help="concurrent simulated players")
+    ap.add_argument("--rounds", type=int, default=3, help="sessions each player plays")
+    ap.add_argument("--think", type=float, default=0.05, help="mean seconds a player thinks before answering")
+    ap.add_argument("--host", default=SERVER_HOST)
+    ap.add_argument("--port", type=int, default=SERVER_PORT)
+    ap.add_argument("--spawn", action="store_true", help="start a server (with a throwaway leaderboard) for the test")
+    ap.add_argument("--seed", type=int, default=None)
+    args = ap.parse_args(argv)
+    proc = tmpdir = None
+    if args.spawn:
+        tmpdir = tempfile.mkdtemp(prefix="aq-load-")
+        proc = subprocess.Popen([sys.executable, str(Path(__file__).resolve()), "serve", "--host", args.host,
+                                 "--port", str(args.port), "--board", str(Path(tmpdir) / "leaderboard.json")])
+        if not _wait_for_port(args.host, args.port, 15):
+            print("server did not start")
+            proc.kill()
+            return 1
+    try:
+        stats = asyncio.run(run_load_test(args.host, args.port, args.clients, args.rounds, args.think, args.seed))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(10)
+            shutil.rmtree(tmpdir, ignore_errors=True)
+    lat = sorted(stats["latency"])
+    pct = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))] * 1000.0 if lat else 0.0
+    elapsed = stats["elapsed"]
+    print(f"{args.clients} clients, {stats['sessions']:,} sessions, {len(lat):,} requests in {elapsed:.2f}s "
+          f"({len(lat) / max(1e-9, elapsed):,.0f} req/s), {stats['ranks']:,} rank pushes, {stats['errors']} errors")
+    print(f"latency ms: p50 {pct(0.50):.2f}  p95 {pct(0.95):.2f}  p99 {pct(0.99):.2f}  max {pct(1.0):.2f}")
+    if stats["errors"]:
+        print("first error:", stats.get("first_error"))
+    return 1 if stats["errors"] else 0
+
+def cmd_simulate(argv):
+    ap = argparse.ArgumentParser(prog="Tkinter.py simulate", description="Monte Carlo the scoring and lives rules over millions of simulated sessions.")
+    ap.add_argument("-n", "--sessions", type=int, default=1000000)
+    ap.add_argument("--accuracy", default="0.75", help="mean accuracy per door in play order, comma-separated (one value applies to every door)")
+    ap.add_argument("--concentration", type=float, default=SIM_CONCENTRATION, help="Beta concentration of per-player accuracy; 0 gives every player the mean")
+    ap.add_argument("--lives", type=int, default=START_LIVES)
+    ap.add_argument("--key-points", type=int, default=100)
+    ap.add_argument("--life-points", type=int, default=10)
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--json", default=None, help="also write the full result to this file")
+    args = ap.parse_args(argv)
+    if not NUMPY_AVAILABLE:
+        print("simulate needs NumPy: pip install numpy")
+        return 1
+    accuracy = [float(a) for a in args.accuracy.split(",") if a.strip()]
+    if len(accuracy) == 1:
+        accuracy = accuracy * STAGE_COUNT
+    if not accuracy or not all(0.0 <= a <= 1.0 for a in accuracy) or args.lives < 1 or min(args.key_points, args.life_points) < 0:
+        print("accuracy values must be in [0, 1], lives >= 1 and points >= 0")
+        return 1
+    t0 = time.perf_counter()
+    res = simulate_scoring(args.sessions, accuracy, args.concentration, args.lives, args.key_points, args.life_points, args.seed)
+    elapsed = time.perf_counter() - t0
+    print(f"{args.sessions:,} sessions in {elapsed:.2f}s ({args.sessions / max(1e-9, elapsed):,.0f}/s), "
+          f"{res['answers_per_session']:.2f} answers per session")
+    print(f"score = keys*{args.key_points} + lives*{args.life_points}, {args.lives} lives, doors at accuracy {', '.join(f'{a:.2f}' for a in accuracy)}")
+    print(f"mean {res['mean']:.1f}  std {res['std']:.1f}  " + "  ".join(f"p{q} {v}" for q, v in res["percentiles"].items()))
+    print(f"win rate {res['win_rate']:.1%}  tie rate {res['tie_rate']:.1%}  top-score share {res['top_tie_share']:.1%}  distinct scores {res['distinct_scores']}")
+    print(f"{'score':>7}{'players':>12}{'share':>8}")
+    for value, count in sorted(res["scores"].items(), reverse=True):
+        frac = count / max(1, args.sessions)
+        print(f"{value:>7}{count:>12,}{frac:>8.1%}  {'#' * int(round(frac * 50))}")
+    if args.json:
+        _atomic_write_json(args.json, dict(res, elapsed=elapsed, accuracy=accuracy, lives_start=args.lives,
+                                           key_points=args.key_points, life_points=args.life_points), indent=2)
+    return 0
+
+def cmd_build_code_questions(argv):
+    ap = argparse.ArgumentParser(prog="Tkinter.py build-code-questions", description="Run code snippets in a sandbox and write \"what does this print?\" questions as a JSONL pack.")
+    ap.add_argument("files", nargs="+", help="JSON/JSONL files of {\"snippet\": ..., \"topic\", \"difficulty\", \"distractors\"} records")
+    ap.add_argument("-o", "--output", required=True, help="output .jsonl question pack")
+    ap.add_argument("--workers", type=int, default=None, help="sandbox processes (default: one per core)")
+    ap.add_argument("--timeout", type=float, default=CODE_TIMEOUT, help="seconds a snippet may run")
+    ap.add_argument("--memory-mb", type=int, default=CODE_MEMORY_MB, help="address-space limit per sandbox process")
+    ap.add_argument("--cache", default=str(CODE_CACHE_PATH), help="result cache (SQLite); pass '' to disable")
+    args = ap.parse_args(argv)
+    try:
+        pool = SandboxPool(args.workers, args.timeout, args.memory_mb)
+    except RuntimeError as e:
+        print(e)
+        return 1
+    cache = CodeResultCache(args.cache) if args.cache else None
+    t0 = time.perf_counter()
+    try:
+        written, executed, report = build_code_questions([Path(f) for f in args.files], args.output, pool, cache)
+    finally:
+        pool.close()
+        if cache is not None:
+            cache.close()
+    print(f"{args.output}: {written:,} questions in {time.perf_counter() - t0:.2f}s "
+          f"({executed:,} snippets run on {pool.workers} workers, {pool.timeouts} timeouts, {report.rejected} rejected)")
+    for source, reason in report.errors:
+        print(f"  {source}: {reason}")
+    return 0
+
+CLI_COMMANDS = {
+    "bench": cmd_bench,
+    "bench-resize": cmd_bench_resize,
+    "bench-sessions": cmd_bench_sessions,
+    "leak-check": cmd_leak_check,
+    "memory-report": cmd_memory_report,
+    "replay": cmd_replay,
+    "playthrough": cmd_playthrough,
+    "import-leaderboard": cmd_import_leaderboard,
+    "merge-leaderboards": cmd_merge_leaderboards,
+    "check-questions": cmd_check_questions,
+    "build-questions": cmd_build_questions,
+    "build-code-questions": cmd_build_code_questions,
+    "simulate": cmd_simulate,
+    "serve": cmd_serve,
+    "load-test": cmd_load_test,
+}
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in CLI_COMMANDS:
+        sys.exit(CLI_COMMANDS[sys.argv[1]](sys.argv[2:]) or 0)
     if not PIL_AVAILABLE:
         print("Pillow (PIL) is recommended for images. Install: pip install pillow")
     expected_files = [IMG_S1, IMG_S2, IMG_S3, IMG_S4, IMG_S5, IMG_S6, IMG_S7, IMG_S8, IMG_S9, CHAR_SPRITE_PATH, DOOR_CLOSED_PATH, DOOR_OPEN_PATH, IMG_S_CRY, IMG_S_HAPPY]